@@ -20,8 +20,17 @@ cd "$SCRIPTORIUM_DIR"
 log "Running git pull"
 sudo -u "$BOOKS_USER" git pull --ff-only
 
+# A plain sync would uninstall psycopg, the postgres extra.
+SYNC_ARGS=()
+if [ "${SCRIPTORIUM_DATABASE:-}" = "postgresql" ]; then
+    SYNC_ARGS+=(--extra=postgres)
+fi
+
 log "Running uv sync"
-sudo -u "$BOOKS_USER" uv sync
+sudo -u "$BOOKS_USER" uv sync "${SYNC_ARGS[@]}"
+
+log "Backing up database and media (skipped on PostgreSQL)"
+sudo -u "$BOOKS_USER" uv run python src/manage.py backup
 
 log "Running migrations"
 sudo -u "$BOOKS_USER" uv run python src/manage.py migrate --noinput
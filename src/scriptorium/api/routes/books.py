@@ -1,5 +1,4 @@
 from django.db import transaction
-from django.db.models import Q
 from django.shortcuts import get_object_or_404
 from ninja import Router
 from ninja.errors import HttpError
@@ -16,7 +15,15 @@ from scriptorium.api.schemas import (
     ReadIn,
     ReviewSubmitIn,
 )
-from scriptorium.main.models import Author, Book, BookStatus, Quote, Series, Tag
+from scriptorium.main.models import (
+    Author,
+    Book,
+    BookStatus,
+    Quote,
+    Series,
+    Tag,
+    book_search,
+)
 from scriptorium.main.utils import slugify
 
 router = Router(tags=["books"])
@@ -108,15 +115,12 @@ def list_books(
     request, q: str | None = None, status: str | None = None, year: int | None = None
 ):
     """Published (reviewed) books by default; pass ``status`` to look at the
-    to-read or to-review shelves instead. ``q`` searches titles and author
-    names, ``year`` filters by the year a read was finished."""
+    to-read or to-review shelves instead. ``q`` is the catalogue search
+    (titles, author and series names, ISBNs), ``year`` filters by the year
+    a read was finished."""
     books = _book_queryset().filter(status=status or BookStatus.REVIEWED)
     if q:
-        books = books.filter(
-            Q(title__icontains=q)
-            | Q(primary_author__name__icontains=q)
-            | Q(additional_authors__name__icontains=q)
-        )
+        books = books.filter(book_search(q))
     if year:
         books = books.filter(reads__finished_on__year=year)
     return books.distinct().order_by("primary_author__name_slug", "title_slug")
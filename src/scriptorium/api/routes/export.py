@@ -0,0 +1,20 @@
+from django.http import StreamingHttpResponse
+from django.utils.timezone import now
+from ninja import Router
+
+from scriptorium.main.library_export import export_library
+
+router = Router(tags=["export"])
+
+
+@router.get("/", summary="Export the whole library as NDJSON")
+def export(request):
+    """Every author, series, tag, book, read, highlight, relation, quote,
+    poem and page as one JSON object per line, streamed as it is read from
+    the database. ``manage.py library_import`` replays the file."""
+    response = StreamingHttpResponse(
+        export_library(), content_type="application/x-ndjson"
+    )
+    filename = f"scriptorium-{now().date().isoformat()}.ndjson"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
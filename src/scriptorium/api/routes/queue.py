@@ -12,8 +12,9 @@ router = Router(tags=["queue"])
 
 def _queue():
     """The review queue (oldest first): unreviewed reads plus published books
-    whose latest read is newer than their review."""
-    return Book.all_objects.needs_review()
+    whose latest read is newer than their review, with each read's
+    highlights."""
+    return Book.all_objects.needs_review().prefetch_related("reads__highlight_set")
 
 
 @router.get("/", response=list[QueueItemOut], summary="List the review queue")
@@ -96,7 +97,7 @@ def add_to_queue(request, payload: QueueAddIn):
         duplicate_read.save(update_fields=["notes", "source", "started_on"])
     book = (
         Book.all_objects.select_related("primary_author", "series")
-        .prefetch_related("additional_authors", "reads")
+        .prefetch_related("additional_authors", "reads__highlight_set")
         .annotate(date=Max("reads__finished_on"))
         .get(pk=book.pk)
     )
@@ -258,61 +258,20 @@ class SeriesOut(Schema):
     book_count: int
 
 
-class KoreaderHighlightIn(Schema):
-    """One highlight as the KOReader plugin sends it -- stored verbatim as
-    the ``Read.highlights`` blob, so this shape is the stable contract the
-    CLI and AI-drafting consumers read later."""
-
-    text: str
-    note: str | None = None
-    chapter: str | None = None
-    datetime: str | None = None
-    pageno: int | None = None
-    color: str | None = None
-    drawer: str | None = None
-
-
-class KoreaderBookIn(Schema):
-    md5: str = Field(
-        min_length=32,
-        max_length=32,
-        description="KOReader's partial MD5 of the book file",
-    )
-    title: str = Field(min_length=1)
-    authors: list[str] = []
-    language: str | None = None
-    series: str | None = None
-    series_index: int | float | str | None = None
-    identifiers: list[str] = Field(
-        [], description="The EPUB's dc:identifier entries (ISBN:..., uuid:..., ...)"
-    )
-    pages: int | None = None
-    status: Literal["complete", "abandoned"] = "complete"
-    rating: int | None = Field(None, ge=1, le=5)
-    summary_note: str | None = None
-    finished_on: dt.date
-    started_on: dt.date | None = None
-    total_time_seconds: int | None = None
-    highlights: list[KoreaderHighlightIn] = []
-
-
-class KoreaderDeviceIn(Schema):
-    id: str | None = None
-    model: str | None = None
-
-
-class KoreaderSyncIn(Schema):
-    plugin_version: str
-    device: KoreaderDeviceIn | None = None
-    books: list[KoreaderBookIn] = Field(min_length=1)
-
-
 class KoreaderResultOut(Schema):
     md5: str
     action: Literal["matched", "created_book", "updated_read", "error"]
     book: str | None = Field(None, description="Book slug (author/title)")
     read_id: int | None = None
-    highlights_stored: int = 0
+    highlights_stored: int = Field(0, description="Highlights newly stored")
+    highlights_duplicate: int = Field(
+        0, description="Highlights skipped because the book already has them"
+    )
+    highlights_watermark: str | None = Field(
+        None,
+        description="Newest highlight stamp stored for the book; later pushes "
+        "only need to send highlights newer than this",
+    )
     warnings: list[str] = []
     detail: str | None = Field(None, description="Error message when action is 'error'")
 
@@ -321,6 +280,21 @@ class KoreaderSyncOut(Schema):
     results: list[KoreaderResultOut]
 
 
+class KoreaderJobOut(KoreaderSyncOut):
+    """An asynchronous sync: ``results`` stays empty until the job has run,
+    then holds exactly what the synchronous endpoint would have returned --
+    the applied books when ``done``, the failing ones when ``failed``."""
+
+    id: int
+    status: Literal["pending", "running", "done", "failed"]
+    created: dt.datetime
+    finished: dt.datetime | None = None
+
+    @staticmethod
+    def resolve_results(obj):
+        return obj.results or []
+
+
 class OpenLibraryWorkOut(Schema):
     id: str
     title: str
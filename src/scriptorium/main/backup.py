@@ -0,0 +1,138 @@
+import datetime as dt
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.utils.timezone import now
+
+
+class Backups:
+    """Snapshots of the database and the media directory under BACKUP_DIR.
+
+    Every snapshot is a directory named after its time, holding a copy of
+    the database taken with SQLite's online backup API, and ``media/``, a
+    tree of hardlinks into a content-addressed object store (files named
+    after the SHA-256 of their bytes). A file that hasn't changed since the
+    last snapshot costs a hardlink, not a copy, and isn't even read again:
+    each snapshot's manifest records size, mtime and digest of its files.
+
+    ``rotate()`` removes snapshots older than BACKUP_KEEP_DAYS (always
+    keeping the latest), then every object no snapshot links to anymore."""
+
+    manifest_name = "manifest.json"
+
+    def __init__(self, root=None, media_root=None):
+        self.root = Path(root or settings.BACKUP_DIR)
+        self.media_root = Path(media_root or settings.MEDIA_ROOT)
+        self.objects = self.root / "objects"
+
+    def directories(self):
+        """Snapshot directories, complete or not, oldest first."""
+        if not self.root.exists():
+            return []
+        return sorted(
+            path
+            for path in self.root.iterdir()
+            if path.is_dir() and path != self.objects
+        )
+
+    def snapshots(self):
+        """Completed snapshot directories, oldest first."""
+        return [
+            path for path in self.directories() if (path / self.manifest_name).exists()
+        ]
+
+    def backup_database(self, target):
+        """Copy the database to ``target`` BACKUP_PAGES_PER_STEP pages at a
+        time. The read lock is released between steps, so the site can keep
+        writing during a backup; a step that finds the database locked waits
+        BACKUP_STEP_SLEEP seconds and retries."""
+        connection.ensure_connection()
+        destination = connection.Database.connect(target)
+        try:
+            connection.connection.backup(
+                destination,
+                pages=settings.BACKUP_PAGES_PER_STEP,
+                sleep=settings.BACKUP_STEP_SLEEP,
+            )
+        finally:
+            destination.close()
+
+    def store(self, path):
+        """Add a file to the object store, returning its digest and whether
+        it had to be copied."""
+        with path.open("rb") as fp:
+            digest = hashlib.file_digest(fp, "sha256").hexdigest()
+        stored = self.objects / digest[:2] / digest
+        if stored.exists():
+            return digest, False
+        stored.parent.mkdir(parents=True, exist_ok=True)
+        # Copy and rename, so an interrupted backup leaves no partial object.
+        partial = stored.with_name(f".{digest}.{os.getpid()}")
+        shutil.copyfile(path, partial)
+        partial.replace(stored)
+        return digest, True
+
+    def backup_media(self, target, previous=None):
+        """Link every media file into ``target``, storing new and changed
+        ones. Returns the manifest and the number of files copied."""
+        manifest = {}
+        stored = 0
+        for path in sorted(self.media_root.rglob("*")):
+            if not path.is_file():
+                continue
+            name = path.relative_to(self.media_root).as_posix()
+            stat = path.stat()
+            known = (previous or {}).get(name)
+            if known and known[:2] == [stat.st_size, stat.st_mtime_ns]:
+                digest = known[2]
+            else:
+                digest, copied = self.store(path)
+                stored += copied
+            manifest[name] = [stat.st_size, stat.st_mtime_ns, digest]
+            link = target / name
+            link.parent.mkdir(parents=True, exist_ok=True)
+            link.hardlink_to(self.objects / digest[:2] / digest)
+        return manifest, stored
+
+    def create(self, media=True):
+        """Take a snapshot, returning its path and the number of media
+        files that had to be copied."""
+        snapshot = self.root / now().strftime("%Y-%m-%dT%H%M%S.%f")
+        snapshot.mkdir(parents=True)
+        self.backup_database(snapshot / "db.sqlite3")
+        manifest, stored = {}, 0
+        if media:
+            snapshots = self.snapshots()
+            previous = (
+                json.loads((snapshots[-1] / self.manifest_name).read_text())
+                if snapshots
+                else None
+            )
+            manifest, stored = self.backup_media(snapshot / "media", previous)
+        # Written last: a snapshot without a manifest is incomplete.
+        (snapshot / self.manifest_name).write_text(json.dumps(manifest))
+        return snapshot, stored
+
+    def rotate(self, keep_days=None):
+        """Remove old snapshots and unreferenced objects. Returns the
+        number of snapshots removed."""
+        keep_days = settings.BACKUP_KEEP_DAYS if keep_days is None else keep_days
+        cutoff = (now() - dt.timedelta(days=keep_days)).strftime("%Y-%m-%dT%H%M%S.%f")
+        latest = self.snapshots()[-1:]
+        old = [
+            path
+            for path in self.directories()
+            if path.name < cutoff and path not in latest
+        ]
+        for snapshot in old:
+            shutil.rmtree(snapshot)
+        # An object only the store links to belongs to no snapshot.
+        for stored in self.objects.glob("*/[!.]*"):
+            if stored.stat().st_nlink == 1:
+                stored.unlink()
+        return len(old)
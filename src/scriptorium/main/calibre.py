@@ -0,0 +1,144 @@
+import shutil
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+
+from django.conf import settings
+
+from scriptorium.main.cover_cache import CoverCache
+from scriptorium.main.models import Book, Job, Thumbnail, get_cover_path
+
+# The queue is what's on the e-reader and still to be read, like
+# calibredb's 'tags:"=on-device" tags:"to-read"'.
+QUEUE_QUERY = """
+SELECT
+    books.title,
+    (
+        SELECT group_concat(name, ' & ') FROM (
+            SELECT authors.name FROM books_authors_link
+            JOIN authors ON authors.id = books_authors_link.author
+            WHERE books_authors_link.book = books.id
+            ORDER BY books_authors_link.id
+        )
+    ),
+    {pages},
+    {shelf},
+    books.path,
+    books.has_cover
+FROM books
+WHERE EXISTS (
+    SELECT 1 FROM books_tags_link JOIN tags ON tags.id = books_tags_link.tag
+    WHERE books_tags_link.book = books.id AND tags.name = 'on-device'
+) AND EXISTS (
+    SELECT 1 FROM books_tags_link JOIN tags ON tags.id = books_tags_link.tag
+    WHERE books_tags_link.book = books.id AND lower(tags.name) LIKE '%to-read%'
+)
+ORDER BY books.id
+"""
+
+
+class CalibreLibrary:
+    """Read-only access to a Calibre library's ``metadata.db``, so the
+    queue can be synced without calibredb and an intermediate JSON file.
+    ``path`` is the database or the library directory containing it."""
+
+    def __init__(self, path):
+        path = Path(path)
+        self.path = path / "metadata.db" if path.is_dir() else path
+
+    def connect(self):
+        # mode=ro never creates, locks or migrates the user's library.
+        return sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True)
+
+    def custom_column(self, connection, label):
+        """SQL for a book's value of the ``#label`` custom column: stored
+        in ``custom_column_N``, behind a link table for normalized
+        (text-like) columns. NULL if the library has no such column."""
+        row = connection.execute(
+            "SELECT id, normalized FROM custom_columns WHERE label = ?", (label,)
+        ).fetchone()
+        if row is None:
+            return "NULL"
+        # Table names can't be parameters; the id is Calibre's integer key.
+        column, normalized = int(row[0]), row[1]
+        if normalized:
+            return (
+                f"(SELECT value.value FROM books_custom_column_{column}_link link "  # noqa: S608
+                f"JOIN custom_column_{column} value ON value.id = link.value "
+                "WHERE link.book = books.id)"
+            )
+        return f"(SELECT value FROM custom_column_{column} WHERE book = books.id)"  # noqa: S608
+
+    def version(self):
+        """Changes whenever a book is edited (Calibre bumps its
+        ``last_modified``, including for tag changes), added or removed."""
+        with closing(self.connect()) as connection:
+            last_modified, count = connection.execute(
+                "SELECT max(last_modified), count(*) FROM books"
+            ).fetchone()
+        return f"{last_modified}/{count}"
+
+    def queue(self):
+        """The queued books in the shape of ``calibredb list --for-machine
+        --fields authors,title,*pages,*shelf,cover``, as calibre_import
+        reads it. Books without a page count leave out ``*pages``, so the
+        import's default applies, and books without a cover ``cover``."""
+        with closing(self.connect()) as connection:
+            query = QUEUE_QUERY.format(
+                pages=self.custom_column(connection, "pages"),
+                shelf=self.custom_column(connection, "shelf"),
+            )
+            rows = connection.execute(query).fetchall()
+        books = []
+        for title, authors, pages, shelf, path, has_cover in rows:
+            book = {"title": title, "authors": authors or "", "*shelf": shelf}
+            if pages is not None:
+                book["*pages"] = pages
+            if has_cover:
+                book["cover"] = str(self.path.parent / path / "cover.jpg")
+            books.append(book)
+        return books
+
+
+def import_covers(covers):
+    """Copy Calibre's cover files, given as (book, path) pairs, to the
+    books' covers in MEDIA_ROOT, instead of downloading them. A file whose
+    copy has the same size and modification time is skipped (copies keep
+    the mtime), so re-syncs only touch changed covers. The changed books
+    get new colours, thumbnails and derivatives queued; they are returned."""
+    changed = []
+    for book, path in covers:
+        source = Path(path)
+        if not source.exists():
+            continue
+        name = get_cover_path(book, source.name)
+        target = Path(settings.MEDIA_ROOT) / name
+        stat = source.stat()
+        if book.cover.name == name and target.exists():
+            current = target.stat()
+            if (current.st_size, current.st_mtime_ns) == (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                continue
+        if book.cover and book.cover.name != name:
+            book.cover.delete(save=False)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(source, target)
+        book.cover.name = name
+        book.cover_hash = CoverCache.digest(target)
+        book.spine_color = book.ui_color = None
+        changed.append(book)
+    Book.all_objects.bulk_update(
+        changed, ["cover", "cover_hash", "spine_color", "ui_color"], batch_size=500
+    )
+    # One by one: Thumbnail.delete() removes the file as well.
+    for thumbnail in Thumbnail.objects.filter(book__in=changed):
+        thumbnail.delete()
+    for kind in (
+        Job.Kind.UPDATE_THUMBNAIL,
+        Job.Kind.UPDATE_DERIVATIVES,
+        Job.Kind.UPDATE_COLOURS,
+    ):
+        Job.objects.enqueue_many(kind, changed)
+    return changed
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+from django.conf import settings
+
+from .utils import CROP_VERTICAL, SPINE_CROP
+
+
+class CoverCache:
+    """Derivatives of cover images -- colour palettes, thumbnails -- stored
+    on disk under the SHA-256 of the cover bytes, so identical covers (a
+    re-download, a reissue, an omnibus sharing its cover) are only ever
+    processed once.
+
+    Each cover gets a directory of named files. Reading an entry touches its
+    directory, and ``evict()`` removes the least recently used directories
+    until the cache fits into COVER_CACHE_MAX_BYTES.
+
+    The palettes can be used like a dict keyed by cover hash, which is what
+    ``batch_cover_colours`` expects."""
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = Path(root or settings.COVER_CACHE_DIR)
+        self.max_bytes = (
+            settings.COVER_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
+
+    @staticmethod
+    def digest(path):
+        with Path(path).open("rb") as fp:
+            return hashlib.file_digest(fp, "sha256").hexdigest()
+
+    @property
+    def palette_name(self):
+        # The sampling parameters change the palettes, so they are part of
+        # the file name; the UI colour targets only change what is picked.
+        return f"palette-{SPINE_CROP}-{CROP_VERTICAL}.json"
+
+    def path(self, digest, name):
+        return self.root / digest[:2] / digest / name
+
+    def get(self, digest, name):
+        """The cached file's path, or None on a miss."""
+        path = self.path(digest, name)
+        if not path.exists():
+            return None
+        path.parent.touch()
+        return path
+
+    def get_or_render(self, digest, name, render):
+        """The bytes of ``name``, calling ``render()`` for them on a miss."""
+        path = self.get(digest, name)
+        if path is None:
+            path = self.put(digest, name, render())
+        return path.read_bytes()
+
+    def put(self, digest, name, content):
+        path = self.path(digest, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write and rename, so concurrent readers never see a partial file.
+        partial = path.with_name(f".{name}.{os.getpid()}")
+        partial.write_bytes(content)
+        partial.replace(path)
+        return path
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits. Returns
+        the number of entries removed."""
+        entries = []
+        for entry in self.root.glob("*/*"):
+            size = sum(f.stat().st_size for f in entry.iterdir())
+            entries.append((entry.stat().st_mtime, size, entry))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def __contains__(self, digest):
+        return self.get(digest, self.palette_name) is not None
+
+    def __getitem__(self, digest):
+        path = self.get(digest, self.palette_name)
+        if path is None:
+            raise KeyError(digest)
+        return json.loads(path.read_text())
+
+    def __setitem__(self, digest, palettes):
+        self.put(digest, self.palette_name, json.dumps(palettes).encode())
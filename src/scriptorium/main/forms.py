@@ -8,12 +8,14 @@ from scriptorium.main.models import (
     ApiToken,
     Author,
     Book,
+    Job,
     Page,
     Poem,
     Quote,
     Read,
     Series,
     Tag,
+    book_search,
 )
 from scriptorium.main.utils import slugify
 
@@ -94,20 +96,7 @@ class CatalogueForm(forms.Form):
         if series := data.get("series"):
             qs = qs.filter(series__name=series)
         if search := data.get("search_input"):
-            text_search = (
-                Q(title__icontains=search)
-                | Q(title_slug__icontains=search)
-                | Q(primary_author__name__icontains=search)
-                | Q(additional_authors__name__icontains=search)
-                | Q(series__name__icontains=search)
-                | Q(isbn10=search)
-                | Q(isbn13=search)
-            )
-            if data.get("fulltext"):
-                text_search = (
-                    text_search | Q(text__icontains=search) | Q(plot__icontains=search)
-                )
-            qs = qs.filter(text_search)
+            qs = qs.filter(book_search(search, fulltext=bool(data.get("fulltext"))))
         if order_by := data.get("order_by"):
             if order_by in ("rating", "publication_year", "pages"):
                 order_by = f"-{order_by}"
@@ -264,11 +253,12 @@ class BookEditForm(forms.ModelForm):
 
     def save(self, *args, **kwargs):
         # TODO put all this in BookMixin
-        # download cover if necessary and recalculate spine colour
         # if part of a series, make sure series height is matching
-        if "cover_source" in self.changed_data:
-            self.instance.download_cover()
-        return super().save(*args, **kwargs)
+        result = super().save(*args, **kwargs)
+        if "cover_source" in self.changed_data and self.instance.cover_source:
+            # Also replaces an existing cover, which Book.save() leaves alone.
+            Job.objects.enqueue(Job.Kind.DOWNLOAD_COVER, self.instance)
+        return result
 
     class Meta:
         model = Book
@@ -318,13 +308,7 @@ class ReviewEditForm(ReviewForm):
         # action even when the text didn't change: it clears queued rereads.
         instance.mark_review_current()
         # The read-derived properties were cached when the form was built.
-        for prop in (
-            "dates_read_list",
-            "latest_date",
-            "date_read_lookup",
-            "did_not_finish",
-        ):
-            instance.__dict__.pop(prop, None)
+        instance.forget_read_summaries()
         return instance
 
 
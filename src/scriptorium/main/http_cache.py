@@ -0,0 +1,142 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS responses ("
+    "key TEXT PRIMARY KEY, status INTEGER NOT NULL, value TEXT NOT NULL, "
+    "fetched REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+)
+
+# Databases this process has set up, so later connections skip the DDL.
+_ready = set()
+
+# Keys being refetched by this process, so a burst of stale hits only
+# starts one background request.
+_revalidating = set()
+_revalidating_lock = threading.Lock()
+
+
+class HttpCache:
+    """Responses of upstream metadata services, kept in a small SQLite
+    database so every worker (and the next deploy) shares them.
+
+    ``fetch(key, endpoint, load)`` returns the cached ``(status, value)``
+    while it is fresh (the endpoint's HTTP_CACHE_TTLS entry, or
+    HTTP_CACHE_NEGATIVE_TTL for 404s). For HTTP_CACHE_STALE seconds after
+    that, the stale response is still returned while a background thread
+    calls ``load()`` for a new one. Older entries are loaded synchronously.
+    ``load()`` returns a ``(status, value)`` pair with a JSON-serialisable
+    value, and may raise to leave the cache untouched. Only successful and
+    not-found responses are stored.
+
+    The least recently used responses are dropped when the database holds
+    more than HTTP_CACHE_MAX_BYTES."""
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = Path(path or settings.HTTP_CACHE_PATH)
+        self.max_bytes = (
+            settings.HTTP_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        )
+
+    def connect(self):
+        if self.path not in _ready:
+            self.create_schema()
+        return sqlite3.connect(self.path, timeout=10, isolation_level=None)
+
+    def create_schema(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(sqlite3.connect(self.path, timeout=10)) as connection:
+            # The journal mode is stored in the database file.
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+        _ready.add(self.path)
+
+    def get(self, key):
+        """``(status, value, fetched)`` of the cached response, or None."""
+        with closing(self.connect()) as connection:
+            row = connection.execute(
+                "SELECT status, value, fetched FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            connection.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+        status, value, fetched = row
+        return status, json.loads(value), fetched
+
+    def set(self, key, status, value):
+        value = json.dumps(value)
+        now = time.time()
+        with closing(self.connect()) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, status, value, now, now, len(key) + len(value)),
+            )
+            self.evict(connection)
+
+    def evict(self, connection):
+        total = connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        expired = []
+        for key, size in connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ):
+            if total <= self.max_bytes:
+                break
+            expired.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM responses WHERE key = ?", expired)
+
+    def load(self, key, load):
+        status, value = load()
+        if status < 400 or status == 404:
+            self.set(key, status, value)
+        return status, value
+
+    def fetch(self, key, endpoint, load):
+        cached = self.get(key)
+        if cached is not None:
+            status, value, fetched = cached
+            ttl = (
+                settings.HTTP_CACHE_NEGATIVE_TTL
+                if status == 404
+                else settings.HTTP_CACHE_TTLS[endpoint]
+            )
+            age = time.time() - fetched
+            if age < ttl:
+                return status, value
+            if age < ttl + settings.HTTP_CACHE_STALE:
+                self.revalidate(key, load)
+                return status, value
+        return self.load(key, load)
+
+    def revalidate(self, key, load):
+        with _revalidating_lock:
+            if key in _revalidating:
+                return
+            _revalidating.add(key)
+
+        def run():
+            try:
+                self.load(key, load)
+            except Exception:
+                # The stale response stays until the next attempt.
+                logger.exception("Revalidating %s failed", key)
+            finally:
+                with _revalidating_lock:
+                    _revalidating.discard(key)
+
+        threading.Thread(target=run, name="http-cache-revalidate", daemon=True).start()
@@ -0,0 +1,559 @@
+import datetime as dt
+from collections import defaultdict
+from typing import Literal
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+from ninja import Field, Schema
+from pydantic import ValidationError, field_validator, model_validator
+
+from scriptorium.main.models import (
+    Author,
+    Book,
+    BookStatus,
+    Highlight,
+    KoreaderSyncJob,
+    Read,
+    Series,
+    Spine,
+)
+from scriptorium.main.utils import slugify
+
+
+class KoreaderHighlightIn(Schema):
+    """One highlight as the KOReader plugin sends it -- stored as a
+    ``Highlight`` row and handed back in ``Read.highlights`` in this very
+    shape, so it is the stable contract the CLI and AI-drafting consumers
+    read later."""
+
+    text: str = Field(min_length=1)
+    note: str | None = None
+    chapter: str | None = None
+    datetime: str | None = Field(
+        None,
+        description="KOReader's 'YYYY-MM-DD HH:MM:SS' stamp; compared against "
+        "the highlights watermark. Cut to 32 characters",
+    )
+    pageno: int | None = None
+    color: str | None = Field(None, description="Cut to 32 characters")
+    drawer: str | None = Field(None, description="Cut to 32 characters")
+
+    @field_validator("datetime", "color", "drawer", mode="before")
+    @classmethod
+    def truncate(cls, value):
+        # Sized like the Highlight columns; a plugin or device quirk sending
+        # more shouldn't cost the highlight.
+        return value[:32] if isinstance(value, str) else value
+
+
+class KoreaderBookIn(Schema):
+    md5: str = Field(
+        min_length=32,
+        max_length=32,
+        description="KOReader's partial MD5 of the book file",
+    )
+    title: str = Field(min_length=1)
+    authors: list[str] = []
+    language: str | None = None
+    series: str | None = None
+    series_index: int | float | str | None = None
+    identifiers: list[str] = Field(
+        [], description="The EPUB's dc:identifier entries (ISBN:..., uuid:..., ...)"
+    )
+    pages: int | None = None
+    status: Literal["complete", "abandoned"] = "complete"
+    rating: int | None = Field(None, ge=1, le=5)
+    summary_note: str | None = None
+    finished_on: dt.date
+    started_on: dt.date | None = None
+    total_time_seconds: int | None = None
+    highlights: list[KoreaderHighlightIn] = Field(
+        [], description="Invalid highlights are skipped with a warning"
+    )
+
+    _highlights_skipped: int = 0
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def skip_invalid_highlights(cls, data, handler):
+        """Drop highlights that fail validation instead of rejecting the
+        whole push: KOReader would resend it, and fail, forever."""
+        skipped = 0
+        if isinstance(data, dict) and isinstance(data.get("highlights"), list):
+            highlights = []
+            for highlight in data["highlights"]:
+                try:
+                    highlights.append(KoreaderHighlightIn.model_validate(highlight))
+                except ValidationError:
+                    skipped += 1
+            data = {**data, "highlights": highlights}
+        book = handler(data)
+        book._highlights_skipped = skipped  # noqa: SLF001 -- set on construction
+        return book
+
+    @property
+    def highlights_skipped(self):
+        return self._highlights_skipped
+
+
+class KoreaderDeviceIn(Schema):
+    id: str | None = None
+    model: str | None = None
+
+
+class KoreaderSyncIn(Schema):
+    plugin_version: str
+    device: KoreaderDeviceIn | None = None
+    books: list[KoreaderBookIn] = Field(min_length=1)
+
+
+def _extract_isbns(identifiers):
+    """Pull normalized ISBN-10/13 strings out of the EPUB's identifier soup
+    (``ISBN:...``, ``urn:isbn:...``, raw digit strings; hyphens/spaces
+    removed). Anything else (uuid:, calibre:, ...) is ignored."""
+    isbns = []
+    for identifier in identifiers:
+        value = identifier.strip()
+        lowered = value.lower()
+        for prefix in ("urn:isbn:", "isbn:"):
+            if lowered.startswith(prefix):
+                value = value[len(prefix) :]
+                break
+        candidate = value.replace("-", "").replace(" ", "").upper()
+        is_isbn13 = len(candidate) == 13 and candidate.isdigit()
+        is_isbn10 = (
+            len(candidate) == 10
+            and candidate[:9].isdigit()
+            and (candidate[9].isdigit() or candidate[9] == "X")
+        )
+        if is_isbn13 or is_isbn10:
+            isbns.append(candidate)
+    return isbns
+
+
+def _series_position(series_index):
+    """Calibre series indexes arrive as int, float, or string; Book stores a
+    short string. Integral floats lose their pointless '.0'."""
+    if series_index in (None, ""):
+        return None
+    if isinstance(series_index, float) and series_index.is_integer():
+        series_index = int(series_index)
+    return str(series_index)[:10]
+
+
+def _author_name(payload):
+    """The first non-blank author, or 'Unknown' for books without any."""
+    return next((author for author in payload.authors if author.strip()), "Unknown")
+
+
+def _device_notes(payload):
+    """The device's free-text note plus its star rating, destined for
+    Read.notes -- input for the eventual review, never for Book.rating."""
+    parts = []
+    if payload.summary_note and payload.summary_note.strip():
+        parts.append(payload.summary_note.strip())
+    if payload.rating:
+        parts.append(f"KOReader rating: {payload.rating}/5")
+    return "\n\n".join(parts) or None
+
+
+def _error(payload, exc):
+    """A book's ``error`` result; validation errors read like form errors."""
+    detail = (
+        "; ".join(exc.messages)
+        if isinstance(exc, DjangoValidationError)
+        else str(exc) or exc.__class__.__name__
+    )
+    return {"md5": payload.md5, "action": "error", "detail": detail}
+
+
+class _SyncBatch:
+    """Matches and upserts a whole push at once. Every md5, ISBN and
+    author/title slug of the batch is resolved with one ``IN`` query each up
+    front; books are then matched in memory in payload order, so later books
+    see the books and reads that earlier ones create, and nothing is written
+    until every book validated. The writes themselves are bulk statements."""
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.isbns = [_extract_isbns(payload.identifiers) for payload in payloads]
+        # One canonical instance per book row, whichever lookup found it.
+        self.books = {}
+        self.new_books = []
+        self.new_authors = []
+        self.new_series = []
+        self.promoted_books = []
+        self.new_reads = []
+        self.updated_reads = []
+        self.reads = {}
+        self.new_highlights = []
+        self.highlight_hashes = defaultdict(set)
+        self.watermarks = {}
+
+        self.by_md5 = {}
+        for read in Read.objects.filter(
+            koreader_md5__in={payload.md5 for payload in payloads}
+        ).select_related("book__primary_author"):
+            # Like a .first() per md5: the latest read wins.
+            self.by_md5.setdefault(read.koreader_md5, self._canonical(read.book))
+
+        all_isbns = {isbn for isbns in self.isbns for isbn in isbns}
+        self.by_isbn = {}
+        for book in (
+            Book.all_objects.filter(Q(isbn13__in=all_isbns) | Q(isbn10__in=all_isbns))
+            .select_related("primary_author")
+            .order_by("pk")
+        ):
+            self._index_isbns(self._canonical(book))
+
+        title_slugs = {slugify(payload.title) for payload in payloads}
+        author_slugs = {slugify(_author_name(payload)) for payload in payloads}
+        self.by_slug = {
+            (book.primary_author.name_slug, book.title_slug): self._canonical(book)
+            for book in Book.all_objects.filter(
+                primary_author__name_slug__in=author_slugs, title_slug__in=title_slugs
+            ).select_related("primary_author")
+        }
+        self.authors = {
+            author.name_slug: author
+            for author in Author.objects.filter(name_slug__in=author_slugs)
+        }
+        self.series = {
+            series.name_slug: series
+            for series in Series.objects.filter(
+                name_slug__in={
+                    slugify(payload.series) for payload in payloads if payload.series
+                }
+            )
+        }
+
+    def _canonical(self, book):
+        return self.books.setdefault(book.pk, book)
+
+    def _index_isbns(self, book):
+        for isbn in (book.isbn13, book.isbn10):
+            if isbn:
+                self.by_isbn.setdefault(isbn, book)
+
+    def _age(self, book):
+        """Sort key mirroring primary key order: stored books before the
+        ones this batch creates, which are created in payload order."""
+        if book.pk is not None:
+            return (0, book.pk)
+        return (1, self.new_books.index(book))
+
+    def match(self, payload, isbns, warnings):
+        """The matching chain: known device file (md5) -> ISBN -> slug match
+        or auto-create into the review queue. Returns (book, created)."""
+        book = self.by_md5.get(payload.md5)
+        if book:
+            return book, False
+        if isbns:
+            candidates = [self.by_isbn[isbn] for isbn in isbns if isbn in self.by_isbn]
+            if candidates:
+                return min(candidates, key=self._age), False
+            warnings.append("ISBN not in library; matched by title/author")
+        else:
+            warnings.append("no ISBN found; matched by title/author")
+        title_slug = slugify(payload.title)
+        if not title_slug:
+            # Books are keyed on their slug; a title that slugifies to nothing
+            # (all punctuation, non-Latin scripts) would collide with every
+            # other such book. Better an explicit per-book error.
+            raise DjangoValidationError(
+                f"Cannot derive a catalogue slug from title {payload.title!r}."
+            )
+        author_name = _author_name(payload)
+        if not any(author.strip() for author in payload.authors):
+            warnings.append("no author in metadata; filed under 'Unknown'")
+        author_slug = slugify(author_name)
+        book = self.by_slug.get((author_slug, title_slug))
+        if book:
+            # Like queue_for_review: a to-read book moves into the review
+            # queue, and is otherwise never mutated by device metadata.
+            if book.status == BookStatus.TO_READ:
+                book.status = BookStatus.TO_REVIEW
+                self.promoted_books.append(book)
+            return book, False
+
+        author = self.authors.get(author_slug)
+        if author is None:
+            author = Author(name=author_name, name_slug=author_slug)
+            self.authors[author_slug] = author
+            self.new_authors.append(author)
+        series = None
+        if payload.series:
+            series_slug = slugify(payload.series)
+            series = self.series.get(series_slug)
+            if series is None:
+                series = Series(name=payload.series, name_slug=series_slug)
+                self.series[series_slug] = series
+                self.new_series.append(series)
+        # Device metadata only ever fills in a *new* book.
+        book = Book(
+            title=payload.title,
+            title_slug=title_slug,
+            primary_author=author,
+            status=BookStatus.TO_REVIEW,
+            series=series,
+            series_position=_series_position(payload.series_index),
+            source="koreader",
+            isbn13=next((isbn for isbn in isbns if len(isbn) == 13), None),
+            isbn10=next((isbn for isbn in isbns if len(isbn) == 10), None),
+            pages=payload.pages,
+        )
+        self.new_books.append(book)
+        self.by_slug[(author_slug, title_slug)] = book
+        self._index_isbns(book)
+        return book, True
+
+    def load_reads(self, books):
+        """Fetch the reads the upserts may touch, for all matched books at
+        once, keyed like the upsert looks them up."""
+        for read in Read.objects.filter(
+            book_id__in={book.pk for book in books if book.pk is not None},
+            finished_on__in={payload.finished_on for payload in self.payloads},
+        ).order_by("pk"):
+            key = (id(self.books[read.book_id]), read.koreader_md5, read.finished_on)
+            self.reads.setdefault(key, read)
+
+    def load_highlights(self, books):
+        """Fetch the content hashes and stamps of the matched books' stored
+        highlights, for deduplication and the watermark."""
+        for book_id, content_hash, stamp in Highlight.objects.filter(
+            book_id__in={book.pk for book in books if book.pk is not None}
+        ).values_list("book_id", "content_hash", "datetime"):
+            key = id(self.books[book_id])
+            self.highlight_hashes[key].add(content_hash)
+            self._raise_watermark(key, stamp)
+
+    def _raise_watermark(self, key, stamp):
+        if stamp and stamp > self.watermarks.get(key, ""):
+            self.watermarks[key] = stamp
+
+    def upsert_read(self, book, payload):
+        """Idempotent read upsert keyed on (koreader_md5, finished_on): re-pushes
+        update in place, a manually logged read on the same date gets adopted,
+        otherwise a new Read is created -- with Read.objects.bulk_ingest's
+        reread feed-date semantics."""
+        notes = _device_notes(payload)
+        did_not_finish = payload.status == "abandoned"
+        key = (id(book), payload.md5, payload.finished_on)
+
+        read = self.reads.get(key)
+        if read:
+            read.started_on = payload.started_on
+            read.total_time_seconds = payload.total_time_seconds
+            read.did_not_finish = did_not_finish
+            if notes:
+                # A device without a note never wipes existing notes.
+                read.notes = notes
+            self._mark_updated(read)
+            return read, True
+
+        read = self.reads.pop((id(book), None, payload.finished_on), None)
+        if read:
+            # A read logged manually before the device pushed: adopt it instead
+            # of creating a same-day duplicate. Manually entered notes win.
+            read.koreader_md5 = payload.md5
+            read.started_on = read.started_on or payload.started_on
+            read.total_time_seconds = payload.total_time_seconds
+            read.format = read.format or Read.Format.EBOOK
+            read.notes = read.notes or notes
+            self.reads[key] = read
+            self._mark_updated(read)
+            return read, True
+
+        read = Read(
+            book=book,
+            finished_on=payload.finished_on,
+            started_on=payload.started_on,
+            did_not_finish=did_not_finish,
+            format=Read.Format.EBOOK,
+            source="koreader",
+            total_time_seconds=payload.total_time_seconds,
+            koreader_md5=payload.md5,
+            notes=notes,
+        )
+        # The book may not be saved yet; it exists by construction.
+        read.full_clean(exclude=["book"])
+        self.reads[key] = read
+        self.new_reads.append(read)
+        return read, False
+
+    def add_highlights(self, book, read, payload):
+        """Queue the push's highlights the book doesn't have yet, attributed
+        to ``read``. Returns the (stored, duplicate) counts."""
+        key = id(book)
+        known = self.highlight_hashes[key]
+        stored = 0
+        for highlight in payload.highlights:
+            content_hash = Highlight.hash_content(
+                highlight.text, highlight.chapter, highlight.pageno
+            )
+            if content_hash in known:
+                continue
+            known.add(content_hash)
+            self.new_highlights.append(
+                Highlight(
+                    book=book,
+                    read=read,
+                    content_hash=content_hash,
+                    **highlight.model_dump(),
+                )
+            )
+            self._raise_watermark(key, highlight.datetime)
+            stored += 1
+        return stored, len(payload.highlights) - stored
+
+    def _mark_updated(self, read):
+        if read.pk is not None and read not in self.updated_reads:
+            self.updated_reads.append(read)
+
+    def write(self):
+        Author.objects.bulk_create(self.new_authors)
+        Series.objects.bulk_create(self.new_series)
+        Book.all_objects.bulk_create(self.new_books)
+        # bulk_create skips Book.save(), which stores the shelf layout.
+        for book in self.new_books:
+            book.shelf_layout = Spine(book).layout
+            book.snapshot_fields()
+        Book.all_objects.bulk_update(self.new_books, ["shelf_layout"])
+        if self.promoted_books:
+            # One query for all promoted books, like the other bulk writes.
+            Book.all_objects.filter(
+                pk__in=[book.pk for book in self.promoted_books]
+            ).update(status=BookStatus.TO_REVIEW)
+            for book in self.promoted_books:
+                book.snapshot_fields(["status"])
+        Read.objects.bulk_ingest(self.new_reads)
+        Read.objects.bulk_update(
+            self.updated_reads,
+            [
+                "koreader_md5",
+                "started_on",
+                "total_time_seconds",
+                "did_not_finish",
+                "format",
+                "notes",
+            ],
+        )
+        Highlight.objects.bulk_create(self.new_highlights)
+
+    def _isolate_errors(self):
+        """After the bulk write failed: apply the books one by one, like a
+        push of their own, to report the ones that fail. Everything is
+        rolled back again."""
+        errors = []
+        with transaction.atomic():
+            for payload in self.payloads:
+                errors += _SyncBatch([payload]).apply()[1]
+            transaction.set_rollback(True)
+        return errors
+
+    def apply(self):
+        """Match and upsert every book, returning ``(results, errors)``. Any
+        error leaves the database untouched and reports every failing book,
+        in payload order."""
+        errors = {}
+        matches = {}
+        for index, (payload, isbns) in enumerate(
+            zip(self.payloads, self.isbns, strict=True)
+        ):
+            warnings = []
+            if skipped := payload.highlights_skipped:
+                warnings.append(f"skipped {skipped} invalid highlights")
+            try:
+                book, created = self.match(payload, isbns, warnings)
+            except Exception as exc:  # noqa: BLE001 -- collect per-book errors, fail the batch below
+                errors[index] = exc
+                continue
+            matches[index] = (book, created, warnings)
+            # The device file is known from here on, like after a per-book
+            # write: a later copy of it matches this book, not a new one.
+            self.by_md5.setdefault(payload.md5, book)
+        matched_books = [book for book, _, _ in matches.values()]
+        self.load_reads(matched_books)
+        self.load_highlights(matched_books)
+        upserts = {}
+        for index, (book, _, _) in matches.items():
+            payload = self.payloads[index]
+            try:
+                read, updated = self.upsert_read(book, payload)
+            except Exception as exc:  # noqa: BLE001 -- collect per-book errors, fail the batch below
+                errors[index] = exc
+                continue
+            upserts[index] = (read, updated, *self.add_highlights(book, read, payload))
+        if errors:
+            return [], [
+                _error(self.payloads[index], errors[index]) for index in sorted(errors)
+            ]
+        try:
+            # A savepoint, so a failed write leaves the connection usable.
+            with transaction.atomic():
+                self.write()
+        except Exception as exc:
+            if len(self.payloads) == 1:
+                return [], [_error(self.payloads[0], exc)]
+            if book_errors := self._isolate_errors():
+                return [], book_errors
+            raise
+        results = []
+        for index, (book, created, warnings) in matches.items():
+            read, updated, stored, duplicate = upserts[index]
+            if created:
+                action = "created_book"
+            elif updated:
+                action = "updated_read"
+            else:
+                action = "matched"
+            results.append(
+                {
+                    "md5": self.payloads[index].md5,
+                    "action": action,
+                    "book": book.slug,
+                    "read_id": read.pk,
+                    "highlights_stored": stored,
+                    "highlights_duplicate": duplicate,
+                    "highlights_watermark": self.watermarks.get(id(book)),
+                    "warnings": warnings,
+                }
+            )
+        return results, []
+
+
+def apply_books(books):
+    """Match and upsert ``books`` (KoreaderBookIn) in one transaction, like
+    a push, returning ``(results, errors)``."""
+    with transaction.atomic():
+        return _SyncBatch(books).apply()
+
+
+def run_sync_job(job):
+    """Apply a stored push exactly like the synchronous endpoint would --
+    all-or-nothing, per-book errors on failure -- and record the outcome on
+    the job. Returns False if another worker claimed the job first."""
+    claimed = KoreaderSyncJob.objects.filter(
+        pk=job.pk, status=KoreaderSyncJob.Status.PENDING
+    ).update(status=KoreaderSyncJob.Status.RUNNING, claimed=now())
+    if not claimed:
+        return False
+    try:
+        # Stored pushes can predate the current schema's constraints.
+        payload = KoreaderSyncIn.model_validate(job.payload)
+        results, errors = apply_books(payload.books)
+    except Exception:
+        # Don't leave the job running forever; the device sees it failed.
+        KoreaderSyncJob.objects.filter(pk=job.pk).update(
+            status=KoreaderSyncJob.Status.FAILED, finished=now()
+        )
+        raise
+    job.status = (
+        KoreaderSyncJob.Status.FAILED if errors else KoreaderSyncJob.Status.DONE
+    )
+    job.results = errors or results
+    job.finished = now()
+    job.save(update_fields=["status", "results", "finished"])
+    return True
@@ -0,0 +1,154 @@
+import json
+from contextlib import contextmanager
+from itertools import groupby, islice
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+
+from scriptorium.main.models import (
+    Author,
+    Book,
+    BookRelation,
+    Highlight,
+    Page,
+    Poem,
+    Quote,
+    Read,
+    Series,
+    Tag,
+)
+
+# In dependency order, so an import never references a row it hasn't
+# written yet. The many-to-many tables are exported as their own records.
+EXPORT_MODELS = (
+    Author,
+    Series,
+    Tag,
+    Book,
+    Book.additional_authors.through,
+    Book.tags.through,
+    BookRelation,
+    Read,
+    Highlight,
+    Quote,
+    Poem,
+    Page,
+)
+CHUNK_SIZE = 2000
+
+
+def _fields(model):
+    return [field for field in model._meta.concrete_fields if not field.primary_key]
+
+
+@contextmanager
+def _snapshot():
+    """Read in one transaction, so the export's queries all see the same
+    database: a write in between could otherwise export reads of books the
+    export doesn't have. PostgreSQL needs REPEATABLE READ for that. SQLite
+    in WAL mode gives every transaction a consistent view as of its first
+    read, but only for as long as the transaction lasts -- it is started
+    deferred here, so writers aren't locked out while the export streams.
+    Inside an outer transaction, that transaction decides what is seen."""
+    if connection.in_atomic_block:
+        yield
+        return
+    if connection.vendor == "sqlite":
+        connection.ensure_connection()
+        mode, connection.transaction_mode = connection.transaction_mode, "DEFERRED"
+        try:
+            with transaction.atomic():
+                connection.transaction_mode = mode
+                yield
+        finally:
+            connection.transaction_mode = mode
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        yield
+
+
+def export_library():
+    """The library as NDJSON lines of ``{"model", "pk", "fields"}`` objects
+    (like Django's jsonl serializer, with foreign keys as ids), streamed
+    from chunked queries so memory use doesn't grow with the library, all
+    read from one snapshot of the database. Cover files are referenced by
+    name, not included."""
+    with _snapshot():
+        for model in EXPORT_MODELS:
+            attnames = [field.attname for field in _fields(model)]
+            rows = (
+                model._base_manager.order_by("pk")
+                .values_list("pk", *attnames)
+                .iterator(chunk_size=CHUNK_SIZE)
+            )
+            for pk, *values in rows:
+                record = {
+                    "model": model._meta.label_lower,
+                    "pk": pk,
+                    "fields": dict(zip(attnames, values, strict=True)),
+                }
+                yield json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+
+
+def import_library(lines, batch_size=CHUNK_SIZE):
+    """Replay an export_library stream: every record is upserted by its
+    primary key, so importing the same stream again changes nothing, and a
+    newer export updates the rows in place. Runs in one transaction, with
+    one bulk statement per batch of records of a model. Returns the number
+    of records per model label."""
+    records = (json.loads(line) for line in lines if line.strip())
+    exported = {model._meta.label_lower: model for model in EXPORT_MODELS}
+    counts = {}
+    with transaction.atomic():
+        for label, group in groupby(records, key=lambda record: record["model"]):
+            if label not in exported:
+                raise ValueError(f"{label} records are not part of a library export")
+            model = exported[label]
+            fields = _fields(model)
+            # bulk_create() stamps these with the current date.
+            stamped = [
+                field
+                for field in fields
+                if getattr(field, "auto_now", False)
+                or getattr(field, "auto_now_add", False)
+            ]
+            while batch := list(islice(group, batch_size)):
+                values = [
+                    {
+                        field.attname: field.to_python(record["fields"][field.attname])
+                        for field in fields
+                    }
+                    for record in batch
+                ]
+                objects = [
+                    model(pk=record["pk"], **row)
+                    for record, row in zip(batch, values, strict=True)
+                ]
+                if model._meta.auto_created:
+                    # Many-to-many rows have nothing to update.
+                    model._base_manager.bulk_create(objects, ignore_conflicts=True)
+                else:
+                    model._base_manager.bulk_create(
+                        objects,
+                        update_conflicts=True,
+                        unique_fields=[model._meta.pk.name],
+                        update_fields=[field.name for field in fields],
+                    )
+                if stamped:
+                    for obj, row in zip(objects, values, strict=True):
+                        for field in stamped:
+                            setattr(obj, field.attname, row[field.attname])
+                    model._base_manager.bulk_update(
+                        objects, [field.name for field in stamped]
+                    )
+                counts[label] = counts.get(label, 0) + len(objects)
+        # Databases with sequences (PostgreSQL) continue after the imported ids.
+        with connection.cursor() as cursor:
+            for statement in connection.ops.sequence_reset_sql(
+                no_style(), EXPORT_MODELS
+            ):
+                cursor.execute(statement)
+    return counts
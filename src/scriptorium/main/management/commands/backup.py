@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from scriptorium.main.backup import Backups
+
+
+class Command(BaseCommand):
+    help = "Snapshot the database and media to BACKUP_DIR, removing old snapshots"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--no-media", action="store_true")
+        parser.add_argument(
+            "--keep-days",
+            type=int,
+            help="Remove snapshots older than this (default: BACKUP_KEEP_DAYS)",
+        )
+
+    def handle(self, *args, no_media, keep_days, **options):
+        if connection.vendor != "sqlite":
+            # Deploys back up before migrating; PostgreSQL has pg_dump for that.
+            print(
+                f"Skipping backup: {connection.vendor} databases are backed up "
+                "with their own tools (pg_dump)."
+            )
+            return
+        backups = Backups()
+        snapshot, stored = backups.create(media=not no_media)
+        removed = backups.rotate(keep_days)
+        print(
+            f"{snapshot}: {stored} media files copied, {removed} old snapshots removed"
+        )
@@ -0,0 +1,141 @@
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = """
+CREATE TABLE book (id INTEGER PRIMARY KEY, title TEXT, pages INTEGER);
+CREATE TABLE read (id INTEGER PRIMARY KEY, book_id INTEGER, finished_on TEXT);
+CREATE INDEX read_book ON read (book_id);
+"""
+READ_QUERY = """
+SELECT book.title, count(read.id) FROM book
+LEFT JOIN read ON read.book_id = book.id
+WHERE book.id BETWEEN ? AND ? + 50 GROUP BY book.id
+"""
+
+
+def connect(path, tuned):
+    """A connection like Django's: Python's default five second timeout,
+    or the configured profile."""
+    if not tuned:
+        return sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    connection = sqlite3.connect(
+        path,
+        timeout=settings.SQLITE_BUSY_TIMEOUT,
+        check_same_thread=False,
+        isolation_level=None,
+    )
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.execute(f"PRAGMA {name}={value}")
+    return connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure concurrent reads while a writer holds long transactions, with "
+        "SQLite's defaults and with the SQLITE_PRAGMAS profile"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5)
+        parser.add_argument("--readers", type=int, default=4)
+        parser.add_argument("--books", type=int, default=200_000)
+        parser.add_argument(
+            "--write-ms",
+            type=float,
+            default=50,
+            help="How long each write transaction keeps the lock",
+        )
+
+    def handle(self, *args, seconds, readers, books, write_ms, **options):
+        for name, tuned in (("default", False), ("tuned", True)):
+            with tempfile.TemporaryDirectory() as directory:
+                result = self.run(
+                    Path(directory) / "bench.sqlite3",
+                    tuned,
+                    seconds,
+                    readers,
+                    books,
+                    write_ms / 1000,
+                )
+            latencies = sorted(result["latencies"]) or [0]
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            print(
+                f"{name:>8}: {len(result['latencies']) / seconds:8.0f} reads/s "
+                f"(median {statistics.median(latencies) * 1000:.2f} ms, "
+                f"p99 {p99 * 1000:.2f} ms, max {latencies[-1] * 1000:.2f} ms, "
+                f"{result['read_errors']} failed), "
+                f"{result['writes'] / seconds:.0f} writes/s "
+                f"({result['write_errors']} failed)"
+            )
+
+    def run(self, path, tuned, seconds, readers, books, write_seconds):
+        setup = connect(path, tuned)
+        setup.executescript(SCHEMA)
+        setup.executemany(
+            "INSERT INTO book (id, title, pages) VALUES (?, ?, ?)",
+            ((i, f"Book {i}", 100 + i % 500) for i in range(books)),
+        )
+        setup.close()
+        result = {"latencies": [], "read_errors": 0, "writes": 0, "write_errors": 0}
+        lock = threading.Lock()
+        stop = threading.Event()
+
+        def read():
+            connection = connect(path, tuned)
+            offset = 0
+            while not stop.is_set():
+                offset = (offset + 997) % books
+                start = time.perf_counter()
+                try:
+                    connection.execute(READ_QUERY, (offset, offset)).fetchall()
+                except sqlite3.OperationalError:
+                    with lock:
+                        result["read_errors"] += 1
+                    continue
+                with lock:
+                    result["latencies"].append(time.perf_counter() - start)
+            connection.close()
+
+        def write():
+            connection = connect(path, tuned)
+            book = 0
+            while not stop.is_set():
+                try:
+                    connection.execute("BEGIN IMMEDIATE")
+                    for _ in range(500):
+                        # Spread over the table, like a sync touching many books.
+                        book = (book + 7919) % books
+                        connection.execute(
+                            "INSERT INTO read (book_id, finished_on) "
+                            "VALUES (?, date('now'))",
+                            (book,),
+                        )
+                        connection.execute(
+                            "UPDATE book SET pages = pages + 1 WHERE id = ?", (book,)
+                        )
+                    # A sync or a wizard save does more than write rows.
+                    time.sleep(write_seconds)
+                    connection.execute("COMMIT")
+                    result["writes"] += 1
+                except sqlite3.OperationalError:
+                    result["write_errors"] += 1
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+            connection.close()
+
+        threads = [threading.Thread(target=read) for _ in range(readers)]
+        threads.append(threading.Thread(target=write))
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return result
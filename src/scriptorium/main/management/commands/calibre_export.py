@@ -4,18 +4,36 @@ from pathlib import Path
 
 from django.core.management.base import BaseCommand
 
+from scriptorium.main.calibre import CalibreLibrary
+
 
 class Command(BaseCommand):
-    help = "Closes the specified poll for voting"
+    help = "Export the on-device to-read queue from Calibre for calibre_import"
 
-    def handle(self, *args, **options):
-        query = '\'tags:"=on-device" tags:"to-read"\''
-        result = subprocess.check_output(  # noqa: S602
-            f"calibredb list -s {query} --fields authors,title,*pages,*shelf --for-machine",
-            shell=True,
-            env={},
-        ).decode()
-        with Path("calibre_books.json").open("w") as f:
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--library",
+            help="Read this Calibre library's metadata.db instead of calling calibredb",
+        )
+
+    def handle(self, *args, library=None, **options):
+        if library:
+            books = CalibreLibrary(library).queue()
+        else:
+            result = subprocess.check_output(  # noqa: S603
+                [  # noqa: S607
+                    "calibredb",
+                    "list",
+                    "-s",
+                    'tags:"=on-device" tags:"to-read"',
+                    "--fields",
+                    "authors,title,*pages,*shelf,cover",
+                    "--for-machine",
+                ],
+                env={},
+            ).decode()
             # Round-trip through json to make sure it's valid
-            json.dump(json.loads(result), f)
+            books = json.loads(result)
+        with Path("calibre_books.json").open("w") as f:
+            json.dump(books, f)
             print("Wrote calibre_books.json")
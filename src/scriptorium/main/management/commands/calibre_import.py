@@ -1,61 +1,116 @@
 import json
 from pathlib import Path
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
 
-from scriptorium.main.models import Author, Book, BookStatus
+from scriptorium.main.calibre import CalibreLibrary, import_covers
+from scriptorium.main.models import Author, Book, BookStatus, Spine
 from scriptorium.main.utils import slugify
 
 
 class Command(BaseCommand):
-    help = "Sync the to-read queue from a calibre_export JSON file"
+    help = (
+        "Sync the to-read queue from a calibre_export JSON file, or directly "
+        "from a Calibre library's metadata.db"
+    )
 
     def add_arguments(self, parser):
-        parser.add_argument("json_file")
+        parser.add_argument("json_file", nargs="?")
+        parser.add_argument(
+            "--library",
+            help="Calibre library directory (or its metadata.db) to read instead",
+        )
+        parser.add_argument(
+            "--state",
+            default=settings.DATA_DIR / "calibre_sync.json",
+            type=Path,
+            help="Where to remember the library version for incremental runs",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Sync even if the library did not change since the last run",
+        )
 
-    def handle(self, *args, json_file, **options):
-        with Path(json_file).open() as f:
-            result = json.load(f)
+    def handle(self, *args, json_file, library, state, force, **options):
+        if bool(json_file) == bool(library):
+            raise CommandError("Pass either a JSON file or --library.")
+        if json_file:
+            with Path(json_file).open() as f:
+                self.sync(json.load(f))
+            return
+        library = CalibreLibrary(library)
+        version = library.version()
+        if not force and state.exists() and json.loads(state.read_text()) == version:
+            print("Calibre library unchanged since the last sync")
+            return
+        self.sync(library.queue())
+        state.write_text(json.dumps(version))
+
+    def sync(self, result):
         # Authors (and titles) are deduplicated by slug on import, so the
         # stored spelling can differ from calibre's -- key both sides on
         # slugs to keep the comparison stable across spelling variants.
         calibre_books = {
             (slugify(b["title"]), slugify(b["authors"])): b for b in result
         }
-        queue = Book.all_objects.filter(status=BookStatus.TO_READ).select_related(
-            "primary_author"
-        )
         scriptorium_books = {
             (
                 b.title_slug or slugify(b.title),
                 b.primary_author.name_slug or slugify(b.primary_author.name),
-            ): b.id
-            for b in queue
+            ): b
+            for b in Book.all_objects.filter(status=BookStatus.TO_READ).select_related(
+                "primary_author"
+            )
         }
-        unknown = set(calibre_books) - set(scriptorium_books)
-        too_many = set(scriptorium_books) - set(calibre_books)
+        unknown = [key for key in calibre_books if key not in scriptorium_books]
+        too_many = [
+            b.pk for key, b in scriptorium_books.items() if key not in calibre_books
+        ]
+        # Books that left the queue (read, or reviewed) keep their slugs.
+        taken = set(
+            Book.all_objects.values_list("title_slug", "primary_author__name_slug")
+        )
 
         with transaction.atomic():
-            Book.all_objects.filter(
-                id__in=(v for k, v in scriptorium_books.items() if k in too_many)
-            ).delete()
+            Book.all_objects.filter(id__in=too_many).delete()
+            author_slugs = {author_slug for _, author_slug in unknown}
+            authors = Author.objects.in_bulk(author_slugs, field_name="name_slug")
+            new_authors = {}
             for key in unknown:
-                calibre_book = calibre_books[key]
-                author, _ = Author.objects.get_or_create_by_name(
-                    calibre_book["authors"]
-                )
-                title_slug = slugify(calibre_book["title"])
-                if Book.all_objects.filter(
-                    primary_author=author, title_slug=title_slug
-                ).exists():
-                    continue
-                Book.all_objects.create(
-                    title=calibre_book["title"],
-                    title_slug=title_slug,
-                    primary_author=author,
+                if key[1] not in authors:
+                    new_authors.setdefault(key[1], calibre_books[key]["authors"])
+            Author.objects.bulk_create(
+                Author(name=name, name_slug=name_slug)
+                for name_slug, name in new_authors.items()
+            )
+            authors = Author.objects.in_bulk(author_slugs, field_name="name_slug")
+            books = Book.all_objects.bulk_create(
+                Book(
+                    title=calibre_books[key]["title"],
+                    title_slug=key[0],
+                    primary_author=authors[key[1]],
                     status=BookStatus.TO_READ,
-                    shelf=calibre_book["*shelf"],
-                    pages=calibre_book.get("*pages", 0),
+                    shelf=calibre_books[key]["*shelf"],
+                    pages=calibre_books[key].get("*pages", 0),
                     source="calibre",
                 )
+                for key in unknown
+                if key not in taken
+            )
+            # bulk_create skips Book.save(), which stores the shelf layout.
+            for book in books:
+                book.shelf_layout = Spine(book).layout
+            Book.all_objects.bulk_update(books, ["shelf_layout"])
+
+        # Calibre keeps a cover.jpg next to every book, so the queue needs
+        # no cover downloads.
+        for book in books:
+            scriptorium_books[(book.title_slug, book.primary_author.name_slug)] = book
+        import_covers(
+            (scriptorium_books[key], calibre_book["cover"])
+            for key, calibre_book in calibre_books.items()
+            if calibre_book.get("cover") and key in scriptorium_books
+        )
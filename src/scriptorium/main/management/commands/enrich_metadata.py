@@ -0,0 +1,116 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from tqdm import tqdm
+
+from scriptorium.main.metadata import MetadataError, get_book_metadata, metadata_changes
+from scriptorium.main.models import Book
+
+
+def incomplete_books():
+    """Books missing pages, a publication year, ISBNs or a cover (like the
+    Tohuwabohu lists, but including the queue) that OpenLibrary or
+    Goodreads can be asked about."""
+    missing = (
+        Q(pages__isnull=True)
+        | Q(pages__lte=1)
+        | Q(publication_year__isnull=True)
+        | (
+            (Q(isbn13__isnull=True) | Q(isbn13=""))
+            & (Q(isbn10__isnull=True) | Q(isbn10=""))
+        )
+        | Q(cover__isnull=True)
+        | Q(cover="")
+    )
+    known = (
+        Q(openlibrary_id__gt="")
+        | Q(goodreads_id__gt="")
+        | Q(isbn13__gt="")
+        | Q(isbn10__gt="")
+    )
+    return Book.all_objects.filter(missing, known).order_by("pk")
+
+
+class Command(BaseCommand):
+    help = "Fill in missing book metadata from OpenLibrary and Goodreads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Print the changes instead of saving them",
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="Skip the books a previous run already looked up",
+        )
+        parser.add_argument(
+            "--state",
+            default=settings.DATA_DIR / "enrich_metadata.json",
+            type=Path,
+            help="Where to remember looked-up books for --resume",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=settings.OPENLIBRARY_WORKERS,
+            help="Concurrent lookups (the rate limits apply across all of them)",
+        )
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    def handle(self, *args, dry_run, resume, state, workers, batch_size, **options):
+        done = (
+            set(json.loads(state.read_text())) if resume and state.exists() else set()
+        )
+        books = [book for book in incomplete_books() if book.pk not in done]
+
+        def lookup(book):
+            try:
+                return book, get_book_metadata(book), None
+            except (MetadataError, requests.RequestException) as exc:
+                return book, [], exc
+
+        updated = failed = 0
+        progress = tqdm(total=len(books), unit="book", disable=not options["verbosity"])
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Lookups run ahead in the pool; every batch of results is
+            # written in one transaction, then remembered for --resume.
+            results = pool.map(lookup, books)
+            while batch := list(islice(results, batch_size)):
+                changed = []
+                for book, found, error in batch:
+                    if error:
+                        failed += 1
+                        tqdm.write(f"{book.pk} {book.title}: {error}")
+                        continue
+                    for data in found:
+                        for field, value in metadata_changes(book, data).items():
+                            if dry_run:
+                                old = getattr(book, field)
+                                tqdm.write(
+                                    f"{book.pk} {book.title}: {field}: {old!r} -> {value!r}"
+                                )
+                            setattr(book, field, value)
+                    if book.changed_fields:
+                        changed.append(book)
+                progress.update(len(batch))
+                if dry_run:
+                    updated += len(changed)
+                    continue
+                with transaction.atomic():
+                    for book in changed:
+                        book.save()
+                updated += len(changed)
+                done |= {book.pk for book, _, error in batch if not error}
+                state.write_text(json.dumps(sorted(done)))
+        progress.close()
+        verb = "Would update" if dry_run else "Updated"
+        print(f"{verb} {updated} of {len(books)} books, {failed} lookups failed")
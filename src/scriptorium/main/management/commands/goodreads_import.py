@@ -0,0 +1,231 @@
+import csv
+import datetime as dt
+import re
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from scriptorium.main.models import Author, Book, BookStatus, Read, Series, Spine
+from scriptorium.main.utils import slugify
+
+# Goodreads' exclusive shelves. Read books wait for their review here;
+# rows on custom exclusive shelves are skipped.
+SHELF_STATUS = {
+    "to-read": BookStatus.TO_READ,
+    "currently-reading": BookStatus.TO_READ,
+    "read": BookStatus.TO_REVIEW,
+}
+# "Title (Series, #2)" or "Title (Series #2.5)"
+SERIES_TITLE = re.compile(
+    r"^(?P<title>.+?)\s*\((?P<series>[^()]+?),?\s+#(?P<position>[\d.]+)\)$"
+)
+
+
+def _isbn(value):
+    """Goodreads quotes ISBNs as spreadsheet formulas: ``="0441478123"``."""
+    return value.strip('="') or None
+
+
+def _int(value):
+    return int(value) if value and value.isdigit() else None
+
+
+def _date(value):
+    """Goodreads dates look like 2024/05/01."""
+    return dt.date.fromisoformat(value.replace("/", "-")) if value else None
+
+
+def parse_row(row):
+    """One export row as the fields the import needs, or None if the
+    row can't be imported."""
+    status = SHELF_STATUS.get(row["Exclusive Shelf"])
+    if status is None:
+        return None
+    title, series, position = row["Title"].strip(), None, None
+    if match := SERIES_TITLE.match(title):
+        title, series, position = match["title"], match["series"], match["position"]
+    author = row["Author"].strip() or "Unknown"
+    if not slugify(title):
+        return None
+    rating = _int(row["My Rating"])
+    return {
+        "title": title,
+        "title_slug": slugify(title),
+        "author": author,
+        "author_slug": slugify(author),
+        "additional_authors": [
+            name.strip()
+            for name in row["Additional Authors"].split(",")
+            if slugify(name.strip())
+        ],
+        "series": series,
+        "series_position": position[:10] if position else None,
+        "status": status,
+        "goodreads_id": row["Book Id"] or None,
+        "isbn10": _isbn(row["ISBN"]),
+        "isbn13": _isbn(row["ISBN13"]),
+        "pages": _int(row["Number of Pages"]),
+        "publication_year": _int(row["Original Publication Year"])
+        or _int(row["Year Published"]),
+        "rating": rating or None,
+        "text": row["My Review"].replace("<br/>", "\n") or None,
+        "date_read": _date(row["Date Read"]) if status != BookStatus.TO_READ else None,
+    }
+
+
+class GoodreadsBatch:
+    """Imports a batch of parsed rows with one query per lookup (books by
+    Goodreads id and by slug, authors, series, existing reads) and bulk
+    writes, like the KOReader sync. Books that exist already are only
+    moved from the queue to the review queue and get their read."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.books = {}
+        self.by_goodreads_id = {}
+        author_slugs = {
+            slugify(name)
+            for row in rows
+            for name in [row["author"], *row["additional_authors"]]
+        }
+        for book in Book.all_objects.filter(
+            Q(
+                goodreads_id__in={
+                    row["goodreads_id"] for row in rows if row["goodreads_id"]
+                }
+            )
+            | Q(
+                title_slug__in={row["title_slug"] for row in rows},
+                primary_author__name_slug__in=author_slugs,
+            )
+        ).select_related("primary_author"):
+            self.books[(book.primary_author.name_slug, book.title_slug)] = book
+            if book.goodreads_id:
+                self.by_goodreads_id[book.goodreads_id] = book
+        self.authors = Author.objects.in_bulk(author_slugs, field_name="name_slug")
+        self.series = Series.objects.in_bulk(
+            {slugify(row["series"]) for row in rows if row["series"]},
+            field_name="name_slug",
+        )
+        self.new_authors = []
+        self.new_series = []
+        self.new_books = []
+        self.additional_authors = []
+        self.promoted_books = []
+        self.reads = []
+
+    def author(self, name):
+        slug = slugify(name)
+        if slug not in self.authors:
+            self.authors[slug] = Author(name=name, name_slug=slug)
+            self.new_authors.append(self.authors[slug])
+        return self.authors[slug]
+
+    def series_for(self, name):
+        slug = slugify(name)
+        if slug not in self.series:
+            self.series[slug] = Series(name=name, name_slug=slug)
+            self.new_series.append(self.series[slug])
+        return self.series[slug]
+
+    def match(self, row):
+        """The row's book and whether it was created."""
+        book = self.by_goodreads_id.get(row["goodreads_id"]) or self.books.get(
+            (row["author_slug"], row["title_slug"])
+        )
+        if book:
+            if book.status == BookStatus.TO_READ and row["status"] != book.status:
+                # Like queue_for_review: a read queued book awaits its review.
+                book.status = BookStatus.TO_REVIEW
+                self.promoted_books.append(book)
+            return book, False
+        book = Book(
+            title=row["title"],
+            title_slug=row["title_slug"],
+            primary_author=self.author(row["author"]),
+            status=row["status"],
+            series=self.series_for(row["series"]) if row["series"] else None,
+            series_position=row["series_position"],
+            source="goodreads",
+            goodreads_id=row["goodreads_id"],
+            isbn10=row["isbn10"],
+            isbn13=row["isbn13"],
+            pages=row["pages"],
+            publication_year=row["publication_year"],
+            rating=row["rating"],
+            text=row["text"],
+        )
+        self.books[(row["author_slug"], row["title_slug"])] = book
+        self.new_books.append(book)
+        self.additional_authors += [
+            (book, self.author(name))
+            for name in row["additional_authors"]
+            if slugify(name) != row["author_slug"]
+        ]
+        return book, True
+
+    def write(self):
+        Author.objects.bulk_create(self.new_authors)
+        Series.objects.bulk_create(self.new_series)
+        Book.all_objects.bulk_create(self.new_books)
+        # bulk_create skips Book.save(), which stores the shelf layout.
+        for book in self.new_books:
+            book.shelf_layout = Spine(book).layout
+        Book.all_objects.bulk_update(self.new_books, ["shelf_layout"])
+        Book.additional_authors.through.objects.bulk_create(
+            Book.additional_authors.through(book=book, author=author)
+            for book, author in self.additional_authors
+        )
+        # One query for all promoted books, like the other bulk writes.
+        Book.all_objects.filter(pk__in=[b.pk for b in self.promoted_books]).update(
+            status=BookStatus.TO_REVIEW
+        )
+        known = set(
+            Read.objects.filter(
+                book__in=[read.book for read in self.reads],
+                finished_on__in={read.finished_on for read in self.reads},
+            ).values_list("book_id", "finished_on")
+        )
+        Read.objects.bulk_ingest(
+            read for read in self.reads if (read.book.pk, read.finished_on) not in known
+        )
+
+    def apply(self):
+        actions = Counter()
+        dates = set()
+        for row in self.rows:
+            book, created = self.match(row)
+            actions["created" if created else "matched"] += 1
+            if row["date_read"] and (id(book), row["date_read"]) not in dates:
+                dates.add((id(book), row["date_read"]))
+                self.reads.append(
+                    Read(book=book, finished_on=row["date_read"], source="goodreads")
+                )
+        with transaction.atomic():
+            self.write()
+        return actions
+
+
+class Command(BaseCommand):
+    help = "Import a Goodreads library export (goodreads_library_export.csv)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("csv_file")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, csv_file, batch_size, **options):
+        actions = Counter()
+        with Path(csv_file).open(newline="", encoding="utf-8-sig") as f:
+            rows = csv.DictReader(f)
+            while batch := list(islice(rows, batch_size)):
+                parsed = [parse_row(row) for row in batch]
+                actions["skipped"] += parsed.count(None)
+                actions += GoodreadsBatch([row for row in parsed if row]).apply()
+        print(
+            f"{actions['created']} books created, {actions['matched']} matched, "
+            f"{actions['skipped']} skipped"
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from scriptorium.main.openlibrary_index import OpenLibraryIndex, read_dump
+
+
+class Command(BaseCommand):
+    help = (
+        "Import OpenLibrary dump files (https://openlibrary.org/developers/dumps) "
+        "into the local index used before the OpenLibrary API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--authors", help="ol_dump_authors file")
+        parser.add_argument("--works", help="ol_dump_works file")
+        parser.add_argument("--editions", help="ol_dump_editions file")
+
+    def handle(self, *args, **options):
+        index = OpenLibraryIndex()
+        index.create_schema()
+        # Authors first: the search index lists works with their authors.
+        for kind in ("authors", "works", "editions"):
+            if options[kind]:
+                count = getattr(index, f"import_{kind}")(read_dump(options[kind]))
+                print(f"Imported {count} {kind}")
+        if options["authors"] or options["works"]:
+            index.rebuild_search()
@@ -0,0 +1,144 @@
+import datetime as dt
+import sqlite3
+from collections import Counter
+from contextlib import closing
+from itertools import groupby, islice
+from operator import itemgetter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.utils.timezone import localdate
+from pydantic import ValidationError
+
+from scriptorium.main.koreader import KoreaderBookIn, apply_books
+
+# Every page turn of every book, in reading order. KOReader records each
+# page visit with its start time (epoch seconds), the seconds spent, and
+# the book's page count at the time.
+STATISTICS_QUERY = """
+SELECT
+    book.id,
+    book.md5,
+    book.title,
+    book.authors,
+    book.series,
+    book.language,
+    book.pages,
+    CAST(stats.page AS REAL) / NULLIF(stats.total_pages, 0),
+    stats.start_time,
+    stats.duration
+FROM book
+JOIN page_stat_data stats ON stats.id_book = book.id
+WHERE length(book.md5) = 32
+ORDER BY book.id, stats.start_time
+"""
+
+# Once a book is finished, opening it within this share of its pages
+# starts a reread.
+REREAD_START = 0.1
+
+
+def _known(value):
+    """KOReader writes 'N/A' for missing authors, series and languages."""
+    return None if value in (None, "", "N/A") else value
+
+
+def _date(timestamp):
+    return localdate(dt.datetime.fromtimestamp(timestamp, tz=dt.UTC))
+
+
+def read_throughs(turns, finished_at):
+    """``(first turn, end of last turn, seconds spent)`` of every finished
+    read-through in a book's ``(share of pages, start, duration)`` page
+    turns. Page turns after the finish, like a look back at a favourite
+    passage, still belong to the finished read; turning to the beginning
+    again starts the next one."""
+    reads = []
+    for share, start, duration in turns:
+        if not reads or (reads[-1]["finished"] and (share or 0) <= REREAD_START):
+            reads.append({"first": start, "seconds": 0, "finished": False})
+        read = reads[-1]
+        read["last"] = start + duration
+        read["seconds"] += duration
+        read["finished"] = read["finished"] or (share or 0) >= finished_at
+    return [
+        (read["first"], read["last"], read["seconds"])
+        for read in reads
+        if read["finished"]
+    ]
+
+
+def read_statistics(path, finished_at):
+    """Yield the push payload (see KoreaderBookIn) of every read-through
+    in a KOReader ``statistics.sqlite3`` that reached ``finished_at`` of the
+    book's pages: read from its first to its last page turn, for the time
+    spent on all of them. Rereads get a payload each, one per finish date
+    like the Goodreads import."""
+    uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+    with closing(sqlite3.connect(uri, uri=True)) as connection:
+        rows = connection.execute(STATISTICS_QUERY)
+        for _, book_turns in groupby(rows, key=itemgetter(0)):
+            turns = list(book_turns)
+            _, md5, title, authors, series, language, pages = turns[0][:7]
+            reads = {}
+            for start, end, seconds in read_throughs(
+                [turn[7:] for turn in turns], finished_at
+            ):
+                if read := reads.get(_date(end)):
+                    read["total_time_seconds"] += seconds
+                    continue
+                reads[_date(end)] = {
+                    "md5": md5,
+                    "title": title or "",
+                    "authors": (_known(authors) or "").split("\n"),
+                    "series": _known(series),
+                    "language": _known(language),
+                    "pages": pages or None,
+                    "started_on": _date(start),
+                    "finished_on": _date(end),
+                    "total_time_seconds": seconds,
+                }
+            yield from reads.values()
+
+
+class Command(BaseCommand):
+    help = "Backfill reads from a KOReader statistics.sqlite3 database"
+
+    def add_arguments(self, parser):
+        parser.add_argument("statistics_db")
+        parser.add_argument(
+            "--finished-at",
+            type=float,
+            default=0.95,
+            help="Share of a book's pages that has to be reached to count as "
+            "finished (back matter is often left unread)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, statistics_db, finished_at, batch_size, **options):
+        actions = Counter()
+        books = read_statistics(statistics_db, finished_at)
+        while batch := list(islice(books, batch_size)):
+            payloads = []
+            for book in batch:
+                try:
+                    payloads.append(KoreaderBookIn.model_validate(book))
+                except ValidationError as exc:
+                    actions["error"] += 1
+                    fields = ", ".join(str(error["loc"][0]) for error in exc.errors())
+                    print(f"{book['md5']}: invalid {fields}")
+            # Every batch is matched and upserted like one push. A push
+            # fails as a whole, so failing books are reported and left out.
+            results, errors = apply_books(payloads)
+            while errors:
+                failed = {error["md5"] for error in errors}
+                for error in errors:
+                    actions["error"] += 1
+                    print(f"{error['md5']}: {error['detail']}")
+                payloads = [book for book in payloads if book.md5 not in failed]
+                results, errors = apply_books(payloads)
+            actions.update(result["action"] for result in results)
+        print(
+            ", ".join(f"{count} {action}" for action, count in sorted(actions.items()))
+            or "No finished books found"
+        )
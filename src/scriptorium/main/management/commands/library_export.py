@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from scriptorium.main.library_export import export_library
+
+
+class Command(BaseCommand):
+    help = "Export the whole library as NDJSON, for library_import"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", nargs="?", help="Output file (default: stdout)")
+
+    def handle(self, *args, file=None, **options):
+        if file is None:
+            sys.stdout.writelines(export_library())
+            return
+        with Path(file).open("w") as f:
+            f.writelines(export_library())
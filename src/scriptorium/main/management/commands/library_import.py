@@ -0,0 +1,22 @@
+import sys
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from scriptorium.main.library_export import import_library
+
+
+class Command(BaseCommand):
+    help = "Replay a library_export (or /api/export/) NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="Export file, or - for stdin")
+
+    def handle(self, *args, file, **options):
+        if file == "-":
+            counts = import_library(sys.stdin)
+        else:
+            with Path(file).open() as f:
+                counts = import_library(f)
+        for label, count in counts.items():
+            print(f"{label}: {count}")
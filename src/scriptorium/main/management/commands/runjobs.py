@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scriptorium.main.cover_cache import CoverCache
+from scriptorium.main.models import Job
+from scriptorium.main.sprites import build_missing_sheets
+from scriptorium.main.views.book import sprite_pages
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued cover downloads, thumbnails and colour extraction, and "
+        "build missing sprite sheets"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, polling for due jobs at this interval",
+        )
+
+    def handle(self, *args, watch=None, **options):
+        while True:
+            if requeued := Job.objects.requeue_stale():
+                print(f"Requeued {requeued} jobs whose worker died")
+            for job in Job.objects.due().select_related("book__primary_author"):
+                if job.run() and job.status != Job.Status.DONE:
+                    print(f"{job}: {job.last_error}")
+            build_missing_sheets(sprite_pages())
+            CoverCache().evict()
+            if watch is None:
+                return
+            time.sleep(watch)
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from scriptorium.main.koreader import run_sync_job
+from scriptorium.main.models import KoreaderSyncJob
+
+
+class Command(BaseCommand):
+    help = "Apply KOReader pushes that were accepted asynchronously"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--watch",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, polling for new jobs at this interval",
+        )
+
+    def handle(self, *args, watch=None, **options):
+        while True:
+            if requeued := KoreaderSyncJob.objects.requeue_stale():
+                print(f"Requeued {requeued} jobs whose worker died")
+            pending = KoreaderSyncJob.objects.filter(
+                status=KoreaderSyncJob.Status.PENDING
+            ).order_by("pk")
+            for job in pending:
+                try:
+                    run_sync_job(job)
+                except Exception as e:  # noqa: BLE001
+                    print(f"{job}: {e}")
+            if watch is None:
+                return
+            time.sleep(watch)
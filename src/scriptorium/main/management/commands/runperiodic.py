@@ -1,19 +1,56 @@
 from django.core.management.base import BaseCommand
 from django.db.models import Q
 
-from scriptorium.main.models import Book
+from scriptorium.main.cover_cache import CoverCache
+from scriptorium.main.models import Book, Job, Spine
+from scriptorium.main.utils import batch_cover_colours
 
 
 class Command(BaseCommand):
-    help = "Regenerates missing spine colours and thumbnails"
-
-    def handle(self, *args, **options):
-        missing_colour = Q(spine_color__isnull=True) | Q(ui_color__isnull=True)
-        for book in Book.all_objects.filter(missing_colour).exclude(cover=""):
-            try:
-                book.update_spine_color()
-                book.update_ui_color()
-                book.update_thumbnail()
-                book.save()
-            except Exception as e:  # noqa: BLE001
-                print(e)
+    help = "Regenerates missing spine colours, thumbnails and shelf layouts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Recolour every book with a cover, e.g. after a palette change",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Colour extraction processes (default: one per CPU)",
+        )
+
+    def handle(self, *args, workers=None, **options):
+        books = Book.all_objects.exclude(cover="")
+        if not options["all"]:
+            missing_colour = Q(spine_color__isnull=True) | Q(ui_color__isnull=True)
+            books = books.filter(missing_colour)
+        books = list(books)
+
+        # Palettes are cached by cover hash across runs, so only new or
+        # changed covers are decoded again.
+        cache = CoverCache()
+        colours = batch_cover_colours(
+            [book.cover.path for book in books], workers=workers, cache=cache
+        )
+        cache.evict()
+
+        recoloured = []
+        for book in books:
+            if book.cover.path not in colours:
+                print(f"{book.pk} {book.cover.name}: unreadable cover")
+                continue
+            book.spine_color, book.ui_color = colours[book.cover.path]
+            recoloured.append(book)
+            if not options["all"]:
+                Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book)
+        Book.all_objects.bulk_update(
+            recoloured, ["spine_color", "ui_color"], batch_size=500
+        )
+
+        # Books saved before shelf layouts were stored, or bulk-created.
+        unlaid = list(Book.all_objects.filter(shelf_layout__isnull=True))
+        for book in unlaid:
+            book.shelf_layout = Spine(book).layout
+        Book.all_objects.bulk_update(unlaid, ["shelf_layout"], batch_size=500)
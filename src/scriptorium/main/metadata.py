@@ -1,30 +1,120 @@
+import base64
+import functools
 import json
 import logging
 import re
+import threading
 import time
 import urllib.parse
-from functools import cache
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 from django.conf import settings
 
+from scriptorium.main.http_cache import HttpCache
+from scriptorium.main.openlibrary_index import OpenLibraryIndex
+
 logger = logging.getLogger(__name__)
 
+# One keep-alive connection pool for all metadata requests.
+session = requests.Session()
+session.mount(
+    "https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8)
+)
+
+# Background fetches that warm the HTTP cache for the review wizard's next
+# steps (see prefetch).
+prefetcher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="metadata-prefetch")
+
+EDITIONS_PAGE_SIZE = 100
+
 
 class MetadataError(Exception):
     """An upstream metadata service (OpenLibrary) failed: network error,
     timeout, or a response that wasn't JSON."""
 
 
-def _fetch_json(url):
-    try:
-        return requests.get(url, timeout=5).json()
-    except (requests.RequestException, ValueError) as exc:
-        raise MetadataError(f"OpenLibrary request failed: {exc}") from exc
+class RateLimiter:
+    """Spaces ``wait()`` calls at least 1/``settings.<setting>`` seconds
+    apart, across all threads of the process."""
+
+    def __init__(self, setting="OPENLIBRARY_RATE_LIMIT"):
+        self.setting = setting
+        self.lock = threading.Lock()
+        self.next_slot = 0
+
+    def wait(self):
+        interval = 1 / getattr(settings, self.setting)
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+openlibrary_limiter = RateLimiter()
+goodreads_limiter = RateLimiter("GOODREADS_RATE_LIMIT")
+
+
+def _fetch_json(url, endpoint):
+    """The JSON at ``url``, through the shared HTTP cache (see HttpCache)
+    with ``endpoint``'s TTL. Failures are raised, not cached; only cache
+    misses count against the rate limit."""
+
+    def load():
+        openlibrary_limiter.wait()
+        try:
+            response = session.get(
+                url, timeout=5, headers={"User-Agent": settings.OPENLIBRARY_USER_AGENT}
+            )
+            return response.status_code, response.json()
+        except (requests.RequestException, ValueError) as exc:
+            raise MetadataError(f"OpenLibrary request failed: {exc}") from exc
+
+    return HttpCache().fetch(url, endpoint, load)[1]
+
+
+def prefetch(func, *args):
+    """Call ``func(*args)`` in the background, only for the responses it
+    leaves in the HTTP cache. Failures are logged and otherwise ignored: the
+    foreground call will run into them again. Returns the future, or None
+    with METADATA_PREFETCH off."""
+    if not settings.METADATA_PREFETCH:
+        return None
+
+    def run():
+        try:
+            func(*args)
+        except (MetadataError, requests.RequestException) as exc:
+            logger.info("Prefetching %s%r failed: %s", func.__name__, args, exc)
+
+    return prefetcher.submit(run)
+
+
+def prefetch_editions(work_ids):
+    """Warm the editions of the wizard's top search results."""
+    return [
+        prefetch(get_openlibrary_editions_data, work_id)
+        for work_id in work_ids[: settings.METADATA_PREFETCH_WORKS]
+    ]
+
+
+def get_cover_image(url):
+    """The image at ``url`` as bytes, through the HTTP cache. Raises
+    requests' errors (including HTTPError for error statuses) uncached."""
+
+    def load():
+        response = session.get(url, timeout=10)
+        response.raise_for_status()
+        return response.status_code, base64.b64encode(response.content).decode()
+
+    return base64.b64decode(HttpCache().fetch(url, "cover-image", load)[1])
 
 
 # add profiling decorator
 def time_taken(func):
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if not settings.DEBUG:
             return func(*args, **kwargs)
@@ -39,13 +129,18 @@ def time_taken(func):
 
 
 @time_taken
-@cache
 def search_openlibrary(search):
-    """Search OpenLibrary works, returning structured dicts. Raises
-    MetadataError on upstream failure -- the API proxy maps that to a 502,
-    while the wizard-facing search_book swallows it."""
-    query = urllib.parse.quote(search)
-    data = _fetch_json(f"https://openlibrary.org/search.json?q={query}")
+    """Search OpenLibrary works, returning structured dicts: from the local
+    dump index if it has matches, else from the API. Raises MetadataError on
+    upstream failure -- the API proxy maps that to a 502, while the
+    wizard-facing search_book swallows it."""
+    index = OpenLibraryIndex.open()
+    data = index.search(search) if index else None
+    if not (data and data["docs"]):
+        query = urllib.parse.quote(search)
+        data = _fetch_json(
+            f"https://openlibrary.org/search.json?q={query}", "openlibrary-search"
+        )
     return [
         {
             "id": doc["key"].split("/")[-1],
@@ -63,7 +158,6 @@ def search_openlibrary(search):
 
 
 @time_taken
-@cache
 def search_book(search):
     """Works as (id, label) choice tuples for the review wizard. Upstream
     failures raise MetadataError (the wizard catches it and offers manual
@@ -83,16 +177,38 @@ def _page_count(value):
 
 
 @time_taken
-@cache
 def get_openlibrary_editions_data(work_id):
     """A work's editions as structured dicts, filtered to languages I read
-    and sorted like the wizard shows them. Raises MetadataError upstream
-    failure."""
-    data = _fetch_json(f"https://openlibrary.org/works/{work_id}/editions.json")
+    and sorted like the wizard shows them. Works known to the local dump
+    index are answered from it. Otherwise, the first API page says how many
+    editions there are, and the remaining pages (up to
+    OPENLIBRARY_EDITION_PAGES) are fetched concurrently. Raises
+    MetadataError on upstream failure."""
+
+    def fetch_page(offset):
+        return _fetch_json(
+            f"https://openlibrary.org/works/{work_id}/editions.json"
+            f"?limit={EDITIONS_PAGE_SIZE}&offset={offset}",
+            "openlibrary-editions",
+        )
+
+    index = OpenLibraryIndex.open()
+    entries = index.editions(work_id)["entries"] if index else None
+    if not entries:
+        data = fetch_page(0)
+        entries = list(data.get("entries") or [])
+        size = min(
+            data.get("size") or 0,
+            EDITIONS_PAGE_SIZE * settings.OPENLIBRARY_EDITION_PAGES,
+        )
+        offsets = range(EDITIONS_PAGE_SIZE, size, EDITIONS_PAGE_SIZE)
+        if offsets:
+            with ThreadPoolExecutor(max_workers=settings.OPENLIBRARY_WORKERS) as pool:
+                for page in pool.map(fetch_page, offsets):
+                    entries += page.get("entries") or []
     result = []
-    # we don't paginate, fuckit
     known_languages = ("/languages/eng", "/languages/ger", "/languages/lat")
-    for edition in data.get("entries") or []:
+    for edition in entries:
         language = edition["languages"][0]["key"] if edition.get("languages") else ""
         if language and language not in known_languages:
             continue
@@ -114,7 +230,6 @@ def get_openlibrary_editions_data(work_id):
 
 
 @time_taken
-@cache
 def get_openlibrary_editions(work_id):
     """Editions as (id, label) choice tuples for the review wizard."""
     return [
@@ -128,8 +243,13 @@ def get_openlibrary_editions(work_id):
 
 
 @time_taken
-@cache
 def get_openlibrary_book(isbn=None, olid=None):
+    """An edition in the API's ``jscmd=data`` shape, from the local dump
+    index if it has it. Raises StopIteration if OpenLibrary does not know
+    the edition."""
+    index = OpenLibraryIndex.open()
+    if index and (data := index.book(isbn=isbn, olid=olid)):
+        return data
     if isbn:
         search = f"ISBN:{isbn}"
     elif olid:
@@ -137,21 +257,21 @@ def get_openlibrary_book(isbn=None, olid=None):
     return next(
         iter(
             _fetch_json(
-                f"https://openlibrary.org/api/books?bibkeys={search}&format=json&jscmd=data"
+                f"https://openlibrary.org/api/books?bibkeys={search}&format=json&jscmd=data",
+                "openlibrary-book",
             ).values()
         )
     )
 
 
 @time_taken
-@cache
-def get_openlibrary_book_data(olid):
-    """A single edition, normalized to the field names our book endpoints
-    (PATCH /api/books/, queue add, review metadata) expect. Returns None when
-    OpenLibrary has no record for the id; raises MetadataError on upstream
-    failure."""
+def get_openlibrary_book_data(olid=None, isbn=None):
+    """A single edition by id or ISBN, normalized to the field names our
+    book endpoints (PATCH /api/books/, queue add, review metadata) expect.
+    Returns None when OpenLibrary has no record for it; raises
+    MetadataError on upstream failure."""
     try:
-        data = get_openlibrary_book(olid=olid)
+        data = get_openlibrary_book(isbn=isbn, olid=olid)
     except StopIteration:
         # OpenLibrary returns an empty object for unknown ids.
         return None
@@ -178,18 +298,21 @@ def get_openlibrary_book_data(olid):
 
 
 @time_taken
-@cache
 def get_goodreads_book(goodreads_id):
-    response = requests.get(
-        f"https://www.goodreads.com/book/show/{goodreads_id}-placeholder", timeout=5
-    )
+    url = f"https://www.goodreads.com/book/show/{goodreads_id}-placeholder"
 
-    if not response.ok:
+    def load():
+        goodreads_limiter.wait()
+        response = session.get(url, timeout=5)
+        return response.status_code, response.text if response.ok else None
+
+    text = HttpCache().fetch(url, "goodreads-book", load)[1]
+    if text is None:
         return {}
     # parse with beautifulsoup
     from bs4 import BeautifulSoup  # noqa: PLC0415
 
-    html = BeautifulSoup(response.text, "html.parser")
+    html = BeautifulSoup(text, "html.parser")
     # there is data in <script type="application/ld+json">
     try:
         json_data = json.loads(
@@ -220,6 +343,49 @@ def get_goodreads_book(goodreads_id):
     return result
 
 
+def metadata_changes(book, data):
+    """The fields of ``book`` that ``data`` (from get_openlibrary_book_data
+    or get_goodreads_book) improves on, as a dict: missing covers, ids and
+    ISBNs, an earlier publication year and a higher page count."""
+    changes = {}
+    if not book.cover and data.get("cover_source"):
+        changes["cover_source"] = data["cover_source"]
+    year = data.get("publication_year")
+    if year and (not book.publication_year or book.publication_year > year):
+        changes["publication_year"] = year
+    pages = data.get("pages")
+    if pages and (not book.pages or book.pages < pages):
+        changes["pages"] = pages
+    isbn = data.get("isbn") or ""
+    for field, length in (("isbn13", 13), ("isbn10", 10)):
+        value = data.get(field) or (isbn if len(isbn) == length else None)
+        if value and not getattr(book, field):
+            changes[field] = value
+    for field in ("openlibrary_id", "goodreads_id"):
+        if data.get(field) and not getattr(book, field):
+            changes[field] = data[field]
+    return changes
+
+
+def get_book_metadata(book):
+    """What OpenLibrary (by id, else by ISBN) and Goodreads know about
+    ``book``'s edition, as data dicts for metadata_changes. Goodreads is
+    also asked when only OpenLibrary knows the Goodreads id. Raises
+    MetadataError on OpenLibrary failures."""
+    results = []
+    goodreads_id = book.goodreads_id
+    if book.openlibrary_id or book.isbn:
+        data = get_openlibrary_book_data(
+            olid=book.openlibrary_id, isbn=None if book.openlibrary_id else book.isbn
+        )
+        if data:
+            results.append(data)
+            goodreads_id = goodreads_id or data["goodreads_id"]
+    if goodreads_id and (data := get_goodreads_book(goodreads_id)):
+        results.append(data)
+    return results
+
+
 def merge_goodreads(book):
     if not book.goodreads_id:
         return
@@ -227,24 +393,7 @@ def merge_goodreads(book):
     if not goodreads_data:
         raise RuntimeError(f"Failed to get goodreads data for {book.title}")
     logger.info("Got goodreads data for %s", book.title)
-    if not book.cover and goodreads_data.get("cover_source"):
-        book.cover_source = goodreads_data["cover_source"]
-        logger.info("Setting cover for %s", book.title)
-    if goodreads_data.get("publication_year") and (
-        not book.publication_year
-        or book.publication_year > goodreads_data["publication_year"]
-    ):
-        book.publication_year = goodreads_data["publication_year"]
-        logger.info("Setting publication year for %s", book.title)
-    if goodreads_data.get("pages") and (
-        not book.pages or book.pages < goodreads_data["pages"]
-    ):
-        book.pages = goodreads_data["pages"]
-        logger.info("Setting pages for %s", book.title)
-    if len(goodreads_data.get("isbn")) == 13 and not book.isbn:
-        book.isbn = goodreads_data["isbn"]
-        logger.info("Setting isbn for %s", book.title)
-    if len(goodreads_data.get("isbn")) == 10 and not book.isbn10:
-        book.isbn10 = goodreads_data["isbn"]
-        logger.info("Setting isbn10 for %s", book.title)
+    for field, value in metadata_changes(book, goodreads_data).items():
+        setattr(book, field, value)
+        logger.info("Setting %s for %s", field, book.title)
     book.save()
@@ -0,0 +1,178 @@
+# Generated by Django 6.0.5 on 2026-10-19 09:40
+
+import hashlib
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+FTS_SQL = (
+    (
+        "CREATE VIRTUAL TABLE main_highlight_fts USING fts5("
+        "text, note, chapter, content='main_highlight', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2')"
+    ),
+    (
+        "CREATE TRIGGER main_highlight_fts_insert AFTER INSERT ON main_highlight "
+        "BEGIN INSERT INTO main_highlight_fts(rowid, text, note, chapter) "
+        "VALUES (new.id, new.text, new.note, new.chapter); END"
+    ),
+    (
+        "CREATE TRIGGER main_highlight_fts_delete AFTER DELETE ON main_highlight "
+        "BEGIN INSERT INTO main_highlight_fts"
+        "(main_highlight_fts, rowid, text, note, chapter) "
+        "VALUES ('delete', old.id, old.text, old.note, old.chapter); END"
+    ),
+    (
+        "CREATE TRIGGER main_highlight_fts_update AFTER UPDATE ON main_highlight "
+        "BEGIN INSERT INTO main_highlight_fts"
+        "(main_highlight_fts, rowid, text, note, chapter) "
+        "VALUES ('delete', old.id, old.text, old.note, old.chapter); "
+        "INSERT INTO main_highlight_fts(rowid, text, note, chapter) "
+        "VALUES (new.id, new.text, new.note, new.chapter); END"
+    ),
+    "INSERT INTO main_highlight_fts(main_highlight_fts) VALUES ('rebuild')",
+)
+FTS_DROP_SQL = (
+    "DROP TRIGGER main_highlight_fts_insert",
+    "DROP TRIGGER main_highlight_fts_delete",
+    "DROP TRIGGER main_highlight_fts_update",
+    "DROP TABLE main_highlight_fts",
+)
+
+
+def hash_content(text, chapter, pageno):
+    # Frozen copy of Highlight.hash_content.
+    key = json.dumps([" ".join(text.split()), chapter or None, pageno])
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def split_blobs(apps, schema_editor):
+    """Move every Read.highlights blob into rows. The oldest read that has
+    a highlight keeps it; rereads marking the same passage are duplicates."""
+    Read = apps.get_model("main", "Read")
+    Highlight = apps.get_model("main", "Highlight")
+    seen = set()
+    highlights = []
+    for read in (
+        Read.objects.exclude(highlights=None).order_by("finished_on", "pk").iterator()
+    ):
+        for blob in read.highlights:
+            if not blob.get("text"):
+                continue
+            content_hash = hash_content(
+                blob["text"], blob.get("chapter"), blob.get("pageno")
+            )
+            if (read.book_id, content_hash) in seen:
+                continue
+            seen.add((read.book_id, content_hash))
+            highlights.append(
+                Highlight(
+                    book_id=read.book_id,
+                    read_id=read.pk,
+                    content_hash=content_hash,
+                    text=blob["text"],
+                    note=blob.get("note"),
+                    chapter=blob.get("chapter"),
+                    pageno=blob.get("pageno"),
+                    datetime=(blob.get("datetime") or "")[:32] or None,
+                    color=(blob.get("color") or "")[:32] or None,
+                    drawer=(blob.get("drawer") or "")[:32] or None,
+                )
+            )
+    Highlight.objects.bulk_create(highlights, batch_size=500)
+
+
+def join_blobs(apps, schema_editor):
+    Read = apps.get_model("main", "Read")
+    Highlight = apps.get_model("main", "Highlight")
+    blobs = {}
+    for highlight in Highlight.objects.exclude(read=None).order_by("pk"):
+        blobs.setdefault(highlight.read_id, []).append(
+            {
+                field: getattr(highlight, field)
+                for field in (
+                    "text",
+                    "note",
+                    "chapter",
+                    "datetime",
+                    "pageno",
+                    "color",
+                    "drawer",
+                )
+            }
+        )
+    for read_id, highlights in blobs.items():
+        Read.objects.filter(pk=read_id).update(highlights=highlights)
+
+
+def create_fts(apps, schema_editor):
+    # The full-text index is SQLite's FTS5, kept in sync by triggers. Note
+    # that SQLite rebuilds tables on most AlterField operations, which drops
+    # the triggers: later migrations touching main_highlight must recreate
+    # them.
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in FTS_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for statement in FTS_DROP_SQL:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0036_koreadersyncjob")]
+
+    operations = [
+        migrations.CreateModel(
+            name="Highlight",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64)),
+                ("text", models.TextField()),
+                ("note", models.TextField(blank=True, null=True)),
+                ("chapter", models.TextField(blank=True, null=True)),
+                ("pageno", models.IntegerField(blank=True, null=True)),
+                ("datetime", models.CharField(blank=True, max_length=32, null=True)),
+                ("color", models.CharField(blank=True, max_length=32, null=True)),
+                ("drawer", models.CharField(blank=True, max_length=32, null=True)),
+                (
+                    "book",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="highlights",
+                        to="main.book",
+                    ),
+                ),
+                (
+                    "read",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="highlight_set",
+                        to="main.read",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ("pk",),
+                "unique_together": {("book", "content_hash")},
+            },
+        ),
+        migrations.RunPython(split_blobs, join_blobs),
+        migrations.RemoveField(model_name="read", name="highlights"),
+        migrations.RunPython(create_fts, drop_fts),
+    ]
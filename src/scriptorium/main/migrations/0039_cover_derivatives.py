@@ -0,0 +1,28 @@
+# Generated by Django 6.0.5 on 2026-10-19 10:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0038_job")]
+
+    operations = [
+        migrations.AddField(
+            model_name="thumbnail",
+            name="format",
+            field=models.CharField(default="jpg", max_length=4),
+        ),
+        migrations.AlterField(
+            model_name="job",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("download_cover", "download cover"),
+                    ("update_thumbnail", "update thumbnail"),
+                    ("update_derivatives", "update cover derivatives"),
+                    ("update_colours", "update colours"),
+                ],
+                max_length=20,
+            ),
+        ),
+    ]
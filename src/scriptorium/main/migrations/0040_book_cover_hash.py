@@ -0,0 +1,32 @@
+# Generated by Django 6.0.5 on 2026-10-19 11:05
+
+import hashlib
+from pathlib import Path
+
+from django.db import migrations, models
+
+
+def hash_covers(apps, schema_editor):
+    Book = apps.get_model("main", "Book")
+    books = []
+    for book in Book.objects.exclude(cover="").exclude(cover__isnull=True).iterator():
+        path = Path(book.cover.path)
+        if not path.exists():
+            continue
+        with path.open("rb") as fp:
+            book.cover_hash = hashlib.file_digest(fp, "sha256").hexdigest()
+        books.append(book)
+    Book.objects.bulk_update(books, ["cover_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0039_cover_derivatives")]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="cover_hash",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.RunPython(hash_covers, migrations.RunPython.noop),
+    ]
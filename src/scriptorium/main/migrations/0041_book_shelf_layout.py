@@ -0,0 +1,15 @@
+# Generated by Django 6.0.5 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0040_book_cover_hash")]
+
+    operations = [
+        migrations.AddField(
+            model_name="book",
+            name="shelf_layout",
+            field=models.JSONField(blank=True, null=True),
+        )
+    ]
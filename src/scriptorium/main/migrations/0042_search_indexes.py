@@ -0,0 +1,68 @@
+# Generated by Django 6.0.5 on 2026-10-19 14:02
+
+from django.db import migrations, models
+
+# The PostgreSQL full-text search in models.book_search and
+# HighlightQuerySet.search uses the "scriptorium" configuration: words are
+# only lowercased and stripped of accents, like in the SQLite FTS5 index
+# (unaccent() itself can't be indexed). The indexed expressions must match
+# the queries.
+CONFIGURATION_SQL = (
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    "CREATE TEXT SEARCH CONFIGURATION scriptorium (COPY = simple)",
+    (
+        "ALTER TEXT SEARCH CONFIGURATION scriptorium "
+        "ALTER MAPPING FOR hword, hword_part, word WITH unaccent, simple"
+    ),
+)
+GIN_INDEXES = {
+    "main_book_title_search": ("main_book", "title"),
+    "main_book_text_search": (
+        "main_book",
+        "coalesce(text, '') || ' ' || coalesce(plot, '')",
+    ),
+    "main_author_name_search": ("main_author", "name"),
+    "main_series_name_search": ("main_series", "name"),
+    "main_highlight_search": (
+        "main_highlight",
+        (
+            "coalesce(text, '') || ' ' || coalesce(note, '') || ' ' "
+            "|| coalesce(chapter, '')"
+        ),
+    ),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    # SQLite searches highlights through the FTS5 table of migration 0037.
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for statement in CONFIGURATION_SQL:
+        schema_editor.execute(statement)
+    for name, (table, document) in GIN_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX {name} ON {table} "
+            f"USING gin (to_tsvector('scriptorium', {document}))"
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for name in GIN_INDEXES:
+        schema_editor.execute(f"DROP INDEX {name}")
+    schema_editor.execute("DROP TEXT SEARCH CONFIGURATION scriptorium")
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0041_book_shelf_layout")]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="read",
+            index=models.Index(
+                fields=["finished_on"], name="main_read_finishe_46bbbd_idx"
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,15 @@
+# Generated by Django 6.0.5 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0042_search_indexes")]
+
+    operations = [
+        migrations.AddField(
+            model_name="koreadersyncjob",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        )
+    ]
@@ -0,0 +1,15 @@
+# Generated by Django 6.0.5 on 2026-10-19 15:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [("main", "0043_koreadersyncjob_claimed")]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="claimed",
+            field=models.DateTimeField(blank=True, null=True),
+        )
+    ]
@@ -1,4 +1,8 @@
+import copy
+import datetime as dt
+import functools
 import hashlib
+import json
 import math
 import random
 import secrets
@@ -8,15 +12,25 @@ from io import BytesIO
 from itertools import groupby
 from pathlib import Path
 
-import requests
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db import models
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
 from django.utils.functional import cached_property
 from django.utils.timezone import now
-from PIL import Image
+from PIL import Image, features
 
-from .utils import get_spine_color, get_ui_color, slugify
+from .cover_cache import CoverCache
+from .metadata import get_cover_image
+from .sprites import render_tile, tile_name
+from .utils import (
+    get_cover_palettes,
+    get_spine_color,
+    get_ui_color,
+    pick_spine_color,
+    pick_ui_color,
+    slugify,
+)
 
 
 def get_cover_path(instance, filename):
@@ -27,6 +41,80 @@ def get_thumbnail_path(instance, filename):
     return f"{instance.book.slug}/{instance.size}{Path(filename).suffix}"
 
 
+# Pillow encoder and save options per cover derivative file extension.
+COVER_ENCODERS = {
+    "avif": ("AVIF", {"quality": 50}),
+    "webp": ("WEBP", {"quality": 80, "method": 6}),
+    "jpg": ("JPEG", {"quality": 85, "optimize": True, "progressive": True}),
+}
+COVER_MIME_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpg": "image/jpeg"}
+
+
+def get_cover_formats():
+    """The derivative formats to render: the configured modern formats this
+    Pillow build can encode, then JPEG as the fallback every browser reads."""
+    return [fmt for fmt in settings.COVER_FORMATS if features.check(fmt)] + ["jpg"]
+
+
+class TrackedFieldsMixin:
+    """Remembers the concrete field values an instance was loaded (or last
+    saved) with, so ``save()`` can work out what changed in memory instead
+    of re-reading the row first."""
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.snapshot_fields(fields)
+
+    def _tracked_value(self, field):
+        value = self.__dict__[field.attname]
+        if isinstance(field, models.FileField):
+            # Compare file fields by name, not by (instance-bound) FieldFile.
+            return getattr(value, "name", value)
+        if isinstance(field, models.JSONField):
+            # JSON values are mutable; snapshot a copy to notice in-place edits.
+            return copy.deepcopy(value)
+        return value
+
+    def _tracked_fields(self, fields=None):
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                # Deferred fields are neither snapshotted nor compared.
+                continue
+            if fields is None or field.name in fields or field.attname in fields:
+                yield field
+
+    def snapshot_fields(self, fields=None):
+        """Mark ``fields`` (default: every loaded field) as in sync with the
+        database, e.g. after writing them with a queryset update."""
+        snapshot = self.__dict__.setdefault("_loaded_values", {})
+        for field in self._tracked_fields(fields):
+            snapshot[field.attname] = self._tracked_value(field)
+
+    def loaded_value(self, field_name):
+        """The value ``field_name`` had when the instance was loaded or last
+        saved, or None for instances that were never in the database."""
+        attname = self._meta.get_field(field_name).attname
+        return self.__dict__.get("_loaded_values", {}).get(attname)
+
+    @property
+    def changed_fields(self):
+        """Names of the fields that differ from the loaded/saved values. For
+        an instance that was never saved, every loaded field counts."""
+        snapshot = self.__dict__.get("_loaded_values", {})
+        return {
+            field.name
+            for field in self._tracked_fields()
+            if field.attname not in snapshot
+            or snapshot[field.attname] != self._tracked_value(field)
+        }
+
+
 class AuthorManager(models.Manager):
     def get_or_create_by_name(self, name):
         """Authors are keyed on their unique slug, so casing or punctuation
@@ -229,7 +317,7 @@ class AllBooksManager(models.Manager):
         )
 
 
-class Book(models.Model):
+class Book(TrackedFieldsMixin, models.Model):
     title = models.CharField(max_length=300)
     title_slug = models.CharField(max_length=300)
     status = models.CharField(
@@ -244,6 +332,8 @@ class Book(models.Model):
         null=True, blank=True, upload_to=get_cover_path, max_length=800
     )
     cover_source = models.CharField(max_length=300, null=True, blank=True)
+    # SHA-256 of the cover file, versioning the cover URLs (see cover_url).
+    cover_hash = models.CharField(max_length=64, null=True, blank=True)
     # spine_color: faithful cover colour for spines/edges/card borders.
     # ui_color: equalised accent for highlights (links, drop caps, page border).
     spine_color = models.CharField(max_length=7, null=True, blank=True)
@@ -255,6 +345,9 @@ class Book(models.Model):
     isbn13 = models.CharField(max_length=30, null=True, blank=True)
 
     dimensions = models.JSONField(null=True, blank=True)
+    # Spine.layout, stored so the shelf does not lay out every book on every
+    # render. Recomputed when the pages or dimensions change.
+    shelf_layout = models.JSONField(null=True, blank=True)
     source = models.CharField(max_length=300, null=True, blank=True)
     # Reading-queue shelf (from Calibre), only used for to-read books.
     shelf = models.CharField(max_length=300, null=True, blank=True)
@@ -297,29 +390,54 @@ class Book(models.Model):
         return f"{self.title} by {self.author_string}"
 
     def save(self, *args, **kwargs):
+        # Loaded and saved books know their previous values (see
+        # TrackedFieldsMixin), so status and text changes are detected
+        # without re-reading the row, and updates only write what changed.
+        changed_fields = self.changed_fields
+        stamped_fields = set()
         if self.status == BookStatus.REVIEWED:
-            previous = (
-                Book.all_objects.filter(pk=self.pk).values("status", "text").first()
-            )
-            changed_fields = set()
-            if not previous or previous["status"] != BookStatus.REVIEWED:
+            if self._state.adding or self.loaded_value("status") != BookStatus.REVIEWED:
                 # First publication puts the review in the feed; rereads
                 # bump the feed date in Read.save().
                 self.feed_date = now().date()
                 self.review_updated = now().date()
-                changed_fields = {"feed_date", "review_updated"}
-            elif previous["text"] != self.text:
+                stamped_fields = {"feed_date", "review_updated"}
+            elif "text" in changed_fields:
                 # An edited review is fresh again and leaves the queue.
                 self.review_updated = now().date()
-                changed_fields = {"review_updated"}
-            if (
-                changed_fields
-                and (update_fields := kwargs.get("update_fields")) is not None
-            ):
-                kwargs["update_fields"] = changed_fields | set(update_fields)
+                stamped_fields = {"review_updated"}
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            update_fields = stamped_fields | set(update_fields)
+            kwargs["update_fields"] = update_fields
+        elif (
+            not self._state.adding
+            and self.pk is not None
+            and not kwargs.get("force_insert")
+        ):
+            # An unchanged book is not written at all.
+            update_fields = changed_fields | stamped_fields
+            kwargs["update_fields"] = update_fields
         result = super().save(*args, **kwargs)
+        self.snapshot_fields(update_fields)
+        if "cover" in changed_fields and (
+            update_fields is None or "cover" in update_fields
+        ):
+            # Uploads are only written to disk by the save itself.
+            cover_hash = (
+                CoverCache.digest(self.cover.path)
+                if self.cover and Path(self.cover.path).exists()
+                else None
+            )
+            if cover_hash != self.cover_hash:
+                Book.all_objects.filter(pk=self.pk).update(cover_hash=cover_hash)
+                self.cover_hash = cover_hash
+                self.snapshot_fields(["cover_hash"])
+        layout_fields = {"pages", "dimensions"} & changed_fields
+        if layout_fields and (update_fields is None or layout_fields & update_fields):
+            self.update_shelf_layout()
         if not self.cover and self.cover_source:
-            self.download_cover()
+            Job.objects.enqueue(Job.Kind.DOWNLOAD_COVER, self)
         return result
 
     @cached_property
@@ -328,7 +446,7 @@ class Book(models.Model):
 
     @cached_property
     def spine(self):
-        return Spine(self)
+        return Spine(self, self.shelf_layout)
 
     @cached_property
     def authors(self):
@@ -404,8 +522,10 @@ class Book(models.Model):
         every deliberate review save (API publish, web review form, queue
         dismissal) -- Book.save() alone only stamps on text changes."""
         self.review_updated = now().date()
-        # Queryset update to avoid Book.save() side effects (cover download).
+        # Only this column: callers may hold edits to the book they don't
+        # mean to save yet.
         Book.all_objects.filter(pk=self.pk).update(review_updated=self.review_updated)
+        self.snapshot_fields(["review_updated"])
 
     def sync_reads(self, dates, *, remove_extra=False, **read_kwargs):
         """Create Read rows so every date in ``dates`` has one, skipping dates
@@ -424,40 +544,147 @@ class Book(models.Model):
                 read.save()
                 return
             self.reads.filter(finished_on__in=to_remove).delete()
-        for date in to_add:
-            self.reads.create(finished_on=date, **read_kwargs)
+        Read.objects.bulk_ingest(
+            Read(book=self, finished_on=date, **read_kwargs) for date in to_add
+        )
+
+    def forget_read_summaries(self):
+        """Drop the cached read-derived properties (and prefetched reads), so
+        they are recomputed after reads were added or changed."""
+        for prop in (
+            "dates_read_list",
+            "latest_date",
+            "date_read_lookup",
+            "did_not_finish",
+        ):
+            self.__dict__.pop(prop, None)
+        getattr(self, "_prefetched_objects_cache", {}).pop("reads", None)
 
     def download_cover(self):
+        """Replace the cover with the one at ``cover_source``, then queue the
+        derived thumbnail and colours. Runs as a Job: request errors
+        propagate so the queue can retry them. The review wizard prefetches
+        the image, so this usually does not wait for the network."""
         if not self.cover_source:
             return
-        try:
-            response = requests.get(self.cover_source, timeout=5)
-            response.raise_for_status()
-        except (requests.RequestException, OSError):
+        content = get_cover_image(self.cover_source)
+        if (
+            self.cover
+            and Path(self.cover.path).exists()
+            and CoverCache.digest(self.cover.path)
+            == hashlib.sha256(content).hexdigest()
+        ):
+            # Same image again: colours and thumbnails are still current.
+            self.cover_source = None
+            self.save(update_fields=["cover_source"])
             return
         if self.cover:
             self.cover.delete()
         Thumbnail.objects.filter(book=self).delete()
-        self.cover.save(f"{self.title_slug}.jpg", ContentFile(response.content))
+        self.cover.save(f"{self.title_slug}.jpg", ContentFile(content))
         self.cover_source = None
         self.spine_color = None
         self.ui_color = None
         self.save()
+        Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, self)
+        Job.objects.enqueue(Job.Kind.UPDATE_DERIVATIVES, self)
+        Job.objects.enqueue(Job.Kind.UPDATE_COLOURS, self)
 
     def update_thumbnail(self):
         if not self.cover:
             return
         if self.cover_thumbnail:
             del self.cover_thumbnail
-        im = Image.open(self.cover.path)
-        if im.width > 240 and im.height > 240:
-            im.thumbnail((240, 240))
-        buffer = BytesIO()
-        im.convert("RGB").save(fp=buffer, format="JPEG", quality=95)
-        imgfile = ContentFile(buffer.getvalue())
-
+        # Replace rather than add, so a retried job leaves one thumbnail.
+        for thumbnail in self.thumbnails.filter(size="thumbnail"):
+            thumbnail.delete()
+
+        def render():
+            im = Image.open(self.cover.path)
+            if im.width > 240 and im.height > 240:
+                im.thumbnail((240, 240))
+            buffer = BytesIO()
+            im.convert("RGB").save(fp=buffer, format="JPEG", quality=95)
+            return buffer.getvalue()
+
+        cache = CoverCache()
+        content = cache.get_or_render(
+            cache.digest(self.cover.path), "thumbnail.jpg", render
+        )
         t = Thumbnail.objects.create(book=self, size="thumbnail")
-        t.thumb.save("thumbnail.jpg", imgfile)
+        t.thumb.save("thumbnail.jpg", ContentFile(content))
+
+    def update_derivatives(self):
+        """Render the cover at every COVER_WIDTHS width in every available
+        format, replacing earlier derivatives, plus its sprite sheet tile.
+        Covers narrower than a width are re-encoded at their own size rather
+        than upscaled. The cover is only decoded if the cover cache misses."""
+        if not self.cover:
+            return
+        for thumbnail in self.thumbnails.exclude(size="thumbnail"):
+            thumbnail.delete()
+
+        @functools.cache
+        def decoded():
+            with Image.open(self.cover.path) as original:
+                return original.convert("RGB")
+
+        @functools.cache
+        def resized(width):
+            im = decoded()
+            scaled = min(width, im.width)
+            return im.resize(
+                (scaled, max(1, round(im.height * scaled / im.width))),
+                Image.Resampling.LANCZOS,
+            )
+
+        def render(width, fmt):
+            encoder, options = COVER_ENCODERS[fmt]
+            buffer = BytesIO()
+            resized(width).save(buffer, format=encoder, **options)
+            return buffer.getvalue()
+
+        cache = CoverCache()
+        digest = cache.digest(self.cover.path)
+        derivatives = []
+        for width in settings.COVER_WIDTHS:
+            for fmt in get_cover_formats():
+                content = cache.get_or_render(
+                    digest, f"{width}w.{fmt}", functools.partial(render, width, fmt)
+                )
+                derivative = Thumbnail(book=self, size=f"{width}w", format=fmt)
+                derivative.thumb.save(f"cover.{fmt}", ContentFile(content), save=False)
+                derivatives.append(derivative)
+        Thumbnail.objects.bulk_create(derivatives)
+        cache.get_or_render(digest, tile_name(), lambda: render_tile(decoded()))
+
+    def cover_url(self, name="cover.jpg"):
+        """URL of a cover file, versioned by the cover's content hash so it
+        can be cached forever (see ``send_cover_file``)."""
+        url = f"/{self.slug}/{name}"
+        return f"{url}?v={self.cover_hash[:16]}" if self.cover_hash else url
+
+    def cover_srcset(self, fmt="jpg"):
+        return ", ".join(
+            f"{self.cover_url(f'cover-{width}.{fmt}')} {width}w"
+            for width in settings.COVER_WIDTHS
+        )
+
+    def cover_sources(self):
+        """(MIME type, srcset) pairs for the ``<source>`` elements of a
+        ``<picture>``, best format first; JPEG is left to the ``<img>``."""
+        return [
+            (COVER_MIME_TYPES[fmt], self.cover_srcset(fmt))
+            for fmt in get_cover_formats()[:-1]
+        ]
+
+    def update_shelf_layout(self):
+        layout = Spine(self).layout
+        if layout != self.shelf_layout:
+            Book.all_objects.filter(pk=self.pk).update(shelf_layout=layout)
+            self.shelf_layout = layout
+            self.snapshot_fields(["shelf_layout"])
+        self.__dict__.pop("spine", None)
 
     def update_spine_color(self):
         if self.cover:
@@ -467,6 +694,20 @@ class Book(models.Model):
         if self.cover:
             self.ui_color = get_ui_color(self.cover)
 
+    def update_colours(self):
+        if not self.cover:
+            return
+        cache = CoverCache()
+        digest = cache.digest(self.cover.path)
+        if digest not in cache:
+            cache[digest] = [
+                palette.tolist() for palette in get_cover_palettes(self.cover.path)
+            ]
+        spine, ui = cache[digest]
+        self.spine_color = pick_spine_color(spine)
+        self.ui_color = pick_ui_color(ui)
+        self.save(update_fields=["spine_color", "ui_color"])
+
 
 class BookRelation(models.Model):
     source = models.ForeignKey(
@@ -517,6 +758,57 @@ class Quote(models.Model):
         return f"“{short_quote}”"
 
 
+class ReadManager(models.Manager):
+    def bulk_ingest(self, reads):
+        """Insert many new (unsaved) reads at once, with the reread
+        semantics of Read.save(): a book whose new reads include one newer
+        than every read it already had gets its feed date bumped (if it is
+        published), while backfilled older reads leave it alone.
+
+        Costs three statements however many reads and books are involved:
+        the previous latest read per book, the bulk insert, and one feed date
+        update. Books attached to the reads in memory have their cached read
+        summaries and feed date refreshed. Returns the created reads."""
+        reads = list(reads)
+        if not reads:
+            return []
+        # A read built before its book was saved only has the book object.
+        book_ids = {read.book_id or read.book.pk for read in reads}
+        previous_latest = dict(
+            self.filter(book_id__in=book_ids)
+            .order_by()
+            .values("book_id")
+            .annotate(latest=models.Max("finished_on"))
+            .values_list("book_id", "latest")
+        )
+        created = self.bulk_create(reads)
+        newest = {}
+        for read in created:
+            newest[read.book_id] = max(
+                read.finished_on, newest.get(read.book_id, read.finished_on)
+            )
+        bumped = {
+            book_id
+            for book_id, finished_on in newest.items()
+            if book_id not in previous_latest or finished_on > previous_latest[book_id]
+        }
+        today = now().date()
+        if bumped:
+            # One query for all bumped books, most of which aren't loaded.
+            Book.all_objects.filter(pk__in=bumped, status=BookStatus.REVIEWED).update(
+                feed_date=today
+            )
+        for read in created:
+            if not Read.book.is_cached(read):
+                continue
+            book = read.book
+            book.forget_read_summaries()
+            if book.pk in bumped and book.status == BookStatus.REVIEWED:
+                book.feed_date = today
+                book.snapshot_fields(["feed_date"])
+        return created
+
+
 class Read(models.Model):
     """One complete (or abandoned) read-through of a book."""
 
@@ -536,14 +828,16 @@ class Read(models.Model):
     total_time_seconds = models.IntegerField(null=True, blank=True)
     notes = models.TextField(null=True, blank=True)
     # KOReader integration: identity of the device-side file this read came
-    # from (KOReader's partial MD5), and the raw highlight dump for this
-    # read-through. Together they form the device push's upsert key
-    # (koreader_md5, finished_on); see the API's koreader route.
+    # from (KOReader's partial MD5). Together with finished_on it forms the
+    # device push's upsert key; see the API's koreader route.
     koreader_md5 = models.CharField(max_length=32, null=True, blank=True, db_index=True)
-    highlights = models.JSONField(null=True, blank=True)
+
+    objects = ReadManager()
 
     class Meta:
         ordering = ("-finished_on",)
+        # Year pages and stats filter reads by their date.
+        indexes = [models.Index(fields=["finished_on"])]
 
     def __str__(self):
         return f"Read of {self.book} on {self.finished_on}"
@@ -554,8 +848,7 @@ class Read(models.Model):
         if is_new:
             # A new latest read on a published book is a reread the feed should
             # surface; backfilling older reads does not bump the feed date.
-            # Queryset update to avoid Book.save() side effects (cover download)
-            # and keep bulk imports fast.
+            # Updated by id, so the book isn't loaded: keeps bulk imports fast.
             is_latest = (
                 not Read.objects.filter(
                     book_id=self.book_id, finished_on__gte=self.finished_on
@@ -569,18 +862,198 @@ class Read(models.Model):
                 ).update(feed_date=now().date())
         return result
 
+    @property
+    def highlights(self):
+        """The highlights first pushed with this read, in the plugin's
+        payload shape, or None without any."""
+        return [highlight.as_dict() for highlight in self.highlight_set.all()] or None
+
+
+def prefix_tsquery(terms):
+    """A PostgreSQL tsquery matching documents that contain every term as a
+    word prefix, like the FTS5 queries on SQLite."""
+    return " & ".join(
+        "'{}':*".format(term.replace("\\", "\\\\").replace("'", "''")) for term in terms
+    )
+
+
+def _tsvector_match(table, document, terms):
+    # The document expressions match the GIN indexes of migration 0042,
+    # which also creates the accent-insensitive "scriptorium" configuration.
+    # Table and document are constants; only the query is a parameter.
+    sql = (
+        f"SELECT id FROM {table} "  # noqa: S608
+        f"WHERE to_tsvector('scriptorium', {document}) "
+        "@@ to_tsquery('scriptorium', %s)"
+    )
+    return RawSQL(sql, [prefix_tsquery(terms)])  # noqa: S611
+
+
+def book_search(query, fulltext=False):
+    """The catalogue search as a filter: titles, author and series names
+    and ISBNs, plus review text and plot with ``fulltext``. PostgreSQL uses
+    its indexed full-text search, matching words by prefix; SQLite looks for
+    the query anywhere in the text."""
+    if connection.vendor == "postgresql":
+        terms = query.split()
+        if not terms:
+            return models.Q(pk__in=[])
+        authors = _tsvector_match("main_author", "name", terms)
+        search = (
+            models.Q(pk__in=_tsvector_match("main_book", "title", terms))
+            | models.Q(primary_author__in=authors)
+            | models.Q(additional_authors__in=authors)
+            | models.Q(series__in=_tsvector_match("main_series", "name", terms))
+            | models.Q(isbn10=query)
+            | models.Q(isbn13=query)
+        )
+        if fulltext:
+            search |= models.Q(
+                pk__in=_tsvector_match(
+                    "main_book",
+                    "coalesce(text, '') || ' ' || coalesce(plot, '')",
+                    terms,
+                )
+            )
+        return search
+    search = (
+        models.Q(title__icontains=query)
+        | models.Q(title_slug__icontains=query)
+        | models.Q(primary_author__name__icontains=query)
+        | models.Q(additional_authors__name__icontains=query)
+        | models.Q(series__name__icontains=query)
+        | models.Q(isbn10=query)
+        | models.Q(isbn13=query)
+    )
+    if fulltext:
+        search |= models.Q(text__icontains=query) | models.Q(plot__icontains=query)
+    return search
+
+
+class HighlightQuerySet(models.QuerySet):
+    def search(self, query):
+        """Full-text search over text, note and chapter via the FTS5 index
+        that migration 0037 keeps in sync with triggers (on PostgreSQL, the
+        GIN index of migration 0042). Every word has to match, as a prefix,
+        so half-typed words already find something."""
+        terms = query.split()
+        if not terms:
+            return self.none()
+        if connection.vendor == "postgresql":
+            return self.filter(
+                pk__in=_tsvector_match(
+                    "main_highlight",
+                    "coalesce(text, '') || ' ' || coalesce(note, '') || ' ' "
+                    "|| coalesce(chapter, '')",
+                    terms,
+                )
+            )
+        match = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        return self.filter(
+            pk__in=RawSQL(
+                "SELECT rowid FROM main_highlight_fts WHERE main_highlight_fts MATCH %s",
+                [match],
+            )
+        )
+
+
+class Highlight(models.Model):
+    """A passage marked on the e-reader. Highlights belong to the book and
+    are keyed by a hash of their content, so re-pushes and rereads that
+    mark the same passage again don't store it twice; ``read`` is the
+    read-through it was first pushed with."""
+
+    #: The KoreaderHighlightIn contract, in payload order.
+    PAYLOAD_FIELDS = (
+        "text",
+        "note",
+        "chapter",
+        "datetime",
+        "pageno",
+        "color",
+        "drawer",
+    )
+
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="highlights")
+    read = models.ForeignKey(
+        Read,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="highlight_set",
+    )
+    content_hash = models.CharField(max_length=64)
+    text = models.TextField()
+    note = models.TextField(null=True, blank=True)
+    chapter = models.TextField(null=True, blank=True)
+    pageno = models.IntegerField(null=True, blank=True)
+    # KOReader's local "YYYY-MM-DD HH:MM:SS" stamp, kept verbatim: it sorts
+    # lexically, which is all the sync watermark needs.
+    datetime = models.CharField(max_length=32, null=True, blank=True)
+    color = models.CharField(max_length=32, null=True, blank=True)
+    drawer = models.CharField(max_length=32, null=True, blank=True)
+
+    objects = HighlightQuerySet.as_manager()
+
+    class Meta:
+        ordering = ("pk",)
+        unique_together = (("book", "content_hash"),)
+
+    def __str__(self):
+        return f"Highlight in {self.book}: {self.text[:50]}"
+
+    @staticmethod
+    def hash_content(text, chapter, pageno):
+        """Identity of a highlight: its whitespace-normalized text and
+        position. Notes, colours and timestamps can change without making
+        it a different highlight."""
+        key = json.dumps([" ".join(text.split()), chapter or None, pageno])
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.PAYLOAD_FIELDS}
+
 
 class Spine:
-    def __init__(self, book):
+    """A book on the shelf. Its random parts -- size without known
+    dimensions, tilt, texture -- are seeded by the book's id, so a book
+    always looks the same, and its ``layout`` can be stored (see
+    ``Book.shelf_layout``) instead of being computed on every render."""
+
+    STYLES = (
+        "ribbed",
+        "noisy",
+        "linen",
+        "arches",
+        "corrugation",
+        "exa",
+        "decal",
+        "embossed",
+        "grid",
+        "lined",
+    )
+
+    def __init__(self, book, layout=None):
         self.book = book
-        self.height = self.get_spine_height()
-        self.width = self.get_spine_width()
         self.color = self.book.spine_color
         self.cover = self.book.cover
         self.starred = self.book.rating == 5
+        if layout:
+            self.width, self.height, self.tilt, self.margin, self.style = layout
+            return
+        self.random = random.Random(book.pk)  # noqa: S311
+        self.height = self.get_spine_height()
+        self.width = self.get_spine_width()
+        self.tilt = self.get_tilt()
+        self.margin = round(self.get_margin(self.tilt), 2)
+        self.style = self.get_style()
+
+    @property
+    def layout(self):
+        return [self.width, self.height, self.tilt, self.margin, self.style]
 
     def random_height(self):
-        return random.randint(16, 25)  # noqa: S311
+        return self.random.randint(16, 25)
 
     def normalize_height(self, height):
         return max(min(int(height * 4), 110), 50)
@@ -596,9 +1069,21 @@ class Spine:
         if not width:
             pages = self.book.pages
             # Factor taken from known thickness/page ratio
-            width = random.randint(1, 4) / 2 if not pages else int(pages) * 0.0075  # noqa: S311
+            width = self.random.randint(1, 4) / 2 if not pages else int(pages) * 0.0075
         return min(max(int(width * 4), 12), 32)  # Clamp between 12 and 32
 
+    def get_tilt(self):
+        """One in 29 books leans by 5 to 14 degrees. The shelf never tilts
+        two neighbours, so it may still stand upright there."""
+        if self.random.randint(1, 29) != 1:
+            return 0
+        return self.random.randint(5, 14) * self.random.choice((1, -1))
+
+    def get_style(self):
+        """Most spines are plain; about half of them get a texture."""
+        choice = self.random.randint(1, 19)
+        return self.STYLES[choice - 1] if choice <= len(self.STYLES) else None
+
     def get_margin(self, tilt):
         tilt = abs(tilt)
         long_side = self.height * math.cos(math.radians(90 - tilt))
@@ -619,6 +1104,7 @@ class Page(models.Model):
 class Thumbnail(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="thumbnails")
     size = models.CharField(max_length=255)
+    format = models.CharField(max_length=4, default="jpg")
     thumb = models.FileField(upload_to=get_thumbnail_path, max_length=800)
 
     def __str__(self):
@@ -716,3 +1202,148 @@ class ApiToken(models.Model):
         if not self.token:
             self.token = secrets.token_urlsafe(32)
         super().save(*args, **kwargs)
+
+
+class KoreaderSyncJobManager(models.Manager):
+    def requeue_stale(self):
+        """Put jobs back in the queue whose worker died while running them
+        (their push was rolled back with it). Returns how many."""
+        return self.filter(
+            status=KoreaderSyncJob.Status.RUNNING,
+            claimed__lt=now() - KoreaderSyncJob.STALE_AFTER,
+        ).update(status=KoreaderSyncJob.Status.PENDING, claimed=None)
+
+
+class KoreaderSyncJob(models.Model):
+    """A KOReader push accepted asynchronously: the validated payload waits
+    here until ``manage.py runkoreaderjobs`` applies it -- with the same
+    all-or-nothing semantics as a synchronous sync -- and the per-book
+    results stay around for the device to poll. Jobs still running
+    STALE_AFTER their claim are assumed dead and run again."""
+
+    STALE_AFTER = dt.timedelta(minutes=30)
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "pending"
+        RUNNING = "running", "running"
+        DONE = "done", "done"
+        FAILED = "failed", "failed"
+
+    status = models.CharField(
+        max_length=7, choices=Status.choices, default=Status.PENDING, db_index=True
+    )
+    payload = models.JSONField()
+    results = models.JSONField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    claimed = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    objects = KoreaderSyncJobManager()
+
+    def __str__(self):
+        return f"KOReader sync job {self.pk} ({self.status})"
+
+
+class JobManager(models.Manager):
+    def enqueue(self, kind, book):
+        """Queue ``kind`` for ``book`` unless it is already waiting to run."""
+        return self.get_or_create(kind=kind, book=book, status=Job.Status.PENDING)[0]
+
+    def enqueue_many(self, kind, books):
+        pending = set(
+            self.filter(
+                kind=kind, book__in=books, status=Job.Status.PENDING
+            ).values_list("book_id", flat=True)
+        )
+        return self.bulk_create(
+            [Job(kind=kind, book=book) for book in books if book.pk not in pending]
+        )
+
+    def requeue_stale(self):
+        """Retry jobs whose worker died while running them: they count as a
+        failed attempt. Returns how many were requeued or failed."""
+        stale = self.filter(
+            status=Job.Status.RUNNING, claimed__lt=now() - Job.STALE_AFTER
+        )
+        error = "Worker died while running the job"
+        failed = stale.filter(attempts__gte=Job.MAX_ATTEMPTS).update(
+            status=Job.Status.FAILED, last_error=error, finished=now()
+        )
+        return failed + stale.update(
+            status=Job.Status.PENDING, last_error=error, run_after=now()
+        )
+
+    def due(self):
+        return self.filter(status=Job.Status.PENDING, run_after__lte=now()).order_by(
+            "run_after", "pk"
+        )
+
+
+class Job(models.Model):
+    """Slow work on a book -- network fetches, image processing -- taken off
+    the request path: save paths and views only enqueue, and
+    ``manage.py runjobs`` works the queue off. Failing jobs are retried with
+    exponential backoff until MAX_ATTEMPTS is reached. Jobs still running
+    STALE_AFTER their claim are assumed dead and retried."""
+
+    MAX_ATTEMPTS = 5
+    BACKOFF = dt.timedelta(minutes=1)
+    STALE_AFTER = dt.timedelta(minutes=30)
+
+    class Kind(models.TextChoices):
+        # Values are the Book methods the job runs.
+        DOWNLOAD_COVER = "download_cover", "download cover"
+        UPDATE_THUMBNAIL = "update_thumbnail", "update thumbnail"
+        UPDATE_DERIVATIVES = "update_derivatives", "update cover derivatives"
+        UPDATE_COLOURS = "update_colours", "update colours"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "pending"
+        RUNNING = "running", "running"
+        DONE = "done", "done"
+        FAILED = "failed", "failed"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="jobs")
+    status = models.CharField(
+        max_length=7, choices=Status.choices, default=Status.PENDING
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=now)
+    last_error = models.TextField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    claimed = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+
+    objects = JobManager()
+
+    class Meta:
+        indexes = [models.Index(fields=["status", "run_after"])]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.book} ({self.status})"
+
+    def run(self):
+        """Claim and run the job, recording the outcome. Returns False if
+        another worker claimed it first."""
+        claimed = Job.objects.filter(pk=self.pk, status=Job.Status.PENDING).update(
+            status=Job.Status.RUNNING, attempts=models.F("attempts") + 1, claimed=now()
+        )
+        if not claimed:
+            return False
+        self.attempts += 1
+        try:
+            getattr(self.book, self.kind)()
+        except Exception as e:  # noqa: BLE001
+            self.last_error = f"{type(e).__name__}: {e}"
+            if self.attempts >= self.MAX_ATTEMPTS:
+                self.status = Job.Status.FAILED
+                self.finished = now()
+            else:
+                self.status = Job.Status.PENDING
+                self.run_after = now() + self.BACKOFF * 2 ** (self.attempts - 1)
+        else:
+            self.status = Job.Status.DONE
+            self.finished = now()
+        self.save(update_fields=["status", "run_after", "last_error", "finished"])
+        return True
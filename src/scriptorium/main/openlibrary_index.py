@@ -0,0 +1,276 @@
+import gzip
+import json
+import re
+import sqlite3
+from contextlib import closing
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS authors (key TEXT PRIMARY KEY, name TEXT NOT NULL)",
+    (
+        "CREATE TABLE IF NOT EXISTS works (key TEXT PRIMARY KEY, title TEXT NOT NULL, "
+        "year INTEGER, cover INTEGER, author_keys TEXT NOT NULL, author_names TEXT)"
+    ),
+    (
+        "CREATE TABLE IF NOT EXISTS editions (key TEXT PRIMARY KEY, work TEXT, "
+        "title TEXT NOT NULL, publish_date TEXT, language TEXT, pages INTEGER, "
+        "pagination TEXT, isbn_13 TEXT, isbn_10 TEXT, goodreads TEXT, cover INTEGER, "
+        "author_keys TEXT)"
+    ),
+    "CREATE INDEX IF NOT EXISTS editions_work ON editions (work)",
+    "CREATE TABLE IF NOT EXISTS isbns (isbn TEXT PRIMARY KEY, edition TEXT NOT NULL)",
+    (
+        "CREATE VIRTUAL TABLE IF NOT EXISTS works_fts USING fts5("
+        "title, authors, tokenize='unicode61 remove_diacritics 2')"
+    ),
+)
+BATCH_SIZE = 10_000
+SEARCH_LIMIT = 50
+
+
+def _olid(key):
+    return key.rsplit("/", 1)[-1]
+
+
+def _first(values):
+    return values[0] if values else None
+
+
+def read_dump(path):
+    """Records of an OpenLibrary dump file: the official tab-separated
+    ``type, key, revision, last_modified, JSON`` rows or plain JSON lines,
+    optionally gzipped. Streams, so the multi-gigabyte dumps never have to
+    fit into memory."""
+    path = Path(path)
+    opener = gzip.open if path.suffix == ".gz" else Path.open
+    with opener(path, "rt", encoding="utf-8") as fp:
+        for line in fp:
+            line = line.strip()  # noqa: PLW2901
+            if not line:
+                continue
+            yield json.loads(line if line.startswith("{") else line.split("\t")[4])
+
+
+class OpenLibraryIndex:
+    """A local SQLite copy of the parts of the OpenLibrary dumps the
+    metadata lookups need, with an FTS index over work titles and authors.
+
+    Its lookups answer in the shape of the corresponding API response
+    (``search.json``, ``editions.json``, ``api/books?jscmd=data``), so the
+    metadata module can use it in place of the network, and only falls
+    back to the API when the index has no match."""
+
+    def __init__(self, path=None):
+        self.path = Path(path or settings.OPENLIBRARY_INDEX_PATH)
+
+    @classmethod
+    def open(cls):
+        """The configured index, or None if none was imported."""
+        index = cls()
+        return index if index.path.exists() else None
+
+    def connect(self):
+        return sqlite3.connect(self.path, timeout=10)
+
+    def create_schema(self):
+        """Create the tables the imports fill, if they don't exist yet."""
+        with closing(self.connect()) as connection, connection:
+            for statement in SCHEMA:
+                connection.execute(statement)
+
+    # --- Import -------------------------------------------------------------
+
+    def _import(self, records, row, sql):
+        count = 0
+        with closing(self.connect()) as connection:
+            records = iter(records)
+            while batch := list(islice(records, BATCH_SIZE)):
+                rows = [r for r in map(row, batch) if r]
+                with connection:
+                    connection.executemany(sql, rows)
+                count += len(rows)
+        return count
+
+    def import_authors(self, records):
+        return self._import(
+            records,
+            lambda r: (_olid(r["key"]), r["name"]) if r.get("name") else None,
+            "INSERT OR REPLACE INTO authors VALUES (?, ?)",
+        )
+
+    def import_works(self, records):
+        def row(record):
+            if not record.get("title"):
+                return None
+            year = re.search(r"\d{4}", str(record.get("first_publish_date") or ""))
+            authors = [
+                _olid(author["author"]["key"])
+                for author in record.get("authors") or []
+                if "key" in (author.get("author") or {})
+            ]
+            return (
+                _olid(record["key"]),
+                record["title"],
+                int(year.group()) if year else None,
+                _first([c for c in record.get("covers") or [] if c > 0]),
+                json.dumps(authors),
+            )
+
+        return self._import(
+            records,
+            row,
+            "INSERT OR REPLACE INTO works (key, title, year, cover, author_keys) "
+            "VALUES (?, ?, ?, ?, ?)",
+        )
+
+    def import_editions(self, records):
+        def row(record):
+            if not record.get("title"):
+                return None
+            identifiers = record.get("identifiers") or {}
+            pages = record.get("number_of_pages")
+            return (
+                _olid(record["key"]),
+                _olid(_first(record.get("works") or [{}]).get("key", "")) or None,
+                record["title"],
+                record.get("publish_date"),
+                _first(record.get("languages") or [{}]).get("key"),
+                pages if isinstance(pages, int) else None,
+                record.get("pagination"),
+                _first(record.get("isbn_13")),
+                _first(record.get("isbn_10")),
+                _first(identifiers.get("goodreads")),
+                _first([c for c in record.get("covers") or [] if c > 0]),
+                json.dumps([_olid(a["key"]) for a in record.get("authors") or []]),
+            )
+
+        count = self._import(
+            records,
+            row,
+            "INSERT OR REPLACE INTO editions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        )
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO isbns SELECT isbn_13, key FROM editions "
+                "WHERE isbn_13 IS NOT NULL"
+            )
+            connection.execute(
+                "INSERT OR REPLACE INTO isbns SELECT isbn_10, key FROM editions "
+                "WHERE isbn_10 IS NOT NULL"
+            )
+        return count
+
+    def rebuild_search(self):
+        """Resolve the works' author names and rebuild the search index.
+        Run after importing, once the authors are in."""
+        with closing(self.connect()) as connection, connection:
+            connection.execute(
+                "UPDATE works SET author_names = ("
+                "SELECT json_group_array(authors.name) FROM json_each(works.author_keys) "
+                "JOIN authors ON authors.key = json_each.value)"
+            )
+            connection.execute("DELETE FROM works_fts")
+            connection.execute(
+                "INSERT INTO works_fts (rowid, title, authors) "
+                "SELECT rowid, title, author_names FROM works"
+            )
+
+    # --- Lookups ------------------------------------------------------------
+
+    def search(self, query):
+        """Works matching every word of ``query``, like ``search.json``."""
+        words = re.findall(r"\w+", query)
+        if not words:
+            return {"docs": []}
+        match = " ".join(f'"{word}"' for word in words)
+        with closing(self.connect()) as connection:
+            rows = connection.execute(
+                "SELECT works.key, works.title, works.author_names, works.year, "
+                "works.cover FROM works_fts JOIN works ON works.rowid = works_fts.rowid "
+                "WHERE works_fts MATCH ? ORDER BY rank LIMIT ?",
+                (match, SEARCH_LIMIT),
+            ).fetchall()
+        return {
+            "docs": [
+                {
+                    "key": f"/works/{key}",
+                    "title": title,
+                    "author_name": json.loads(names or "[]"),
+                    "first_publish_year": year,
+                    "cover_i": cover,
+                }
+                for key, title, names, year, cover in rows
+            ]
+        }
+
+    def editions(self, work_id):
+        """A work's editions, like ``editions.json``."""
+        with closing(self.connect()) as connection:
+            rows = connection.execute(
+                "SELECT key, title, publish_date, language, pages, pagination "
+                "FROM editions WHERE work = ?",
+                (work_id,),
+            ).fetchall()
+        entries = []
+        for key, title, publish_date, language, pages, pagination in rows:
+            entry = {"key": f"/books/{key}", "title": title}
+            if publish_date:
+                entry["publish_date"] = publish_date
+            if language:
+                entry["languages"] = [{"key": language}]
+            if pages:
+                entry["number_of_pages"] = pages
+            if pagination:
+                entry["pagination"] = pagination
+            entries.append(entry)
+        return {"size": len(entries), "entries": entries}
+
+    def book(self, isbn=None, olid=None):
+        """One edition by ISBN or OpenLibrary id, like an entry of the
+        ``api/books`` data response, or None."""
+        with closing(self.connect()) as connection:
+            if isbn:
+                olid = _first(
+                    connection.execute(
+                        "SELECT edition FROM isbns WHERE isbn = ?", (isbn,)
+                    ).fetchone()
+                )
+            row = connection.execute(
+                "SELECT editions.key, editions.title, publish_date, pages, "
+                "isbn_13, isbn_10, goodreads, editions.cover, ("
+                "SELECT json_group_array(authors.name) FROM json_each("
+                "CASE WHEN editions.author_keys = '[]' THEN works.author_keys "
+                "ELSE editions.author_keys END"
+                ") JOIN authors ON authors.key = json_each.value) "
+                "FROM editions LEFT JOIN works ON works.key = editions.work "
+                "WHERE editions.key = ?",
+                (olid,),
+            ).fetchone()
+        if not row:
+            return None
+        key, title, publish_date, pages, isbn_13, isbn_10, goodreads, cover, names = row
+        identifiers = {"openlibrary": [key]}
+        for name, value in (
+            ("isbn_13", isbn_13),
+            ("isbn_10", isbn_10),
+            ("goodreads", goodreads),
+        ):
+            if value:
+                identifiers[name] = [value]
+        data = {
+            "title": title,
+            "authors": [{"name": name} for name in json.loads(names)],
+            "identifiers": identifiers,
+            "publish_date": publish_date or "",
+        }
+        if pages:
+            data["number_of_pages"] = pages
+        if cover:
+            data["cover"] = {
+                size: f"https://covers.openlibrary.org/b/id/{cover}-{letter}.jpg"
+                for size, letter in (("small", "S"), ("medium", "M"), ("large", "L"))
+            }
+        return data
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import math
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.conf import settings
+from PIL import Image
+
+from .cover_cache import CoverCache
+
+# Tiles are rendered at twice their CSS size for high-density screens.
+DENSITY = 2
+
+
+def tile_name():
+    width, height = settings.SPRITE_TILE_SIZE
+    return f"tile-{width * DENSITY}x{height * DENSITY}.jpg"
+
+
+def render_tile(im):
+    """Shrink a decoded RGB cover to fit a sprite tile, as JPEG bytes."""
+    width, height = settings.SPRITE_TILE_SIZE
+    tile = im.copy()
+    tile.thumbnail((width * DENSITY, height * DENSITY), Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    tile.save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+@dataclass(frozen=True)
+class Sprite:
+    """One cover's place in a sprite sheet, in CSS pixels."""
+
+    url: str
+    x: float
+    y: float
+    width: float
+    height: float
+    sheet_width: float
+    sheet_height: float
+
+    @property
+    def style(self):
+        return (
+            f"background-image: url('{self.url}'); "
+            f"background-position: -{self.x:g}px -{self.y:g}px; "
+            f"background-size: {self.sheet_width:g}px {self.sheet_height:g}px; "
+            f"width: {self.width:g}px; height: {self.height:g}px"
+        )
+
+    @property
+    def css_vars(self):
+        """The same placement as custom properties, for pseudo-elements."""
+        return (
+            f"--cover-img: url('{self.url}'); "
+            f"--cover-pos: -{self.x:g}px -{self.y:g}px; "
+            f"--cover-size: {self.sheet_width:g}px {self.sheet_height:g}px; "
+            f"--cover-width: {self.width:g}px; --cover-height: {self.height:g}px"
+        )
+
+
+def build_sheet(cache, key, hashes):
+    """Pack the cached tiles of ``hashes`` into a sheet stored under ``key``.
+    Returns the sheet's map, or None if a tile has gone missing."""
+    width, height = (size * DENSITY for size in settings.SPRITE_TILE_SIZE)
+    columns = min(settings.SPRITE_COLUMNS, len(hashes))
+    rows = math.ceil(len(hashes) / columns)
+    sheet = Image.new("RGB", (columns * width, rows * height), "white")
+    tiles = {}
+    try:
+        for i, cover_hash in enumerate(hashes):
+            x, y = (i % columns) * width, (i // columns) * height
+            with Image.open(cache.path(cover_hash, tile_name())) as tile:
+                sheet.paste(tile, (x, y))
+                tiles[cover_hash] = [x, y, tile.width, tile.height]
+    except OSError:
+        return None
+    buffer = BytesIO()
+    sheet.save(buffer, format="JPEG", quality=85, optimize=True, progressive=True)
+    cache.put(key, "sprite.jpg", buffer.getvalue())
+    sprite_map = {"width": sheet.width, "height": sheet.height, "tiles": tiles}
+    cache.put(key, "sprite.json", json.dumps(sprite_map).encode())
+    return sprite_map
+
+
+def chunk_covers(hashes):
+    """Split cover hashes into sheets at boundaries picked by the hashes
+    themselves: in hash order, a sheet ends after every hash divisible by
+    SPRITE_SHEET_TILES, or once it holds twice that many. Adding or
+    removing a book only changes the sheet its cover falls into, where
+    cutting the display order into runs would shift every later sheet."""
+    size = settings.SPRITE_SHEET_TILES
+    chunks = [[]]
+    for cover_hash in sorted(hashes):
+        chunks[-1].append(cover_hash)
+        if int(cover_hash[-8:], 16) % size == 0 or len(chunks[-1]) >= 2 * size:
+            chunks.append([])
+    return [chunk for chunk in chunks if chunk]
+
+
+def sheet_key(chunk):
+    return hashlib.sha256(
+        " ".join([tile_name(), str(settings.SPRITE_COLUMNS), *chunk]).encode()
+    ).hexdigest()
+
+
+def get_sprites(books):
+    """``{cover hash: Sprite}`` for the covers of ``books``, a page's books,
+    packed in sheets of about SPRITE_SHEET_TILES covers.
+
+    Sheets are keyed by the hashes of their covers, so a changed cover only
+    invalidates its own sheet. Only reads the cover cache: sheets are built
+    by ``build_missing_sheets`` in ``manage.py runjobs``, and covers whose
+    sheet isn't built yet are left out, so templates fall back to the cover
+    files for them."""
+    cache = CoverCache()
+    sprites = {}
+    for chunk in chunk_covers({book.cover_hash for book in books if book.cover_hash}):
+        key = sheet_key(chunk)
+        if not (path := cache.get(key, "sprite.json")):
+            continue
+        sprite_map = json.loads(path.read_text())
+        url = f"/sprites/{key}.jpg"
+        for cover_hash, (x, y, width, height) in sprite_map["tiles"].items():
+            sprites[cover_hash] = Sprite(
+                url,
+                x / DENSITY,
+                y / DENSITY,
+                width / DENSITY,
+                height / DENSITY,
+                sprite_map["width"] / DENSITY,
+                sprite_map["height"] / DENSITY,
+            )
+    return sprites
+
+
+def build_missing_sheets(pages, cache=None):
+    """Build the sheets ``get_sprites`` looks for on ``pages``, lists of
+    the books each page shows, from the tiles in the cover cache. Covers
+    without a tile (new, or evicted from the cache) get their derivatives
+    queued, and their sheet is built on a later run; a sheet with a tile
+    that can't be read is skipped.
+    Returns the number of sheets built."""
+    from .models import Job  # noqa: PLC0415
+
+    cache = cache or CoverCache()
+    built = 0
+    seen = set()
+    untiled = {}
+    for page in pages:
+        books = {book.cover_hash: book for book in page if book.cover_hash}
+        for chunk in chunk_covers(books):
+            key = sheet_key(chunk)
+            if key in seen or cache.get(key, "sprite.json"):
+                continue
+            seen.add(key)
+            if missing := [h for h in chunk if not cache.get(h, tile_name())]:
+                untiled.update((h, books[h]) for h in missing)
+            elif build_sheet(cache, key, chunk):
+                built += 1
+    if untiled:
+        # Not again for covers that failed for good: a new cover queues its
+        # own job.
+        failed = set(
+            Job.objects.filter(
+                kind=Job.Kind.UPDATE_DERIVATIVES,
+                status=Job.Status.FAILED,
+                book__in=untiled.values(),
+            ).values_list("book_id", flat=True)
+        )
+        Job.objects.enqueue_many(
+            Job.Kind.UPDATE_DERIVATIVES,
+            [book for book in untiled.values() if book.pk not in failed],
+        )
+    return built
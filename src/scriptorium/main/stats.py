@@ -6,7 +6,8 @@ from pathlib import Path
 
 import networkx as nx
 import pygal
-from django.db.models import Avg, Sum
+from django.db import connection
+from django.db.models import Aggregate, Avg, FloatField, Sum
 from django.utils.timezone import now
 
 from .models import Book, BookStatus, Read, Tag
@@ -248,18 +249,32 @@ def get_stats_grid():
     return stats
 
 
+class Median(Aggregate):
+    """PostgreSQL's continuous median: the middle value, or the mean of the
+    two middle values."""
+
+    function = "PERCENTILE_CONT"
+    template = "%(function)s(0.5) WITHIN GROUP (ORDER BY %(expressions)s)"
+    output_field = FloatField()
+
+
+def median(books, field):
+    values = books.filter(**{f"{field}__isnull": False})
+    if connection.vendor == "postgresql":
+        result = values.aggregate(median=Median(field))["median"]
+        if result is None:
+            raise statistics.StatisticsError("no median for empty data")
+        # Like statistics.median, which returns ints for odd-sized data.
+        return int(result) if result.is_integer() else result
+    return statistics.median(values.values_list(field, flat=True))
+
+
 def median_year(books):
-    return statistics.median(
-        books.filter(publication_year__isnull=False).values_list(
-            "publication_year", flat=True
-        )
-    )
+    return median(books, "publication_year")
 
 
 def median_length(books):
-    return statistics.median(
-        books.filter(pages__isnull=False).values_list("pages", flat=True)
-    )
+    return median(books, "pages")
 
 
 def average_rating(books):
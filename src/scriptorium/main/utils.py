@@ -1,10 +1,12 @@
 import colorsys
+import hashlib
 import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
 
 import numpy as np
 from coloraide import Color
 from PIL import Image
-from sklearn.cluster import KMeans
 from unidecode import unidecode
 
 # Equalised UI accent targets, in OKLCH. Every cover contributes only its hue;
@@ -22,6 +24,8 @@ SPINE_CROP = 0.20
 # Trim this fraction off the top and bottom before sampling (spine and UI), so
 # publisher banners and edition notes near the edges don't leak into the colour.
 CROP_VERTICAL = 0.05
+# Edge length of the CIELAB histogram bins that seed the colour quantizer.
+LAB_BIN_SIZE = 12
 
 # sRGB (D65) <-> CIELAB, vectorised over an (N, 3) array of values in [0, 1].
 _XYZ_FROM_RGB = np.array(
@@ -77,9 +81,33 @@ def _lab_to_rgb(lab):
     return _linear_to_srgb(xyz @ _RGB_FROM_XYZ.T)
 
 
-def get_dominant_colours(path, count, crop_left=None, crop_top=None):
-    im = Image.open(path)
+def _quantize(lab, count, iterations=5):
+    """Find ``count`` dominant colours in an (N, 3) CIELAB array.
 
+    A coarse Lab histogram seeds the centres with its most populated bins;
+    a few vectorised k-means passes then settle them on the pixels. Unlike a
+    randomly initialised KMeans this is deterministic and needs no restarts.
+    Images with fewer distinct colours than ``count`` yield fewer centres."""
+    bins = np.floor(lab / LAB_BIN_SIZE).astype(int)
+    _, inverse, counts = np.unique(
+        bins, axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.reshape(-1)
+    seeds = np.argsort(-counts, kind="stable")[:count]
+    centres = np.array([lab[inverse == seed].mean(axis=0) for seed in seeds])
+    for _ in range(iterations):
+        distances = ((lab[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        centres = np.array(
+            [
+                lab[labels == i].mean(axis=0) if (labels == i).any() else centre
+                for i, centre in enumerate(centres)
+            ]
+        )
+    return centres
+
+
+def _dominant_colours(im, count, crop_left=None, crop_top=None):
     # Optionally restrict the sampled region: the left strip (where the spine is
     # drawn) and/or a margin off the top and bottom (to drop edge banners), so
     # the colour is sampled from the region it actually represents.
@@ -88,30 +116,33 @@ def get_dominant_colours(path, count, crop_left=None, crop_top=None):
         top = round(im.height * crop_top) if crop_top else 0
         im = im.crop((0, top, right, im.height - top))
 
-    # Resizing means less pixels to handle, so the *k*-means clustering converges
-    # faster.  Small details are lost, but the main details will be preserved.
-    im = im.resize((100, 100))
-
-    # Ensure the image is RGB, and use RGB values in [0, 1] for consistency
-    # with operations elsewhere.
-    im = im.convert("RGB")
-    rgb = np.asarray(im, dtype=float).reshape(-1, 3) / 255
+    # Resizing means less pixels to handle, so the clustering converges faster.
+    # Small details are lost, but the main details will be preserved. RGB
+    # values are used in [0, 1] for consistency with operations elsewhere.
+    rgb = np.asarray(im.resize((100, 100)), dtype=float).reshape(-1, 3) / 255
 
     # Cluster in CIELAB so the grouping follows *perceived* colour difference
     # rather than raw RGB distance, then map the centres back to RGB.
-    centres = KMeans(n_clusters=count, n_init="auto").fit(_rgb_to_lab(rgb))
-    return _lab_to_rgb(centres.cluster_centers_)
+    return _lab_to_rgb(_quantize(_rgb_to_lab(rgb), count))
 
 
-def get_spine_color(cover, cluster_count=3):
-    """The faithful cover colour, used for spines, edges and card borders.
-
-    Sampled from the left strip of the cover (where the spine is shown), it
-    picks the most colourful dominant cluster (highest HSV value*saturation)
-    and renders it as-is, so the result stays close to the actual cover."""
-    dominant_colors = get_dominant_colours(
-        cover.path, count=cluster_count, crop_left=SPINE_CROP, crop_top=CROP_VERTICAL
+def get_dominant_colours(path, count, crop_left=None, crop_top=None):
+    with Image.open(path) as im:
+        return _dominant_colours(im.convert("RGB"), count, crop_left, crop_top)
+
+
+def get_cover_palettes(path, cluster_count=3):
+    """The dominant colours of the spine strip and of the whole cover, from a
+    single decode of the image."""
+    with Image.open(path) as original:
+        im = original.convert("RGB")
+    return (
+        _dominant_colours(im, cluster_count, SPINE_CROP, CROP_VERTICAL),
+        _dominant_colours(im, cluster_count, crop_top=CROP_VERTICAL),
     )
+
+
+def pick_spine_color(dominant_colors):
     hsv_candidates = {
         tuple(rgb_col): colorsys.rgb_to_hsv(*rgb_col) for rgb_col in dominant_colors
     }
@@ -126,17 +157,7 @@ def get_spine_color(cover, cluster_count=3):
     return f"#{r:02x}{g:02x}{b:02x}"
 
 
-def get_ui_color(cover, cluster_count=3):
-    """An equalised accent colour for UI highlights (links, drop caps, graph).
-
-    Takes the most chromatic dominant cluster, keeps only its hue, and pins
-    lightness and chroma to fixed OKLCH targets before gamut-mapping back to
-    sRGB. Every book therefore contributes an accent of equal perceived
-    strength on the white background. Greyscale covers have no usable hue and
-    fall back to a neutral."""
-    dominant_colors = get_dominant_colours(
-        cover.path, count=cluster_count, crop_top=CROP_VERTICAL
-    )
+def pick_ui_color(dominant_colors):
     oklch = [
         Color("srgb", list(rgb_col)).convert("oklch") for rgb_col in dominant_colors
     ]
@@ -146,3 +167,76 @@ def get_ui_color(cover, cluster_count=3):
     chroma = 0 if chosen["chroma"] < UI_MIN_CHROMA else UI_CHROMA
     accent = Color("oklch", [UI_LIGHTNESS, chroma, chosen["hue"]])
     return accent.fit("srgb").convert("srgb").to_string(hex=True)
+
+
+def get_spine_color(cover, cluster_count=3):
+    """The faithful cover colour, used for spines, edges and card borders.
+
+    Sampled from the left strip of the cover (where the spine is shown), it
+    picks the most colourful dominant cluster (highest HSV value*saturation)
+    and renders it as-is, so the result stays close to the actual cover."""
+    return pick_spine_color(
+        get_dominant_colours(
+            cover.path,
+            count=cluster_count,
+            crop_left=SPINE_CROP,
+            crop_top=CROP_VERTICAL,
+        )
+    )
+
+
+def get_ui_color(cover, cluster_count=3):
+    """An equalised accent colour for UI highlights (links, drop caps, graph).
+
+    Takes the most chromatic dominant cluster, keeps only its hue, and pins
+    lightness and chroma to fixed OKLCH targets before gamut-mapping back to
+    sRGB. Every book therefore contributes an accent of equal perceived
+    strength on the white background. Greyscale covers have no usable hue and
+    fall back to a neutral."""
+    return pick_ui_color(
+        get_dominant_colours(cover.path, count=cluster_count, crop_top=CROP_VERTICAL)
+    )
+
+
+def _palette_worker(path):
+    # Runs in a pool process; plain lists pickle smaller than arrays.
+    try:
+        return [palette.tolist() for palette in get_cover_palettes(path)]
+    except (OSError, ValueError):
+        return None
+
+
+def batch_cover_colours(paths, workers=None, cache=None):
+    """``{path: (spine colour, UI colour)}`` for many covers at once.
+
+    Covers are keyed by the SHA-256 of their bytes, so a cover shared by
+    several books is decoded once, and with a persistent ``cache`` (any
+    mapping of hash -> palettes, such as a ``CoverCache``) an unchanged
+    cover is not decoded at all: only the cheap colour picking runs again,
+    so recolouring the library after tweaking the UI targets is fast.
+    Misses are spread over a pool of ``workers`` processes; ``workers=1``
+    runs them inline. Unreadable covers are left out of the result."""
+    cache = {} if cache is None else cache
+    keys = {}
+    for path in paths:
+        try:
+            with Path(path).open("rb") as fp:
+                keys[path] = hashlib.file_digest(fp, "sha256").hexdigest()
+        except OSError:
+            continue
+    missing = {key: path for path, key in keys.items() if key not in cache}
+    if not missing:
+        palettes = []
+    elif workers == 1:
+        palettes = [_palette_worker(path) for path in missing.values()]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            palettes = list(pool.map(_palette_worker, missing.values(), chunksize=8))
+    for key, palette in zip(missing, palettes, strict=True):
+        if palette is not None:
+            cache[key] = palette
+    return {
+        path: (pick_spine_color(cache[key][0]), pick_ui_color(cache[key][1]))
+        for path, key in keys.items()
+        if key in cache
+    }
@@ -2,6 +2,7 @@ from .admin import (
     ApiTokenList,
     AuthorEdit,
     Bibliothecarius,
+    HighlightSearch,
     LoginView,
     PageCreate,
     PageEdit,
@@ -35,6 +36,7 @@ from .book import (
     ReviewByAuthor,
     ReviewBySeries,
     ReviewByTitle,
+    ReviewCoverDerivativeView,
     ReviewCoverThumbnailView,
     ReviewCoverView,
     ReviewView,
@@ -44,6 +46,7 @@ from .book import (
     YearView,
     feed_view,
     graph_data,
+    sprite_sheet,
 )
 from .page import PageView
 from .poem import PoemAuthorList, PoemBookList, PoemList, PoemView
@@ -58,6 +61,7 @@ __all__ = [
     "BorderImageList",
     "CatalogueView",
     "GraphView",
+    "HighlightSearch",
     "IndexView",
     "ListDetail",
     "LoginView",
@@ -80,6 +84,7 @@ __all__ = [
     "ReviewByAuthor",
     "ReviewBySeries",
     "ReviewByTitle",
+    "ReviewCoverDerivativeView",
     "ReviewCoverThumbnailView",
     "ReviewCoverView",
     "ReviewCreate",
@@ -100,6 +105,7 @@ __all__ = [
     "graph_data",
     "healthz",
     "logout_view",
+    "sprite_sheet",
     "to_review_dismiss",
     "trigger_deploy",
 ]
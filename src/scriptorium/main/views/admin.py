@@ -7,7 +7,7 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
 from django.utils.functional import cached_property
@@ -45,6 +45,7 @@ from scriptorium.main.models import (
     Author,
     Book,
     BookStatus,
+    Highlight,
     Page,
     Poem,
     Quote,
@@ -148,8 +149,11 @@ class ReviewCreate(LoginRequiredMixin, SessionWizardView):
     def get_form_kwargs(self, step=None):
         kwargs = {}
         from scriptorium.main.metadata import (  # noqa: PLC0415
+            get_cover_image,
             get_openlibrary_book,
             get_openlibrary_editions,
+            prefetch,
+            prefetch_editions,
             search_book,
         )
 
@@ -158,6 +162,8 @@ class ReviewCreate(LoginRequiredMixin, SessionWizardView):
                 kwargs["works"] = search_book(
                     self.get_cleaned_data_for_step("search")["search_input"]
                 )
+                # Most likely, one of these is picked next.
+                prefetch_editions([work_id for work_id, _ in kwargs["works"]])
             except Exception:  # noqa: BLE001
                 messages.error(
                     self.request,
@@ -185,6 +191,9 @@ class ReviewCreate(LoginRequiredMixin, SessionWizardView):
                 try:
                     book = get_openlibrary_book(olid=olid)
                     kwargs["openlibrary"] = book
+                    # Ready for the download job queued by done().
+                    if cover := (book.get("cover") or {}).get("large"):
+                        prefetch(get_cover_image, cover)
                 except Exception:  # noqa: BLE001
                     kwargs["openlibrary"] = {}
             # TODO pre-fill fields here
@@ -249,6 +258,7 @@ class ReviewEdit(LoginRequiredMixin, ReviewMixin, UpdateView):
     form_class = BookEditForm
 
     def get_object(self):
+        prefetch_related_objects([self.book], "reads__highlight_set")
         return self.book
 
     @context
@@ -434,7 +444,10 @@ class ToReviewEdit(LoginRequiredMixin, FormView):
     @cached_property
     def book(self):
         return get_object_or_404(
-            Book.all_objects.filter(status=BookStatus.TO_REVIEW), pk=self.kwargs["pk"]
+            Book.all_objects.filter(status=BookStatus.TO_REVIEW).prefetch_related(
+                "reads__highlight_set"
+            ),
+            pk=self.kwargs["pk"],
         )
 
     def get_form_kwargs(self):
@@ -468,6 +481,25 @@ def to_review_dismiss(request, pk):
     return redirect("/b/toreview/")
 
 
+class HighlightSearch(LoginRequiredMixin, TemplateView):
+    """Full-text search across every KOReader highlight, to find a passage
+    again without remembering which book it was in."""
+
+    template_name = "private/highlight_search.html"
+
+    @context
+    @cached_property
+    def query(self):
+        return self.request.GET.get("q", "").strip()
+
+    @context
+    @cached_property
+    def highlights(self):
+        return Highlight.objects.search(self.query).select_related(
+            "book__primary_author"
+        )[:100]
+
+
 class ApiTokenList(LoginRequiredMixin, CreateView):
     """List, create and revoke API tokens. Token values are displayed in
     full: this is a single-user personal app, and clients like KOReader need
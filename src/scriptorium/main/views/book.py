@@ -1,7 +1,11 @@
+import mimetypes
 from collections import defaultdict
 from itertools import groupby
+from pathlib import Path
+from urllib.parse import quote
 
 import networkx as nx
+from django.conf import settings
 from django.db.models import Avg, Count, Max
 from django.db.models.functions import Coalesce
 from django.http import FileResponse, HttpResponse, HttpResponseNotFound, JsonResponse
@@ -9,11 +13,21 @@ from django.shortcuts import get_object_or_404
 from django.template import loader
 from django.utils.functional import cached_property
 from django.utils.timezone import now
-from django.views.generic import ListView, TemplateView
+from django.views.generic import ListView, TemplateView, View
 from django_context_decorator import context
 
+from scriptorium.main.cover_cache import CoverCache
 from scriptorium.main.forms import CatalogueForm
-from scriptorium.main.models import Book, Tag
+from scriptorium.main.models import (
+    Book,
+    BookStatus,
+    Job,
+    Read,
+    Tag,
+    Thumbnail,
+    get_cover_formats,
+)
+from scriptorium.main.sprites import get_sprites
 from scriptorium.main.stats import (
     get_all_years,
     get_charts,
@@ -27,18 +41,35 @@ from scriptorium.main.stats import (
 from scriptorium.main.views.mixins import ActiveTemplateMixin, AuthorMixin, ReviewMixin
 
 
-class IndexView(ActiveTemplateMixin, TemplateView):
+class SpriteMixin:
+    """Adds ``sprites``, the cover sprite sheet placements for the books
+    returned by ``get_sprite_books``, in display order."""
+
+    @context
+    @cached_property
+    def sprites(self):
+        return get_sprites(self.get_sprite_books())
+
+
+class IndexView(SpriteMixin, ActiveTemplateMixin, TemplateView):
     template_name = "public/index.html"
 
     @context
+    @cached_property
     def shelf_books(self):
-        return Book.objects.all().order_by("primary_author__name")
+        return list(Book.objects.all().order_by("primary_author__name"))
 
     @context
+    @cached_property
     def books(self):
-        return Book.objects.annotate(last_read=Max("reads__finished_on")).order_by(
-            "-last_read"
-        )[:5]
+        return list(
+            Book.objects.annotate(last_read=Max("reads__finished_on")).order_by(
+                "-last_read"
+            )[:5]
+        )
+
+    def get_sprite_books(self):
+        return [book for book in self.shelf_books if book.spine_color] + self.books
 
 
 def feed_view(request):
@@ -60,7 +91,7 @@ class YearNavMixin:
         return get_all_years()
 
 
-class YearView(YearNavMixin, ActiveTemplateMixin, TemplateView):
+class YearView(SpriteMixin, YearNavMixin, ActiveTemplateMixin, TemplateView):
     template_name = "public/list_reviews.html"
     active = "read"
 
@@ -88,6 +119,9 @@ class YearView(YearNavMixin, ActiveTemplateMixin, TemplateView):
             reverse=True,
         )
 
+    def get_sprite_books(self):
+        return self.books
+
 
 class YearInBooksView(YearView):
     template_name = "public/year_stats.html"
@@ -104,6 +138,14 @@ class YearInBooksView(YearView):
         return get_year_stats(self.year)
 
 
+def sprite_pages():
+    """The books of every page with sprite sheets, picked like the views
+    pick them, for ``runjobs`` to build the sheets the pages need."""
+    yield IndexView().get_sprite_books()
+    for year in Read.objects.dates("finished_on", "year"):
+        yield YearView(kwargs={"year": year.year}).get_sprite_books()
+
+
 class ReviewByAuthor(YearNavMixin, ActiveTemplateMixin, TemplateView):
     template_name = "public/list_by_author.html"
     active = "read"
@@ -278,21 +320,111 @@ class ReviewView(ReviewMixin, ActiveTemplateMixin, TemplateView):
     active = "review"
 
 
-class ReviewCoverView(ReviewView):
-    def dispatch(self, *args, **kwargs):
+def send_file(path, accel_path):
+    """Respond with the file at ``path``. With MEDIA_SENDFILE set the front
+    proxy transfers the bytes instead of a Python worker, nginx finding the
+    file at ``accel_path``."""
+    if not settings.MEDIA_SENDFILE:
+        return FileResponse(Path(path).open("rb"))
+    content_type = mimetypes.guess_type(path)[0]
+    response = HttpResponse(content_type=content_type or "application/octet-stream")
+    if settings.MEDIA_SENDFILE == "x-accel-redirect":
+        response["X-Accel-Redirect"] = quote(accel_path)
+    else:
+        response["X-Sendfile"] = str(path)
+    return response
+
+
+def send_cover_file(request, book, file, cacheable=True):
+    """Respond with a cover (or derivative) file. Requested under the
+    current content hash (``?v=``, see ``Book.cover_url``), the file can be
+    cached forever; everything else, like the cover standing in for a
+    missing thumbnail, only briefly."""
+    response = send_file(file.path, settings.MEDIA_ACCEL_PREFIX + file.name)
+    version = request.GET.get("v")
+    if cacheable and version and book.cover_hash and version == book.cover_hash[:16]:
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    else:
+        response["Cache-Control"] = "public, max-age=3600"
+    return response
+
+
+class CoverFileView(View):
+    """Base for the cover file views. Covers are requested a page full at a
+    time, so these skip the review's prefetches: the book, or the book and
+    its thumbnail, come from a single query on the (author, title) index."""
+
+    def lookup(self):
+        return {
+            "primary_author__name_slug": self.kwargs["author"],
+            "title_slug": self.kwargs["book"],
+            "status": BookStatus.REVIEWED,
+        }
+
+    @cached_property
+    def book(self):
+        return get_object_or_404(
+            Book.all_objects.only("cover", "cover_hash"), **self.lookup()
+        )
+
+    def thumbnail(self, **filters):
+        return (
+            Thumbnail.objects.select_related("book")
+            .only("thumb", "book__cover", "book__cover_hash")
+            .filter(
+                **{f"book__{key}": value for key, value in self.lookup().items()},
+                **filters,
+            )
+            .first()
+        )
+
+    def send_missing(self, kind):
+        """Serve the full cover while job ``kind`` renders the derivative."""
         if not self.book.cover:
             return HttpResponseNotFound()
-        return FileResponse(self.book.cover)
+        Job.objects.enqueue(kind, self.book)
+        return send_cover_file(
+            self.request, self.book, self.book.cover, cacheable=False
+        )
 
 
-class ReviewCoverThumbnailView(ReviewView):
-    def dispatch(self, *args, **kwargs):
+class ReviewCoverView(CoverFileView):
+    def get(self, request, *args, **kwargs):
         if not self.book.cover:
             return HttpResponseNotFound()
-        if not self.book.cover_thumbnail or not self.book.cover_thumbnail.thumb:
-            self.book.update_thumbnail()
-            self.book.__dict__.pop("cover_thumbnail", None)
-        return FileResponse(self.book.cover_thumbnail.thumb)
+        return send_cover_file(request, self.book, self.book.cover)
+
+
+class ReviewCoverThumbnailView(CoverFileView):
+    def get(self, request, *args, **kwargs):
+        thumbnail = self.thumbnail(size="thumbnail")
+        if thumbnail and thumbnail.thumb:
+            return send_cover_file(request, thumbnail.book, thumbnail.thumb)
+        return self.send_missing(Job.Kind.UPDATE_THUMBNAIL)
+
+
+class ReviewCoverDerivativeView(CoverFileView):
+    def get(self, request, *args, width, format, **kwargs):  # noqa: A002
+        if width not in settings.COVER_WIDTHS or format not in get_cover_formats():
+            return HttpResponseNotFound()
+        derivative = self.thumbnail(size=f"{width}w", format=format)
+        if derivative and derivative.thumb:
+            return send_cover_file(request, derivative.book, derivative.thumb)
+        return self.send_missing(Job.Kind.UPDATE_DERIVATIVES)
+
+
+def sprite_sheet(request, key):
+    """Serve a sprite sheet built by ``build_missing_sheets``. Its key is the
+    hash of its contents, so it never changes."""
+    cache = CoverCache()
+    path = cache.get(key, "sprite.jpg")
+    if not path:
+        return HttpResponseNotFound()
+    response = send_file(
+        path, settings.COVER_CACHE_ACCEL_PREFIX + str(path.relative_to(cache.root))
+    )
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
 
 
 class QueueView(ActiveTemplateMixin, TemplateView):
@@ -66,10 +66,59 @@ WSGI_APPLICATION = "scriptorium.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# SQLite is tuned for public reads alongside the occasional long write (a
+# KOReader sync, a review wizard save): in WAL mode readers don't wait for
+# writers, writers queue for up to SQLITE_BUSY_TIMEOUT seconds instead of
+# failing, and transactions take the write lock when they begin (IMMEDIATE),
+# so two of them can't deadlock upgrading their read locks. Every pragma can
+# be overridden from the environment, e.g. SCRIPTORIUM_SQLITE_MMAP_SIZE=0;
+# the benchmark_database command compares the profile to SQLite's defaults.
+SQLITE_PRAGMAS = {
+    "journal_mode": os.environ.get("SCRIPTORIUM_SQLITE_JOURNAL_MODE", "wal"),
+    "synchronous": os.environ.get("SCRIPTORIUM_SQLITE_SYNCHRONOUS", "normal"),
+    "mmap_size": int(
+        os.environ.get("SCRIPTORIUM_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
+    ),
+    # Negative sizes are in KiB.
+    "cache_size": int(os.environ.get("SCRIPTORIUM_SQLITE_CACHE_SIZE", str(-64 * 1024))),
+    "temp_store": os.environ.get("SCRIPTORIUM_SQLITE_TEMP_STORE", "memory"),
+}
+SQLITE_BUSY_TIMEOUT = float(os.environ.get("SCRIPTORIUM_SQLITE_BUSY_TIMEOUT", "10"))
+
 DATABASES = {
-    "default": {"ENGINE": "django.db.backends.sqlite3", "NAME": DATA_DIR / "db.sqlite3"}
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": DATA_DIR / "db.sqlite3",
+        # Workers keep their connection (and its page cache) between requests.
+        "CONN_MAX_AGE": int(os.environ.get("SCRIPTORIUM_CONN_MAX_AGE", "600")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": ";".join(
+                f"PRAGMA {name}={value}" for name, value in SQLITE_PRAGMAS.items()
+            ),
+            "timeout": SQLITE_BUSY_TIMEOUT,
+            "transaction_mode": "IMMEDIATE",
+        },
+    }
 }
 
+# PostgreSQL instead of the SQLite file, so several app nodes can share one
+# database: set SCRIPTORIUM_DATABASE=postgresql and the SCRIPTORIUM_DB_*
+# variables (empty ones fall back to libpq's defaults and PG* variables).
+# Needs the postgres extra (psycopg).
+if os.environ.get("SCRIPTORIUM_DATABASE") == "postgresql":
+    DATABASES["default"] = {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.environ.get("SCRIPTORIUM_DB_NAME", "scriptorium"),
+        "USER": os.environ.get("SCRIPTORIUM_DB_USER", ""),
+        "PASSWORD": os.environ.get("SCRIPTORIUM_DB_PASSWORD", ""),
+        "HOST": os.environ.get("SCRIPTORIUM_DB_HOST", ""),
+        "PORT": os.environ.get("SCRIPTORIUM_DB_PORT", ""),
+        "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": True,
+    }
+    INSTALLED_APPS.append("django.contrib.postgres")
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -120,6 +169,76 @@ border_files = list(
 )
 MAX_BORDER = max(int(file.stem) for file in border_files) if border_files else 0
 
+# Cover derivatives: the widths (in px) rendered for srcset, and the formats
+# offered ahead of the JPEG fallback. Formats this Pillow build cannot encode
+# are skipped.
+COVER_WIDTHS = (120, 240, 360)
+COVER_FORMATS = ("avif", "webp")
+
+# Palettes and thumbnails are cached by the hash of the cover bytes, and the
+# least recently used entries are evicted beyond this size.
+COVER_CACHE_DIR = DATA_DIR / "cover-cache"
+COVER_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+# Cover files can be handed to the front proxy instead of being streamed by
+# Django: "x-accel-redirect" (nginx, with MEDIA_ACCEL_PREFIX and
+# COVER_CACHE_ACCEL_PREFIX internal locations aliased to MEDIA_ROOT and
+# COVER_CACHE_DIR) or "x-sendfile" (Apache, lighttpd).
+MEDIA_SENDFILE = os.environ.get("SCRIPTORIUM_MEDIA_SENDFILE") or None
+MEDIA_ACCEL_PREFIX = "/internal-media/"
+COVER_CACHE_ACCEL_PREFIX = "/internal-cover-cache/"
+
+# Sprite sheets pack a page's covers into a few images: tiles fit this box
+# (CSS px), in sheets of about SPRITE_SHEET_TILES covers, SPRITE_COLUMNS wide.
+SPRITE_TILE_SIZE = (140, 130)
+SPRITE_COLUMNS = 8
+SPRITE_SHEET_TILES = 40
+
+# Metadata lookups (OpenLibrary, Goodreads) are cached on disk, shared by
+# all workers. Responses are fresh for their endpoint's TTL (seconds), then
+# served for up to HTTP_CACHE_STALE more seconds while being refetched in the
+# background. Not-found responses are cached for HTTP_CACHE_NEGATIVE_TTL.
+HTTP_CACHE_PATH = DATA_DIR / "http-cache.sqlite3"
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+HTTP_CACHE_TTLS = {
+    "openlibrary-search": 24 * 60 * 60,
+    "openlibrary-editions": 7 * 24 * 60 * 60,
+    "openlibrary-book": 30 * 24 * 60 * 60,
+    "goodreads-book": 30 * 24 * 60 * 60,
+    "cover-image": 60 * 60,
+}
+HTTP_CACHE_STALE = 7 * 24 * 60 * 60
+HTTP_CACHE_NEGATIVE_TTL = 60 * 60
+
+# OpenLibrary asks clients to identify themselves and to stay below three
+# requests per second; edition pages are fetched by a few threads sharing
+# that budget, up to OPENLIBRARY_EDITION_PAGES pages per work.
+OPENLIBRARY_USER_AGENT = os.environ.get(
+    "SCRIPTORIUM_OPENLIBRARY_USER_AGENT", "scriptorium (https://books.rixx.de)"
+)
+OPENLIBRARY_RATE_LIMIT = 3
+OPENLIBRARY_WORKERS = 3
+OPENLIBRARY_EDITION_PAGES = 20
+# Goodreads has no documented limit; bulk enrichment stays gentle anyway.
+GOODREADS_RATE_LIMIT = 1
+
+# Local index of the OpenLibrary dumps (see the importopenlibrary command),
+# consulted before the API.
+OPENLIBRARY_INDEX_PATH = DATA_DIR / "openlibrary.sqlite3"
+
+# The review wizard fetches the editions of the top search results and the
+# chosen edition's cover in the background, before the next step asks.
+METADATA_PREFETCH = True
+METADATA_PREFETCH_WORKS = 3
+
+# The backup command snapshots the database and media here; see
+# scriptorium.main.backup. The database is copied BACKUP_PAGES_PER_STEP pages
+# at a time, waiting BACKUP_STEP_SLEEP seconds whenever it is locked.
+BACKUP_DIR = DATA_DIR / "backups"
+BACKUP_KEEP_DAYS = 30
+BACKUP_PAGES_PER_STEP = 1024
+BACKUP_STEP_SLEEP = 0.25
+
 DEPLOY_FLAG_FILE = os.environ.get(
     "SCRIPTORIUM_DEPLOY_FLAG_FILE", str(DATA_DIR / "deploy.flag")
 )
@@ -22,6 +22,7 @@ urlpatterns = [
     path("b/quotes/<int:pk>/delete", views.QuoteDelete.as_view()),
     path("b/poems/new/", views.PoemCreate.as_view()),
     path("b/poems/", views.PoemPrivateList.as_view()),
+    path("b/highlights/", views.HighlightSearch.as_view()),
     path("b/tokens/", views.ApiTokenList.as_view()),
     path("b/tokens/<int:pk>/delete", views.api_token_delete),
     path("b/toreview/", views.ToReviewList.as_view()),
@@ -52,6 +53,7 @@ urlpatterns = [
     path("q/<int:pk>/", views.QuoteView.as_view()),
     path("img/border/all/", views.BorderImageList.as_view()),
     path("img/border/", views.border_image),
+    path("sprites/<slug:key>.jpg", views.sprite_sheet),
     path("poems/", views.PoemList.as_view()),
     path("poems/<slug:author>/<slug:slug>/", views.PoemView.as_view()),
     path("<slug:author>/", views.AuthorView.as_view()),
@@ -61,6 +63,10 @@ urlpatterns = [
     path("<slug:author>/<slug:book>/poems/", views.PoemBookList.as_view()),
     path("<slug:author>/<slug:book>/poems/<slug:slug>/", views.PoemView.as_view()),
     path("<slug:author>/<slug:book>/cover.jpg", views.ReviewCoverView.as_view()),
+    path(
+        "<slug:author>/<slug:book>/cover-<int:width>.<slug:format>",
+        views.ReviewCoverDerivativeView.as_view(),
+    ),
     path(
         "<slug:author>/<slug:book>/thumbnail.jpg",
         views.ReviewCoverThumbnailView.as_view(),
@@ -33,6 +33,24 @@ def _simple_static_storage(settings):
     }
 
 
+@pytest.fixture(autouse=True)
+def _cover_cache_tmp(settings, tmp_path):
+    """Keep the cover cache out of the data directory."""
+    settings.COVER_CACHE_DIR = tmp_path / "cover-cache"
+
+
+@pytest.fixture(autouse=True)
+def _metadata_tmp(settings, tmp_path):
+    """Start every test with an empty metadata HTTP cache and without an
+    OpenLibrary dump index, and don't make tests wait for the OpenLibrary
+    and Goodreads rate limits or leave prefetches running."""
+    settings.HTTP_CACHE_PATH = tmp_path / "http-cache.sqlite3"
+    settings.OPENLIBRARY_INDEX_PATH = tmp_path / "openlibrary.sqlite3"
+    settings.OPENLIBRARY_RATE_LIMIT = 10_000
+    settings.GOODREADS_RATE_LIMIT = 10_000
+    settings.METADATA_PREFETCH = False
+
+
 @pytest.fixture
 def author():
     return AuthorFactory(name="Ursula K. Le Guin", name_slug="ursula-k-le-guin")
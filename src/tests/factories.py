@@ -8,6 +8,7 @@ from scriptorium.main.models import (
     Author,
     Book,
     BookStatus,
+    Highlight,
     Page,
     Poem,
     PoemStatus,
@@ -100,6 +101,20 @@ class ReadFactory(factory.django.DjangoModelFactory):
     finished_on = factory.LazyFunction(lambda: dt.date(2024, 6, 15))
 
 
+class HighlightFactory(factory.django.DjangoModelFactory):
+    class Meta:
+        model = Highlight
+
+    read = factory.SubFactory(ReadFactory)
+    book = factory.SelfAttribute("read.book")
+    text = factory.Sequence(lambda n: f"Highlighted passage {n}")
+    chapter = None
+    pageno = None
+    content_hash = factory.LazyAttribute(
+        lambda o: Highlight.hash_content(o.text, o.chapter, o.pageno)
+    )
+
+
 class QuoteFactory(factory.django.DjangoModelFactory):
     class Meta:
         model = Quote
@@ -32,6 +32,8 @@ def test_openapi_schema_lists_all_routes(client):
         "/api/tags/",
         "/api/series/",
         "/api/koreader/sync/",
+        "/api/koreader/jobs/{job_id}/",
+        "/api/export/",
         "/api/openlibrary/search/",
         "/api/openlibrary/works/{work_id}/editions/",
         "/api/openlibrary/books/{olid}/",
@@ -1,14 +1,27 @@
 import datetime as dt
 
 import pytest
+from django.core.management import call_command
 from django.utils.timezone import now
 
-from scriptorium.api.routes.koreader import (
+from scriptorium.api.routes.koreader import _parse_version
+from scriptorium.main import koreader
+from scriptorium.main.koreader import (
+    KoreaderBookIn,
     _extract_isbns,
-    _parse_version,
     _series_position,
+    run_sync_job,
+)
+from scriptorium.main.models import (
+    Author,
+    Book,
+    BookStatus,
+    Highlight,
+    KoreaderSyncJob,
+    Read,
+    Series,
+    Spine,
 )
-from scriptorium.main.models import Author, Book, BookStatus, Read, Series
 from tests.factories import AuthorFactory, BookFactory, ReadFactory, make_reviewed_book
 
 pytestmark = pytest.mark.django_db
@@ -44,9 +57,9 @@ def _book_payload(**overrides):
     return payload
 
 
-def _sync(api_client, *books, plugin_version="1.0.0"):
+def _sync(api_client, *books, plugin_version="1.0.0", run_async=False):
     return api_client.post(
-        "/api/koreader/sync/",
+        "/api/koreader/sync/?async=true" if run_async else "/api/koreader/sync/",
         {
             "plugin_version": plugin_version,
             "device": {"id": "inkpalm-test", "model": "InkPalm 5"},
@@ -141,6 +154,8 @@ def test_koreader_sync_auto_creates_book_in_review_queue(api_client):
                 "book": "ursula-k-le-guin/the-left-hand-of-darkness",
                 "read_id": read.pk,
                 "highlights_stored": 1,
+                "highlights_duplicate": 0,
+                "highlights_watermark": "2026-06-28 21:14:03",
                 "warnings": ["ISBN not in library; matched by title/author"],
                 "detail": None,
             }
@@ -155,6 +170,7 @@ def test_koreader_sync_auto_creates_book_in_review_queue(api_client):
     assert book.series.name == "Hainish Cycle"
     assert book.series_position == "6"
     assert book.primary_author.name == "Ursula K. Le Guin"
+    assert book.shelf_layout == Spine(book).layout
     assert read.finished_on == dt.date(2026, 7, 1)
     assert read.started_on == dt.date(2026, 6, 12)
     assert read.total_time_seconds == 25440
@@ -272,7 +288,8 @@ def test_koreader_sync_repush_updates_read_in_place(api_client):
     result = response.json()["results"][0]
     assert result["action"] == "updated_read"
     assert result["read_id"] == first.json()["results"][0]["read_id"]
-    assert result["highlights_stored"] == 2
+    assert result["highlights_stored"] == 1
+    assert result["highlights_duplicate"] == 1
     assert Book.all_objects.count() == 1
     read = Read.objects.get()
     assert read.highlights == new_highlights
@@ -396,6 +413,24 @@ def test_koreader_sync_batch_is_all_or_nothing(api_client):
     assert not Read.objects.exists()
 
 
+def test_koreader_sync_batch_reports_invalid_reads_without_writing(api_client):
+    """Read validation happens before any write, so a read that can't be
+    stored fails its book (and the batch) without leaving partial rows."""
+    response = _sync(
+        api_client,
+        _book_payload(),
+        _book_payload(md5="c" * 32, title="Too Long", total_time_seconds=2**63),
+    )
+
+    assert response.status_code == 422
+    assert [
+        (result["md5"], result["action"]) for result in response.json()["results"]
+    ] == [("c" * 32, "error")]
+    assert not Book.all_objects.exists()
+    assert not Author.objects.exists()
+    assert not Read.objects.exists()
+
+
 def test_koreader_sync_batch_updates_and_creates_in_one_push(api_client):
     _sync(api_client, _book_payload())
 
@@ -418,6 +453,418 @@ def test_koreader_sync_batch_updates_and_creates_in_one_push(api_client):
     assert Author.objects.count() == 1
 
 
+def test_koreader_sync_batch_matches_books_created_earlier_in_the_same_push(api_client):
+    """Later books in a push see what earlier ones created: the same device
+    file twice updates the pending read, a second copy of the same book (by
+    slug or ISBN) matches the book created a moment ago."""
+    response = _sync(
+        api_client,
+        _book_payload(),
+        _book_payload(summary_note="Second thoughts."),
+        _book_payload(md5="c" * 32, identifiers=[], finished_on="2026-07-02"),
+        _book_payload(
+            md5="d" * 32,
+            title="Retitled Edition",
+            authors=["Someone Else"],
+            finished_on="2026-07-03",
+        ),
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    book = Book.all_objects.get()
+    assert [result["action"] for result in results] == [
+        "created_book",
+        "updated_read",
+        "matched",
+        "matched",
+    ]
+    assert {result["book"] for result in results} == {book.slug}
+    assert results[0]["read_id"] == results[1]["read_id"]
+    reads = {read.finished_on: read for read in book.reads.all()}
+    assert sorted(reads) == [
+        dt.date(2026, 7, 1),
+        dt.date(2026, 7, 2),
+        dt.date(2026, 7, 3),
+    ]
+    assert reads[dt.date(2026, 7, 1)].pk == results[0]["read_id"]
+    assert reads[dt.date(2026, 7, 1)].notes == "Second thoughts."
+    assert reads[dt.date(2026, 7, 2)].koreader_md5 == "c" * 32
+    assert Author.objects.count() == 1
+
+
+def test_koreader_sync_batch_matches_a_device_file_seen_earlier_in_the_push(api_client):
+    """A device file pushed twice with different metadata is still one
+    book: its second copy updates the read the first one created."""
+    response = _sync(
+        api_client,
+        _book_payload(),
+        _book_payload(title="Retitled", authors=["Someone Else"], identifiers=[]),
+    )
+
+    assert [result["action"] for result in response.json()["results"]] == [
+        "created_book",
+        "updated_read",
+    ]
+    assert Book.all_objects.count() == 1
+    assert Read.objects.count() == 1
+
+
+def test_koreader_sync_batch_reports_unexpected_errors_per_book(
+    api_client, monkeypatch
+):
+    full_clean = Read.full_clean
+
+    def explode(self, *args, **kwargs):
+        if self.koreader_md5 == "c" * 32:
+            raise RuntimeError("disk on fire")
+        return full_clean(self, *args, **kwargs)
+
+    monkeypatch.setattr(Read, "full_clean", explode)
+
+    response = _sync(
+        api_client, _book_payload(), _book_payload(md5="c" * 32, title="Other")
+    )
+
+    assert response.status_code == 422
+    assert response.json()["results"] == [
+        {
+            "md5": "c" * 32,
+            "action": "error",
+            "detail": "disk on fire",
+            "book": None,
+            "read_id": None,
+            "highlights_stored": 0,
+            "highlights_duplicate": 0,
+            "highlights_watermark": None,
+            "warnings": [],
+        }
+    ]
+    assert not Book.all_objects.exists()
+
+
+@pytest.mark.parametrize("failing", ["c" * 32, None])
+def test_koreader_sync_batch_isolates_failing_writes(api_client, monkeypatch, failing):
+    """A bulk write that fails is retried book by book to tell which book
+    failed; a failure only the whole batch runs into is raised."""
+    bulk_ingest = Read.objects.bulk_ingest
+
+    def ingest(reads):
+        reads = list(reads)
+        if failing is None and len(reads) > 1:
+            raise RuntimeError("batch too large")
+        if any(read.koreader_md5 == failing for read in reads):
+            raise RuntimeError(f"cannot store {failing}")
+        return bulk_ingest(reads)
+
+    monkeypatch.setattr(Read.objects, "bulk_ingest", ingest)
+    books = (_book_payload(), _book_payload(md5="c" * 32, title="Other"))
+
+    if failing is None:
+        with pytest.raises(RuntimeError, match="batch too large"):
+            koreader.apply_books(
+                [KoreaderBookIn.model_validate(book) for book in books]
+            )
+    else:
+        response = _sync(api_client, *books)
+        assert response.status_code == 422
+        assert [
+            (result["md5"], result["detail"]) for result in response.json()["results"]
+        ] == [(failing, f"cannot store {failing}")]
+    assert not Book.all_objects.exists()
+    assert not Read.objects.exists()
+
+
+def test_koreader_sync_batch_promotes_slug_matched_to_read_book(api_client):
+    author = AuthorFactory(name="Ursula K. Le Guin", name_slug="ursula-k-le-guin")
+    book = BookFactory(
+        title="The Left Hand of Darkness",
+        title_slug="the-left-hand-of-darkness",
+        primary_author=author,
+        status=BookStatus.TO_READ,
+    )
+
+    _sync(api_client, _book_payload(identifiers=[]), _book_payload(md5="c" * 32))
+
+    book.refresh_from_db()
+    assert book.status == BookStatus.TO_REVIEW
+    assert book.reads.count() == 2
+
+
+def test_koreader_sync_files_new_books_under_existing_series(api_client):
+    series = Series.objects.create(name="Hainish Cycle", name_slug="hainish-cycle")
+
+    _sync(api_client, _book_payload(series="hainish cycle"))
+
+    assert Book.all_objects.get().series == series
+    assert list(Series.objects.all()) == [series]
+
+
+@pytest.mark.parametrize("item_count", [1, 3])
+def test_koreader_sync_query_count_is_constant(
+    api_client, django_assert_num_queries, item_count
+):
+    """A push resolves all of its books with a fixed number of lookups and
+    bulk writes, however many books it carries."""
+    existing = make_reviewed_book(reads=[])
+    ReadFactory(book=existing, finished_on=dt.date(2026, 7, 1), koreader_md5=MD5)
+    books = [
+        _book_payload(
+            md5=f"{index:032x}",
+            title=f"New Book {index}",
+            authors=[f"New Author {index}"],
+            identifiers=[],
+            series=f"New Series {index}",
+        )
+        for index in range(item_count)
+    ]
+
+    with django_assert_num_queries(22):
+        response = _sync(api_client, _book_payload(), *books)
+
+    assert response.status_code == 200
+    assert [result["action"] for result in response.json()["results"]] == [
+        "updated_read",
+        *["created_book"] * item_count,
+    ]
+    assert Book.all_objects.count() == item_count + 1
+
+
+# --- Async jobs -----------------------------------------------------------------
+
+
+def test_koreader_async_sync_only_stores_the_push(api_client):
+    response = _sync(api_client, _book_payload(), run_async=True)
+
+    assert response.status_code == 202
+    data = response.json()
+    job = KoreaderSyncJob.objects.get()
+    assert data["id"] == job.pk
+    assert data["status"] == "pending"
+    assert data["results"] == []
+    assert data["finished"] is None
+    assert job.payload["books"][0]["md5"] == MD5
+    assert not Book.all_objects.exists()
+
+
+def test_koreader_async_sync_still_gates_plugin_version(api_client):
+    response = _sync(
+        api_client, _book_payload(), plugin_version="0.9.0", run_async=True
+    )
+
+    assert response.status_code == 426
+    assert not KoreaderSyncJob.objects.exists()
+
+
+def test_koreader_async_job_reports_same_results_as_sync(api_client):
+    """Polling a finished job yields exactly what the synchronous endpoint
+    would have answered for the same push."""
+    job_id = _sync(api_client, _book_payload(), run_async=True).json()["id"]
+
+    call_command("runkoreaderjobs")
+
+    response = api_client.get(f"/api/koreader/jobs/{job_id}/")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "done"
+    assert data["finished"] is not None
+    read = Read.objects.get()
+    assert data["results"] == [
+        {
+            "md5": MD5,
+            "action": "created_book",
+            "book": read.book.slug,
+            "read_id": read.pk,
+            "highlights_stored": 1,
+            "highlights_duplicate": 0,
+            "highlights_watermark": "2026-06-28 21:14:03",
+            "warnings": ["ISBN not in library; matched by title/author"],
+            "detail": None,
+        }
+    ]
+    assert read.highlights == [HIGHLIGHT]
+    assert read.book.status == BookStatus.TO_REVIEW
+
+
+def test_koreader_async_job_failure_is_all_or_nothing(api_client):
+    job_id = _sync(
+        api_client,
+        _book_payload(),
+        _book_payload(md5="b" * 32, title="!!!", identifiers=[]),
+        run_async=True,
+    ).json()["id"]
+
+    call_command("runkoreaderjobs")
+
+    data = api_client.get(f"/api/koreader/jobs/{job_id}/").json()
+    assert data["status"] == "failed"
+    assert [(result["md5"], result["action"]) for result in data["results"]] == [
+        ("b" * 32, "error")
+    ]
+    assert not Book.all_objects.exists()
+
+
+def test_koreader_async_job_runs_only_once(api_client):
+    _sync(api_client, _book_payload(), run_async=True)
+    job = KoreaderSyncJob.objects.get()
+
+    assert run_sync_job(job) is True
+    assert run_sync_job(job) is False
+    assert Read.objects.count() == 1
+
+
+def test_koreader_async_job_crash_marks_job_failed(api_client, monkeypatch):
+    """An unexpected error rolls the push back and marks the job failed
+    rather than leaving it running forever; the worker moves on."""
+
+    def crash(self):
+        raise RuntimeError("disk on fire")
+
+    monkeypatch.setattr(koreader._SyncBatch, "apply", crash)
+    _sync(api_client, _book_payload(), run_async=True)
+
+    call_command("runkoreaderjobs")
+
+    job = KoreaderSyncJob.objects.get()
+    assert job.status == KoreaderSyncJob.Status.FAILED
+    assert job.finished is not None
+    assert job.results is None
+    assert api_client.get(f"/api/koreader/jobs/{job.pk}/").json()["results"] == []
+
+
+def test_koreader_async_job_with_outdated_payload_is_marked_failed(capsys):
+    """Pushes stored before a schema change may not validate anymore; they
+    fail instead of staying claimed."""
+    job = KoreaderSyncJob.objects.create(payload={"books": "not a list"})
+
+    call_command("runkoreaderjobs")
+
+    job.refresh_from_db()
+    assert job.status == KoreaderSyncJob.Status.FAILED
+    assert job.finished is not None
+    assert "validation errors for KoreaderSyncIn" in capsys.readouterr().out
+
+
+def test_koreader_async_jobs_of_dead_workers_are_requeued(api_client, capsys):
+    _sync(api_client, _book_payload(), run_async=True)
+    stale = KoreaderSyncJob.objects.get()
+    fresh = KoreaderSyncJob.objects.create(payload=stale.payload)
+    KoreaderSyncJob.objects.update(status=KoreaderSyncJob.Status.RUNNING)
+    KoreaderSyncJob.objects.filter(pk=stale.pk).update(
+        claimed=now() - KoreaderSyncJob.STALE_AFTER - dt.timedelta(seconds=1)
+    )
+    KoreaderSyncJob.objects.filter(pk=fresh.pk).update(claimed=now())
+
+    call_command("runkoreaderjobs")
+
+    stale.refresh_from_db()
+    fresh.refresh_from_db()
+    assert stale.status == KoreaderSyncJob.Status.DONE
+    assert fresh.status == KoreaderSyncJob.Status.RUNNING
+    assert capsys.readouterr().out == "Requeued 1 jobs whose worker died\n"
+
+
+def test_koreader_async_job_unknown_id_is_404(api_client):
+    assert api_client.get("/api/koreader/jobs/999/").status_code == 404
+
+
+# --- Highlight store ------------------------------------------------------------
+
+
+def test_koreader_sync_stores_highlights_once_per_book_across_rereads(api_client):
+    """A reread that highlights the same passage again doesn't duplicate it:
+    the highlight stays with the read that first brought it in."""
+    first = _sync(api_client, _book_payload()).json()["results"][0]
+    reread_highlight = {**HIGHLIGHT, "text": "New on the reread."}
+
+    response = _sync(
+        api_client,
+        _book_payload(
+            finished_on="2027-01-01",
+            highlights=[{**HIGHLIGHT, "note": "still good"}, reread_highlight],
+        ),
+    )
+
+    result = response.json()["results"][0]
+    assert result["highlights_stored"] == 1
+    assert result["highlights_duplicate"] == 1
+    first_read, reread = Read.objects.order_by("finished_on")
+    assert first_read.pk == first["read_id"]
+    assert first_read.highlights == [HIGHLIGHT]
+    assert reread.highlights == [reread_highlight]
+    assert Highlight.objects.count() == 2
+
+
+def test_koreader_sync_skips_highlights_repeated_within_a_push(api_client):
+    response = _sync(
+        api_client,
+        _book_payload(
+            highlights=[HIGHLIGHT, {**HIGHLIGHT, "text": f" {HIGHLIGHT['text']}"}]
+        ),
+    )
+
+    result = response.json()["results"][0]
+    assert result["highlights_stored"] == 1
+    assert result["highlights_duplicate"] == 1
+
+
+def test_koreader_sync_skips_invalid_highlights_and_truncates_long_fields(api_client):
+    """One broken highlight doesn't reject the push: KOReader would retry
+    it forever."""
+    long_colour = {**HIGHLIGHT, "text": "Colourful.", "color": "x" * 40}
+    response = _sync(
+        api_client,
+        _book_payload(
+            highlights=[HIGHLIGHT, {**HIGHLIGHT, "text": ""}, "nonsense", long_colour]
+        ),
+    )
+
+    result = response.json()["results"][0]
+    assert result["highlights_stored"] == 2
+    assert "skipped 2 invalid highlights" in result["warnings"]
+    assert Highlight.objects.get(text="Colourful.").color == "x" * 32
+
+
+def test_koreader_async_job_reports_skipped_highlights(api_client):
+    _sync(
+        api_client,
+        _book_payload(highlights=[HIGHLIGHT, {**HIGHLIGHT, "text": ""}]),
+        run_async=True,
+    )
+
+    call_command("runkoreaderjobs")
+
+    (result,) = KoreaderSyncJob.objects.get().results
+    assert result["highlights_stored"] == 1
+    assert "skipped 1 invalid highlights" in result["warnings"]
+
+
+def test_koreader_sync_reports_highlights_watermark(api_client):
+    """The watermark is the newest stamp the book has, stored or new, so a
+    delta push that only carries newer highlights moves it forward and one
+    without highlights keeps it."""
+    older = {**HIGHLIGHT, "text": "Older.", "datetime": "2026-06-01 10:00:00"}
+    undated = {**HIGHLIGHT, "text": "Undated.", "datetime": None}
+    first = _sync(api_client, _book_payload(highlights=[older, HIGHLIGHT, undated]))
+    assert first.json()["results"][0]["highlights_watermark"] == "2026-06-28 21:14:03"
+
+    newer = {**HIGHLIGHT, "text": "Newer.", "datetime": "2026-06-30 08:00:00"}
+    delta = _sync(api_client, _book_payload(highlights=[newer]))
+    empty = _sync(api_client, _book_payload(highlights=[]))
+
+    assert delta.json()["results"][0]["highlights_watermark"] == "2026-06-30 08:00:00"
+    assert empty.json()["results"][0]["highlights_watermark"] == "2026-06-30 08:00:00"
+    assert len(Read.objects.get().highlights) == 4
+
+
+def test_koreader_sync_without_highlights_has_no_watermark(api_client):
+    result = _sync(api_client, _book_payload(highlights=[])).json()["results"][0]
+
+    assert result["highlights_stored"] == 0
+    assert result["highlights_watermark"] is None
+    assert Read.objects.get().highlights is None
+
+
 # --- Highlights downstream ------------------------------------------------------
 
 
@@ -6,10 +6,6 @@ from tests.test_metadata import FakeResponse, _install_fake_get
 
 pytestmark = pytest.mark.django_db
 
-# The metadata helpers are wrapped in functools.cache, so every test uses a
-# unique query / work id / olid to avoid cross-test cache hits (same
-# convention as tests/test_metadata.py).
-
 
 def test_openlibrary_search_requires_token(client, api_token):
 
@@ -214,7 +210,7 @@ def test_openlibrary_book_maps_upstream_error_to_502(api_client, monkeypatch):
 
 
 def test_openlibrary_book_data_is_cached_between_requests(api_client, monkeypatch):
-    """The proxy leans on the metadata layer's functools.cache: repeated
+    """The proxy leans on the metadata layer's HTTP cache: repeated
     lookups of the same id hit OpenLibrary once."""
     calls = []
 
@@ -231,7 +227,7 @@ def test_openlibrary_book_data_is_cached_between_requests(api_client, monkeypatc
             }
         )
 
-    monkeypatch.setattr(metadata.requests, "get", fake_get)
+    monkeypatch.setattr(metadata.session, "get", fake_get)
 
     first = api_client.get("/api/openlibrary/books/OLAPICACHED1M/")
     second = api_client.get("/api/openlibrary/books/OLAPICACHED1M/")
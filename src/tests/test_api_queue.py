@@ -7,6 +7,7 @@ from scriptorium.main.models import Author, Book, BookStatus, Series
 from tests.factories import (
     AuthorFactory,
     BookFactory,
+    HighlightFactory,
     ReadFactory,
     SeriesFactory,
     make_reviewed_book,
@@ -552,15 +553,18 @@ def test_queue_list_query_count_is_constant(
     for index in range(item_count):
         book = BookFactory(title=f"Queued {index}", status=BookStatus.TO_REVIEW)
         book.additional_authors.add(AuthorFactory())
-        ReadFactory(book=book, finished_on=dt.date(2024, 5, 1 + index))
+        HighlightFactory(
+            read=ReadFactory(book=book, finished_on=dt.date(2024, 5, 1 + index))
+        )
 
     # Warm the auth throttle so only the token lookup itself is counted.
     api_client.get("/api/books/")
 
-    with django_assert_num_queries(4):
+    with django_assert_num_queries(5):
         response = api_client.get("/api/queue/")
 
     items = response.json()
     assert len(items) == item_count
     assert all(" & " in item["author"] for item in items)
     assert all(len(item["reads"]) == 1 for item in items)
+    assert all(len(item["reads"][0]["highlights"]) == 1 for item in items)
@@ -0,0 +1,128 @@
+import datetime as dt
+import json
+import sqlite3
+from contextlib import closing
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from scriptorium.main.backup import Backups
+from tests.factories import BookFactory
+
+# SQLite's backup API waits for open write transactions, like the one
+# around every non-transactional test.
+pytestmark = pytest.mark.django_db(transaction=True)
+sqlite_only = pytest.mark.skipif(
+    connection.vendor != "sqlite", reason="SQLite's backup API"
+)
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.BACKUP_DIR = tmp_path / "backups"
+    covers = settings.MEDIA_ROOT / "covers"
+    covers.mkdir(parents=True)
+    (covers / "a.jpg").write_bytes(b"cover a")
+    (covers / "b.jpg").write_bytes(b"cover b")
+    (covers / "copy-of-a.jpg").write_bytes(b"cover a")
+    return settings.MEDIA_ROOT
+
+
+def _titles(path):
+    with closing(sqlite3.connect(path)) as db:
+        return [row[0] for row in db.execute("SELECT title FROM main_book")]
+
+
+@sqlite_only
+def test_backup_snapshots_database_and_media(media):
+    BookFactory(title="Solaris")
+    backups = Backups()
+
+    snapshot, stored = backups.create()
+
+    assert _titles(snapshot / "db.sqlite3") == ["Solaris"]
+    assert stored == 2
+    linked = snapshot / "media" / "covers" / "copy-of-a.jpg"
+    assert linked.read_bytes() == b"cover a"
+    assert linked.stat().st_nlink == 3
+    manifest = json.loads((snapshot / "manifest.json").read_text())
+    assert set(manifest) == {"covers/a.jpg", "covers/b.jpg", "covers/copy-of-a.jpg"}
+
+
+@sqlite_only
+def test_backup_only_stores_changed_media(media, monkeypatch):
+    backups = Backups()
+    first, _ = backups.create()
+    (media / "covers" / "b.jpg").write_bytes(b"new cover b")
+    (media / "covers" / "c.jpg").write_bytes(b"cover a")
+    hashed = []
+    store = backups.store
+    monkeypatch.setattr(
+        backups, "store", lambda path: hashed.append(path) or store(path)
+    )
+
+    second, stored = backups.create()
+
+    assert sorted(path.name for path in hashed) == ["b.jpg", "c.jpg"]
+    assert stored == 1
+    assert (first / "media" / "covers" / "b.jpg").read_bytes() == b"cover b"
+    assert (second / "media" / "covers" / "b.jpg").read_bytes() == b"new cover b"
+    assert (second / "media" / "covers" / "a.jpg").samefile(
+        first / "media" / "covers" / "a.jpg"
+    )
+
+
+@sqlite_only
+def test_backup_rotation_keeps_latest_and_referenced_objects(media, settings):
+    backups = Backups()
+    assert backups.snapshots() == []
+    old, _ = backups.create()
+    incomplete = settings.BACKUP_DIR / "2000-01-01T000000.000000"
+    incomplete.mkdir()
+    (media / "covers" / "b.jpg").unlink()
+
+    assert backups.rotate() == 1
+    assert not incomplete.exists()
+    assert backups.rotate(keep_days=0) == 0
+    assert backups.snapshots() == [old]
+
+    latest, _ = backups.create()
+    assert backups.rotate(keep_days=0) == 1
+    assert backups.snapshots() == [latest]
+    assert sorted(path.name for path in backups.objects.glob("*/*")) == [
+        backups.store(media / "covers" / "a.jpg")[0]
+    ]
+
+
+@sqlite_only
+def test_backup_command(media, capsys, monkeypatch):
+    monkeypatch.setattr(
+        "scriptorium.main.backup.now", lambda: dt.datetime(2026, 1, 1, tzinfo=dt.UTC)
+    )
+    call_command("backup", "--no-media")
+    monkeypatch.setattr(
+        "scriptorium.main.backup.now", lambda: dt.datetime(2026, 3, 1, tzinfo=dt.UTC)
+    )
+
+    call_command("backup", "--keep-days", "7")
+
+    out = capsys.readouterr().out.splitlines()
+    assert out[0].endswith(
+        "2026-01-01T000000.000000: 0 media files copied, 0 old snapshots removed"
+    )
+    assert out[1].endswith(
+        "2026-03-01T000000.000000: 2 media files copied, 1 old snapshots removed"
+    )
+    (snapshot,) = Backups().snapshots()
+    assert (snapshot / "media" / "covers" / "a.jpg").exists()
+
+
+def test_backup_command_skips_other_databases(monkeypatch, media, capsys):
+    monkeypatch.setattr(connection, "vendor", "postgresql")
+
+    call_command("backup")
+
+    assert capsys.readouterr().out.startswith("Skipping backup: postgresql")
+    assert not Backups().directories()
@@ -1,9 +1,15 @@
 import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
 
 import pytest
+from django.core.files.base import ContentFile
 from django.core.management import call_command
+from django.core.management.base import CommandError
 
-from scriptorium.main.models import Book, BookStatus
+from scriptorium.main.calibre import CalibreLibrary, import_covers
+from scriptorium.main.models import Book, BookStatus, Job, Thumbnail
 from tests.factories import AuthorFactory, BookFactory
 
 pytestmark = pytest.mark.django_db
@@ -77,3 +83,303 @@ def test_calibre_import_creates_unknown_and_deletes_stale_queue_entries(tmp_path
     assert created.shelf == "ebook"
     assert created.pages == 200
     assert created.source == "calibre"
+
+
+# --- metadata.db ---
+
+CALIBRE_SCHEMA = """
+CREATE TABLE books (
+    id INTEGER PRIMARY KEY, title TEXT, path TEXT, has_cover BOOL,
+    last_modified TIMESTAMP
+);
+CREATE TABLE authors (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE books_authors_link (id INTEGER PRIMARY KEY, book INTEGER, author INTEGER);
+CREATE TABLE tags (id INTEGER PRIMARY KEY, name TEXT);
+CREATE TABLE books_tags_link (id INTEGER PRIMARY KEY, book INTEGER, tag INTEGER);
+CREATE TABLE custom_columns (
+    id INTEGER PRIMARY KEY, label TEXT, datatype TEXT, normalized BOOL
+);
+"""
+
+
+def _calibre_library(tmp_path, books, shelf_column=True, covers=None):
+    """A minimal Calibre library: ``books`` are (title, authors, tags,
+    pages, shelf) tuples, ``covers`` the cover.jpg contents by title.
+    #pages is a plain int column, #shelf a normalized text column, like
+    Calibre creates them."""
+    covers = covers or {}
+    path = tmp_path / "metadata.db"
+    with closing(sqlite3.connect(path)) as connection, connection:
+        connection.executescript(CALIBRE_SCHEMA)
+        connection.execute("INSERT INTO custom_columns VALUES (1, 'pages', 'int', 0)")
+        connection.execute(
+            "CREATE TABLE custom_column_1 (id INTEGER PRIMARY KEY, book INTEGER, value INTEGER)"
+        )
+        if shelf_column:
+            connection.execute(
+                "INSERT INTO custom_columns VALUES (2, 'shelf', 'text', 1)"
+            )
+            connection.execute(
+                "CREATE TABLE custom_column_2 (id INTEGER PRIMARY KEY, value TEXT)"
+            )
+            connection.execute(
+                "CREATE TABLE books_custom_column_2_link "
+                "(id INTEGER PRIMARY KEY, book INTEGER, value INTEGER)"
+            )
+        tags, authors, shelves = {}, {}, {}
+        for book_id, (title, names, book_tags, pages, shelf) in enumerate(books, 1):
+            connection.execute(
+                "INSERT INTO books VALUES (?, ?, ?, ?, ?)",
+                (
+                    book_id,
+                    title,
+                    f"Author/{title} ({book_id})",
+                    title in covers,
+                    f"2026-10-{book_id:02d} 12:00:00+00:00",
+                ),
+            )
+            if title in covers:
+                book_dir = tmp_path / "Author" / f"{title} ({book_id})"
+                book_dir.mkdir(parents=True)
+                (book_dir / "cover.jpg").write_bytes(covers[title])
+            for name in names:
+                author = authors.setdefault(name, len(authors) + 1)
+                connection.execute(
+                    "INSERT OR IGNORE INTO authors VALUES (?, ?)", (author, name)
+                )
+                connection.execute(
+                    "INSERT INTO books_authors_link (book, author) VALUES (?, ?)",
+                    (book_id, author),
+                )
+            for name in book_tags:
+                tag = tags.setdefault(name, len(tags) + 1)
+                connection.execute(
+                    "INSERT OR IGNORE INTO tags VALUES (?, ?)", (tag, name)
+                )
+                connection.execute(
+                    "INSERT INTO books_tags_link (book, tag) VALUES (?, ?)",
+                    (book_id, tag),
+                )
+            if pages is not None:
+                connection.execute(
+                    "INSERT INTO custom_column_1 (book, value) VALUES (?, ?)",
+                    (book_id, pages),
+                )
+            if shelf and shelf_column:
+                value = shelves.setdefault(shelf, len(shelves) + 1)
+                connection.execute(
+                    "INSERT OR IGNORE INTO custom_column_2 VALUES (?, ?)",
+                    (value, shelf),
+                )
+                connection.execute(
+                    "INSERT INTO books_custom_column_2_link (book, value) VALUES (?, ?)",
+                    (book_id, value),
+                )
+    return path
+
+
+QUEUED = ("on-device", "to-read")
+
+
+def test_calibre_library_reads_the_queue(tmp_path):
+    _calibre_library(
+        tmp_path,
+        [
+            ("Solaris", ["Stanisław Lem"], QUEUED, 204, "paper"),
+            (
+                "Good Omens",
+                ["Terry Pratchett", "Neil Gaiman"],
+                ("on-device", "To-Read 2026"),
+                None,
+                "ebook",
+            ),
+            ("Read Already", ["Someone"], ("on-device",), 100, "paper"),
+            ("Not On Device", ["Someone"], ("to-read",), 100, "paper"),
+        ],
+    )
+
+    assert CalibreLibrary(tmp_path).queue() == [
+        {
+            "title": "Solaris",
+            "authors": "Stanisław Lem",
+            "*shelf": "paper",
+            "*pages": 204,
+        },
+        {
+            "title": "Good Omens",
+            "authors": "Terry Pratchett & Neil Gaiman",
+            "*shelf": "ebook",
+        },
+    ]
+
+
+def test_calibre_library_without_custom_column(tmp_path):
+    path = _calibre_library(
+        tmp_path,
+        [("Solaris", ["Stanisław Lem"], QUEUED, 204, None)],
+        shelf_column=False,
+    )
+
+    assert CalibreLibrary(path).queue() == [
+        {"title": "Solaris", "authors": "Stanisław Lem", "*shelf": None, "*pages": 204}
+    ]
+
+
+def test_calibre_import_syncs_from_library_incrementally(tmp_path, capsys):
+    author = AuthorFactory(name="Ursula K. Le Guin", name_slug="ursula-k-le-guin")
+    kept = BookFactory(
+        title="The Dispossessed",
+        title_slug="the-dispossessed",
+        primary_author=author,
+        status=BookStatus.TO_READ,
+    )
+    stale = BookFactory(title="Gone", title_slug="gone", status=BookStatus.TO_READ)
+    reviewed = BookFactory(
+        title="Solaris",
+        title_slug="solaris",
+        primary_author=AuthorFactory(name="Stanisław Lem", name_slug="stanislaw-lem"),
+        status=BookStatus.REVIEWED,
+    )
+    _calibre_library(
+        tmp_path,
+        [
+            ("The Dispossessed", ["Ursula K. Le Guin"], QUEUED, 400, "paper"),
+            ("A Wizard of Earthsea", ["ursula k. le guin"], QUEUED, 200, "ebook"),
+            ("Solaris", ["Stanisław Lem"], QUEUED, 204, "paper"),
+            ("Roadside Picnic", ["Arkady Strugatsky"], QUEUED, None, "ebook"),
+            ("Monday Starts on Saturday", ["Arkady Strugatsky"], QUEUED, 250, "ebook"),
+        ],
+    )
+    state = tmp_path / "state.json"
+
+    call_command("calibre_import", "--library", str(tmp_path), "--state", str(state))
+
+    queue = Book.all_objects.filter(status=BookStatus.TO_READ).order_by("title")
+    assert [(b.title, b.primary_author.name, b.shelf, b.pages) for b in queue] == [
+        ("A Wizard of Earthsea", "Ursula K. Le Guin", "ebook", 200),
+        ("Monday Starts on Saturday", "Arkady Strugatsky", "ebook", 250),
+        ("Roadside Picnic", "Arkady Strugatsky", "ebook", 0),
+        ("The Dispossessed", "Ursula K. Le Guin", None, 200),
+    ]
+    assert queue.get(title="The Dispossessed").pk == kept.pk
+    assert not Book.all_objects.filter(pk=stale.pk).exists()
+    assert Book.all_objects.filter(title="Solaris").get().pk == reviewed.pk
+    assert all(book.shelf_layout for book in queue)
+
+    Book.all_objects.filter(source="calibre").delete()
+    call_command("calibre_import", "--library", str(tmp_path), "--state", str(state))
+
+    assert "unchanged since the last sync" in capsys.readouterr().out
+    assert not Book.all_objects.filter(source="calibre").exists()
+
+    call_command(
+        "calibre_import", "--library", str(tmp_path), "--state", str(state), "--force"
+    )
+
+    assert Book.all_objects.filter(source="calibre").count() == 3
+
+
+@pytest.mark.parametrize("args", [(), ("books.json", "--library", "library")])
+def test_calibre_import_needs_one_source(args):
+    with pytest.raises(CommandError, match="either a JSON file or --library"):
+        call_command("calibre_import", *args)
+
+
+def test_calibre_export_reads_library_without_calibredb(tmp_path, monkeypatch):
+    _calibre_library(tmp_path, [("Solaris", ["Stanisław Lem"], QUEUED, 204, "paper")])
+    monkeypatch.chdir(tmp_path)
+
+    call_command("calibre_export", "--library", str(tmp_path))
+
+    assert json.loads((tmp_path / "calibre_books.json").read_text()) == [
+        {
+            "title": "Solaris",
+            "authors": "Stanisław Lem",
+            "*shelf": "paper",
+            "*pages": 204,
+        }
+    ]
+
+
+# --- covers ---
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / "media")
+    return tmp_path / "media"
+
+
+def test_calibre_import_copies_library_covers(tmp_path, media):
+    queued = BookFactory(
+        title="Solaris",
+        title_slug="solaris",
+        primary_author=AuthorFactory(name="Stanisław Lem", name_slug="stanislaw-lem"),
+        status=BookStatus.TO_READ,
+    )
+    _calibre_library(
+        tmp_path,
+        [
+            ("Solaris", ["Stanisław Lem"], QUEUED, 204, "paper"),
+            ("Roadside Picnic", ["Arkady Strugatsky"], QUEUED, 145, "paper"),
+            ("Coverless", ["Arkady Strugatsky"], QUEUED, 145, "paper"),
+        ],
+        covers={"Solaris": b"solaris", "Roadside Picnic": b"picnic"},
+    )
+
+    call_command(
+        "calibre_import", "--library", str(tmp_path), "--state", str(tmp_path / "s")
+    )
+
+    queued.refresh_from_db()
+    created = Book.all_objects.get(title="Roadside Picnic")
+    assert queued.cover.name == "stanislaw-lem/solaris/cover.jpg"
+    assert (media / queued.cover.name).read_bytes() == b"solaris"
+    assert created.cover.name == "arkady-strugatsky/roadside-picnic/cover.jpg"
+    assert created.cover_hash
+    assert not Book.all_objects.get(title="Coverless").cover
+    assert sorted(Job.objects.values_list("book__title", "kind")) == sorted(
+        (title, kind)
+        for title in ("Roadside Picnic", "Solaris")
+        for kind in ("update_colours", "update_derivatives", "update_thumbnail")
+    )
+
+
+def test_import_covers_skips_unchanged_files(tmp_path, media):
+    book = BookFactory(spine_color="#123456")
+    source = tmp_path / "cover.jpg"
+    source.write_bytes(b"first")
+
+    assert import_covers([(book, source)]) == [book]
+    Job.objects.all().delete()
+    book.spine_color = "#123456"
+    assert import_covers([(book, source)]) == []
+    assert import_covers([(book, tmp_path / "missing.jpg")]) == []
+
+    source.write_bytes(b"second, longer")
+    thumbnail = Thumbnail.objects.create(book=book, size="thumbnail")
+    thumbnail.thumb.save("thumbnail.jpg", ContentFile(b"thumb"))
+    thumbnail_path = Path(thumbnail.thumb.path)
+
+    assert import_covers([(book, source)]) == [book]
+    book.refresh_from_db()
+    assert (media / book.cover.name).read_bytes() == b"second, longer"
+    assert book.spine_color is None
+    assert not book.thumbnails.exists()
+    assert not thumbnail_path.exists()
+    assert Job.objects.count() == 3
+
+
+def test_import_covers_replaces_differently_named_cover(tmp_path, media):
+    book = BookFactory()
+    old = media / book.slug / "cover.png"
+    old.parent.mkdir(parents=True)
+    old.write_bytes(b"old")
+    book.cover.name = f"{book.slug}/cover.png"
+    source = tmp_path / "cover.jpg"
+    source.write_bytes(b"new")
+
+    import_covers([(book, source)])
+
+    assert not old.exists()
+    assert book.cover.name == f"{book.slug}/cover.jpg"
@@ -0,0 +1,83 @@
+import hashlib
+import os
+
+import pytest
+
+from scriptorium.main.cover_cache import CoverCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return CoverCache(root=tmp_path / "cache", max_bytes=100)
+
+
+def _age(cache, digest, seconds):
+    entry = cache.path(digest, "x").parent
+    os.utime(entry, (entry.stat().st_atime, entry.stat().st_mtime - seconds))
+
+
+def test_cover_cache_digest_hashes_file_bytes(tmp_path):
+    path = tmp_path / "cover.jpg"
+    path.write_bytes(b"cover")
+
+    assert CoverCache.digest(path) == hashlib.sha256(b"cover").hexdigest()
+
+
+def test_cover_cache_get_misses_until_put(cache):
+    assert cache.get("ab" * 32, "thumbnail.jpg") is None
+
+    path = cache.put("ab" * 32, "thumbnail.jpg", b"bytes")
+
+    assert cache.get("ab" * 32, "thumbnail.jpg") == path
+    assert path.read_bytes() == b"bytes"
+    assert path.parent.parent.name == "ab"
+
+
+def test_cover_cache_get_or_render_renders_once(cache):
+    calls = []
+
+    def render():
+        calls.append(1)
+        return b"rendered"
+
+    assert cache.get_or_render("cd" * 32, "120w.webp", render) == b"rendered"
+    assert cache.get_or_render("cd" * 32, "120w.webp", render) == b"rendered"
+    assert calls == [1]
+
+
+def test_cover_cache_stores_palettes_like_a_dict(cache):
+    digest = "ef" * 32
+    assert digest not in cache
+    with pytest.raises(KeyError):
+        cache[digest]
+
+    cache[digest] = [[[1.0, 0.0, 0.0]], [[0.0, 0.0, 1.0]]]
+
+    assert digest in cache
+    assert cache[digest] == [[[1.0, 0.0, 0.0]], [[0.0, 0.0, 1.0]]]
+    assert cache.get(digest, cache.palette_name)
+
+
+def test_cover_cache_evict_drops_least_recently_used(cache):
+    for i, digest in enumerate(["aa" * 32, "bb" * 32, "cc" * 32]):
+        cache.put(digest, "thumbnail.jpg", b"x" * 40)
+        _age(cache, digest, 100 - i * 10)
+    # Reading the oldest entry makes it the most recently used.
+    cache.get("aa" * 32, "thumbnail.jpg")
+
+    assert cache.evict() == 1
+
+    assert cache.get("aa" * 32, "thumbnail.jpg")
+    assert cache.get("bb" * 32, "thumbnail.jpg") is None
+    assert cache.get("cc" * 32, "thumbnail.jpg")
+    assert cache.evict() == 0
+
+
+def test_cover_cache_defaults_to_settings(settings, tmp_path):
+    settings.COVER_CACHE_DIR = tmp_path / "elsewhere"
+    settings.COVER_CACHE_MAX_BYTES = 5
+
+    cache = CoverCache()
+
+    assert (cache.root, cache.max_bytes) == (tmp_path / "elsewhere", 5)
+    assert cache.evict() == 0
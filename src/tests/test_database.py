@@ -0,0 +1,24 @@
+import pytest
+from django.db import connection
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != "sqlite", reason="SQLite only"),
+]
+
+
+def _pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA {name}")
+        return cursor.fetchone()[0]
+
+
+def test_connections_use_the_sqlite_profile(settings):
+    # The test database lives in memory, which has no journal file to
+    # switch to WAL and nothing to map.
+    assert settings.SQLITE_PRAGMAS["journal_mode"] == "wal"
+    assert _pragma("synchronous") == 1  # NORMAL
+    assert _pragma("cache_size") == settings.SQLITE_PRAGMAS["cache_size"]
+    assert _pragma("temp_store") == 2  # MEMORY
+    assert _pragma("busy_timeout") == settings.SQLITE_BUSY_TIMEOUT * 1000
+    assert connection.transaction_mode == "IMMEDIATE"
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from django.core.management import call_command
+
+from scriptorium.main.metadata import MetadataError
+from tests.factories import BookFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def answers(monkeypatch):
+    """get_book_metadata results by goodreads id (exceptions are raised);
+    the ids that were looked up are collected under the None key."""
+    answers = {None: []}
+
+    def get_book_metadata(book):
+        answers[None].append(book.goodreads_id)
+        answer = answers[book.goodreads_id]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(
+        "scriptorium.main.management.commands.enrich_metadata.get_book_metadata",
+        get_book_metadata,
+    )
+    return answers
+
+
+def _run(tmp_path, *args):
+    call_command(
+        "enrich_metadata",
+        "--state",
+        str(tmp_path / "state.json"),
+        "--batch-size",
+        "2",
+        *args,
+        verbosity=0,
+    )
+
+
+def test_enrich_metadata_merges_lookups_into_incomplete_books(
+    answers, tmp_path, capsys
+):
+    thin = BookFactory(goodreads_id="1", pages=None, publication_year=None)
+    broken = BookFactory(goodreads_id="2", pages=None)
+    unknown = BookFactory(goodreads_id="3", pages=None)
+    complete = BookFactory(goodreads_id="4", isbn13="9780000000003")
+    complete.cover = "covers/4.jpg"
+    complete.save()
+    BookFactory(goodreads_id=None, pages=None)
+    answers.update(
+        {
+            "1": [{"pages": 300}, {"publication_year": 1974, "pages": 280}],
+            "2": MetadataError("down"),
+            "3": [],
+        }
+    )
+
+    _run(tmp_path)
+
+    thin.refresh_from_db()
+    assert (thin.pages, thin.publication_year) == (300, 1974)
+    assert sorted(answers[None]) == ["1", "2", "3"]
+    out = capsys.readouterr().out
+    assert f"{broken.pk} {broken.title}: down" in out
+    assert "Updated 1 of 3 books, 1 lookups failed" in out
+    # Failed lookups are retried on resume, the others are not.
+    assert json.loads((tmp_path / "state.json").read_text()) == [thin.pk, unknown.pk]
+
+    answers[None].clear()
+    answers["2"] = [{"pages": 120}]
+    _run(tmp_path, "--resume")
+
+    assert answers[None] == ["2"]
+    broken.refresh_from_db()
+    assert broken.pages == 120
+
+
+def test_enrich_metadata_dry_run_prints_changes(answers, tmp_path, capsys):
+    book = BookFactory(goodreads_id="1", pages=None, title="Solaris")
+    answers["1"] = [{"pages": 204, "isbn": "0000000001"}]
+
+    _run(tmp_path, "--dry-run")
+
+    book.refresh_from_db()
+    assert book.pages is None
+    assert not (tmp_path / "state.json").exists()
+    assert capsys.readouterr().out.splitlines() == [
+        f"{book.pk} Solaris: pages: None -> 204",
+        f"{book.pk} Solaris: isbn10: None -> '0000000001'",
+        "Would update 1 of 1 books, 0 lookups failed",
+    ]
@@ -2,6 +2,7 @@ import datetime as dt
 import io
 
 import pytest
+from django.core.files.base import ContentFile
 from PIL import Image
 
 from scriptorium.main.forms import (
@@ -15,7 +16,7 @@ from scriptorium.main.forms import (
     ReviewEditForm,
     ReviewWizardForm,
 )
-from scriptorium.main.models import Book, BookStatus, Read, Series
+from scriptorium.main.models import Book, BookStatus, Job, Read, Series
 from tests.factories import (
     AuthorFactory,
     BookFactory,
@@ -303,11 +304,14 @@ def _book_edit_post(book, tag, **overrides):
     return payload
 
 
-def test_book_edit_form_save_downloads_cover_when_source_changed(
+def test_book_edit_form_save_queues_cover_download_when_source_changed(
     settings, tmp_path, monkeypatch
 ):
+    """Saving the form only queues the download; the job fetches the cover
+    (replacing an existing one) outside the request."""
     settings.MEDIA_ROOT = str(tmp_path)
     book = BookFactory(cover_source=None)
+    book.cover.save("old.png", ContentFile(b"old cover"), save=True)
     tag = TagFactory()
     downloaded = _png_bytes()
 
@@ -324,7 +328,7 @@ def test_book_edit_form_save_downloads_cover_when_source_changed(
         calls.append(url)
         return _FakeResponse()
 
-    monkeypatch.setattr("scriptorium.main.models.requests.get", fake_get)
+    monkeypatch.setattr("scriptorium.main.metadata.session.get", fake_get)
 
     form = BookEditForm(
         data=_book_edit_post(book, tag, cover_source="https://example.com/new.jpg"),
@@ -333,10 +337,15 @@ def test_book_edit_form_save_downloads_cover_when_source_changed(
 
     assert form.is_valid(), form.errors
     saved = form.save()
+
+    assert calls == []
+    job = Job.objects.get()
+    assert (job.kind, job.book) == (Job.Kind.DOWNLOAD_COVER, saved)
+
+    job.run()
     saved.refresh_from_db()
 
     assert calls == ["https://example.com/new.jpg"]
-    assert saved.cover.name
     with saved.cover.open("rb") as fp:
         assert fp.read() == downloaded
     # download_cover clears cover_source after a successful download.
@@ -353,7 +362,7 @@ def test_book_edit_form_save_skips_download_when_cover_source_unchanged(
     def boom(url, timeout=5):  # noqa: ARG001
         raise AssertionError("download_cover should not run for unchanged cover_source")
 
-    monkeypatch.setattr("scriptorium.main.models.requests.get", boom)
+    monkeypatch.setattr("scriptorium.main.metadata.session.get", boom)
 
     form = BookEditForm(data=_book_edit_post(book, tag, title="Renamed"), instance=book)
 
@@ -363,6 +372,7 @@ def test_book_edit_form_save_skips_download_when_cover_source_unchanged(
 
     assert saved.title == "Renamed"
     assert not saved.cover
+    assert not Job.objects.exists()
 
 
 def test_book_edit_form_clean_new_tags_splits_input():
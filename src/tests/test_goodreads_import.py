@@ -0,0 +1,148 @@
+import csv
+import datetime as dt
+
+import pytest
+from django.core.management import call_command
+
+from scriptorium.main.models import Book, BookStatus, Read
+from tests.factories import AuthorFactory, BookFactory, ReadFactory
+
+pytestmark = pytest.mark.django_db
+
+COLUMNS = [
+    "Book Id",
+    "Title",
+    "Author",
+    "Author l-f",
+    "Additional Authors",
+    "ISBN",
+    "ISBN13",
+    "My Rating",
+    "Average Rating",
+    "Publisher",
+    "Binding",
+    "Number of Pages",
+    "Year Published",
+    "Original Publication Year",
+    "Date Read",
+    "Date Added",
+    "Bookshelves",
+    "Bookshelves with positions",
+    "Exclusive Shelf",
+    "My Review",
+    "Spoiler",
+    "Private Notes",
+    "Read Count",
+    "Owned Copies",
+]
+
+
+def _row(**values):
+    row = dict.fromkeys(COLUMNS, "")
+    row.update(
+        {"ISBN": '=""', "ISBN13": '=""', "My Rating": "0", "Exclusive Shelf": "read"}
+    )
+    row.update(values)
+    return row
+
+
+def _export(tmp_path, *rows):
+    path = tmp_path / "goodreads_library_export.csv"
+    with path.open("w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_goodreads_import_creates_books_reads_and_series(tmp_path, capsys):
+    path = _export(
+        tmp_path,
+        _row(
+            **{
+                "Book Id": "18423",
+                "Title": "The Left Hand of Darkness (Hainish Cycle, #4)",
+                "Author": "Ursula K. Le Guin",
+                "Additional Authors": "Harold Bloom, Ursula K. Le Guin",
+                "ISBN": '="0441478123"',
+                "ISBN13": '="9780441478125"',
+                "My Rating": "5",
+                "Number of Pages": "304",
+                "Year Published": "2000",
+                "Original Publication Year": "1969",
+                "Date Read": "2024/05/01",
+                "My Review": "Cold.<br/>Warm.",
+            }
+        ),
+        _row(
+            Title="Rocannon's World (Hainish Cycle #1)",
+            Author="Ursula K. Le Guin",
+            **{"Exclusive Shelf": "to-read", "Date Read": "2020/01/01"},
+        ),
+        _row(Title="Gave Up", Author="Someone", **{"Exclusive Shelf": "abandoned"}),
+        _row(Title="!!!", Author="Someone"),
+    )
+
+    call_command("goodreads_import", path)
+
+    book = Book.all_objects.get(goodreads_id="18423")
+    assert book.title == "The Left Hand of Darkness"
+    assert (book.series.name, book.series_position) == ("Hainish Cycle", "4")
+    assert book.status == BookStatus.TO_REVIEW
+    assert book.source == "goodreads"
+    assert (book.isbn10, book.isbn13) == ("0441478123", "9780441478125")
+    assert (book.pages, book.publication_year, book.rating) == (304, 1969, 5)
+    assert book.text == "Cold.\nWarm."
+    assert [a.name for a in book.additional_authors.all()] == ["Harold Bloom"]
+    assert book.shelf_layout
+    assert list(book.reads.values_list("finished_on", "source")) == [
+        (dt.date(2024, 5, 1), "goodreads")
+    ]
+    queued = Book.all_objects.get(title="Rocannon's World")
+    assert queued.status == BookStatus.TO_READ
+    assert queued.series == book.series
+    assert queued.primary_author == book.primary_author
+    assert not queued.reads.exists()
+    assert capsys.readouterr().out.strip() == "2 books created, 0 matched, 2 skipped"
+
+
+def test_goodreads_import_matches_existing_books(tmp_path, capsys):
+    author = AuthorFactory(name="Ursula K. Le Guin", name_slug="ursula-k-le-guin")
+    queued = BookFactory(
+        title="The Dispossessed",
+        title_slug="the-dispossessed",
+        primary_author=author,
+        status=BookStatus.TO_READ,
+    )
+    reviewed = BookFactory(goodreads_id="13651", reviewed=True)
+    ReadFactory(book=reviewed, finished_on=dt.date(2023, 3, 3))
+    path = _export(
+        tmp_path,
+        _row(
+            Title="The Dispossessed",
+            Author="Ursula Le Guin, K.",
+            **{"Date Read": "2024/06/01"},
+        ),
+        _row(
+            Title="The Dispossessed",
+            Author="Ursula K. Le Guin",
+            **{"Date Read": "2024/06/01"},
+        ),
+        _row(
+            Title="Renamed on Goodreads",
+            Author="Someone Else",
+            **{"Book Id": "13651", "Date Read": "2023/03/03"},
+        ),
+    )
+
+    call_command("goodreads_import", path, "--batch-size", "2")
+
+    queued.refresh_from_db()
+    assert queued.status == BookStatus.TO_REVIEW
+    assert list(queued.reads.values_list("finished_on", flat=True)) == [
+        dt.date(2024, 6, 1)
+    ]
+    assert reviewed.reads.count() == 1
+    # A differently spelled author is a different book.
+    assert Read.objects.count() == 3
+    assert capsys.readouterr().out.strip() == "1 books created, 2 matched, 0 skipped"
@@ -0,0 +1,153 @@
+import logging
+import threading
+from contextlib import closing
+
+import pytest
+
+from scriptorium.main.http_cache import HttpCache
+
+
+@pytest.fixture
+def cache(settings):
+    settings.HTTP_CACHE_TTLS = {"search": 100}
+    settings.HTTP_CACHE_NEGATIVE_TTL = 10
+    settings.HTTP_CACHE_STALE = 1000
+    return HttpCache()
+
+
+def _loader(*responses):
+    calls = []
+    responses = list(responses)
+
+    def load():
+        calls.append(1)
+        outcome = responses.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    load.calls = calls
+    return load
+
+
+def _age(cache, key, seconds):
+    with closing(cache.connect()) as connection:
+        connection.execute(
+            "UPDATE responses SET fetched = fetched - ? WHERE key = ?", (seconds, key)
+        )
+
+
+def _wait_for_revalidation():
+    for thread in threading.enumerate():
+        if thread.name == "http-cache-revalidate":
+            thread.join()
+
+
+def test_http_cache_loads_once_while_fresh(cache):
+    load = _loader((200, {"docs": []}))
+
+    assert cache.fetch("url", "search", load) == (200, {"docs": []})
+    assert cache.fetch("url", "search", load) == (200, {"docs": []})
+    assert len(load.calls) == 1
+
+
+def test_http_cache_is_shared_between_instances(cache):
+    cache.fetch("url", "search", _loader((200, "body")))
+
+    assert HttpCache().get("url")[:2] == (200, "body")
+
+
+def test_http_cache_does_not_store_failures(cache):
+    load = _loader(ValueError("boom"), (503, "busy"), (200, "ok"))
+
+    with pytest.raises(ValueError, match="boom"):
+        cache.fetch("url", "search", load)
+    assert cache.fetch("url", "search", load) == (503, "busy")
+    assert cache.get("url") is None
+    assert cache.fetch("url", "search", load) == (200, "ok")
+
+
+def test_http_cache_keeps_not_found_for_negative_ttl(cache, settings):
+    settings.HTTP_CACHE_STALE = 0
+    load = _loader((404, None), (200, "found"))
+    cache.fetch("url", "search", load)
+
+    assert cache.fetch("url", "search", load) == (404, None)
+    _age(cache, "url", 11)
+    assert cache.fetch("url", "search", load) == (200, "found")
+
+
+def test_http_cache_serves_stale_while_revalidating(cache):
+    load = _loader((200, "old"), (200, "new"))
+    cache.fetch("url", "search", load)
+    _age(cache, "url", 500)
+
+    assert cache.fetch("url", "search", load) == (200, "old")
+    _wait_for_revalidation()
+
+    assert cache.fetch("url", "search", load) == (200, "new")
+    assert len(load.calls) == 2
+
+
+def test_http_cache_keeps_stale_response_when_revalidation_fails(cache, caplog):
+    load = _loader((200, "old"), ValueError("boom"))
+    cache.fetch("url", "search", load)
+    _age(cache, "url", 500)
+
+    with caplog.at_level(logging.ERROR, logger="scriptorium.main.http_cache"):
+        cache.fetch("url", "search", load)
+        _wait_for_revalidation()
+
+    assert cache.get("url")[:2] == (200, "old")
+    assert "Revalidating url failed" in caplog.text
+
+
+def test_http_cache_revalidates_once_per_key(cache, monkeypatch):
+    started = []
+
+    def start(thread):
+        started.append(thread)
+
+    monkeypatch.setattr("scriptorium.main.http_cache._revalidating", {"url"})
+    monkeypatch.setattr(threading.Thread, "start", start)
+
+    cache.revalidate("url", _loader())
+    cache.revalidate("other", _loader())
+
+    assert len(started) == 1
+
+
+def test_http_cache_reloads_expired_responses_synchronously(cache):
+    load = _loader((200, "old"), (200, "new"))
+    cache.fetch("url", "search", load)
+    _age(cache, "url", 1200)
+
+    assert cache.fetch("url", "search", load) == (200, "new")
+
+
+def test_http_cache_evicts_least_recently_used(cache):
+    cache.max_bytes = 30
+    cache.set("a", 200, "x" * 10)
+    cache.set("b", 200, "x" * 10)
+    cache.get("a")
+
+    cache.set("c", 200, "x" * 10)
+
+    assert cache.get("a")
+    assert cache.get("b") is None
+    assert cache.get("c")
+
+
+def test_http_cache_drops_responses_larger_than_the_cache(cache):
+    cache.max_bytes = 5
+
+    cache.set("a", 200, "x" * 10)
+
+    assert cache.get("a") is None
+
+
+def test_http_cache_creates_schema_once_per_database(cache, monkeypatch):
+    cache.set("url", 200, "body")
+    monkeypatch.setattr(HttpCache, "create_schema", None)
+
+    assert HttpCache().get("url")[:2] == (200, "body")
@@ -0,0 +1,170 @@
+import datetime as dt
+import sqlite3
+from contextlib import closing
+
+import pytest
+from django.core.management import call_command
+
+from scriptorium.main.models import Book, BookStatus, Read
+from tests.factories import BookFactory, ReadFactory
+
+pytestmark = pytest.mark.django_db
+
+STATISTICS_SCHEMA = """
+CREATE TABLE book (
+    id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT, authors TEXT, notes INTEGER,
+    last_open INTEGER, highlights INTEGER, pages INTEGER, series TEXT,
+    language TEXT, md5 TEXT, total_read_time INTEGER, total_read_pages INTEGER
+);
+CREATE TABLE page_stat_data (
+    id_book INTEGER, page INTEGER NOT NULL DEFAULT 0,
+    start_time INTEGER NOT NULL DEFAULT 0, duration INTEGER NOT NULL DEFAULT 0,
+    total_pages INTEGER NOT NULL DEFAULT 0, UNIQUE (id_book, page, start_time)
+);
+"""
+
+JUNE_12 = int(dt.datetime(2026, 6, 12, 20, tzinfo=dt.UTC).timestamp())
+JULY_1 = int(dt.datetime(2026, 7, 1, 23, 59, tzinfo=dt.UTC).timestamp())
+
+
+def _statistics(tmp_path, books):
+    """A KOReader statistics database: ``books`` are (md5, title, authors,
+    series, last page reached, total pages) tuples, each read in 100-second
+    page turns from June 12 until its last page turn on July 1."""
+    path = tmp_path / "statistics.sqlite3"
+    with closing(sqlite3.connect(path)) as connection, connection:
+        connection.executescript(STATISTICS_SCHEMA)
+        for md5, title, authors, series, last_page, total in books:
+            book_id = connection.execute(
+                "INSERT INTO book (title, authors, series, language, md5, pages) "
+                "VALUES (?, ?, ?, 'en', ?, ?)",
+                (title, authors, series, md5, total),
+            ).lastrowid
+            turns = [(book_id, 1, JUNE_12, 100, total)]
+            turns += [
+                (book_id, page, JUNE_12 + page * 3600, 100, total)
+                for page in range(2, last_page)
+            ]
+            turns.append((book_id, last_page, JULY_1 - 100, 100, total))
+            connection.executemany(
+                "INSERT INTO page_stat_data VALUES (?, ?, ?, ?, ?)", turns
+            )
+    return path
+
+
+def _md5(char):
+    return char * 32
+
+
+def test_koreader_import_backfills_finished_books(tmp_path, capsys):
+    path = _statistics(
+        tmp_path,
+        [
+            (
+                _md5("a"),
+                "The Left Hand of Darkness",
+                "Ursula K. Le Guin",
+                "N/A",
+                96,
+                100,
+            ),
+            (_md5("b"), "Good Omens", "Terry Pratchett\nNeil Gaiman", "N/A", 50, 100),
+            ("short", "Broken Record", "N/A", "N/A", 10, 10),
+        ],
+    )
+
+    call_command("koreader_import", str(path))
+
+    book = Book.all_objects.get()
+    assert (book.title, book.primary_author.name) == (
+        "The Left Hand of Darkness",
+        "Ursula K. Le Guin",
+    )
+    assert book.status == BookStatus.TO_REVIEW
+    assert book.series is None
+    read = book.reads.get()
+    assert (read.started_on, read.finished_on) == (
+        dt.date(2026, 6, 12),
+        dt.date(2026, 7, 1),
+    )
+    assert read.total_time_seconds == 96 * 100
+    assert read.koreader_md5 == _md5("a")
+    assert capsys.readouterr().out.strip() == "1 created_book"
+
+    call_command("koreader_import", str(path), "--finished-at", "0.5")
+
+    assert Read.objects.count() == 2
+    assert capsys.readouterr().out.strip() == "1 created_book, 1 updated_read"
+
+
+def test_koreader_import_keeps_a_read_per_reread(tmp_path, capsys):
+    path = _statistics(
+        tmp_path, [(_md5("a"), "Solaris", "Stanisław Lem", "N/A", 10, 10)]
+    )
+    august = int(dt.datetime(2026, 8, 1, 20, tzinfo=dt.UTC).timestamp())
+    with closing(sqlite3.connect(path)) as connection, connection:
+        connection.executemany(
+            "INSERT INTO page_stat_data VALUES (1, ?, ?, ?, 10)",
+            [
+                # A look back after finishing belongs to the first read.
+                (5, JULY_1 - 50, 40),
+                # The reread: finished on August 2, then again the same day.
+                *((page, august + page * 3600, 100) for page in range(1, 11)),
+                *((page, august + 86400 + page * 60, 100) for page in range(1, 11)),
+            ],
+        )
+
+    call_command("koreader_import", str(path))
+
+    first, reread = Read.objects.order_by("finished_on")
+    assert (first.started_on, first.finished_on, first.total_time_seconds) == (
+        dt.date(2026, 6, 12),
+        dt.date(2026, 7, 1),
+        10 * 100 + 40,
+    )
+    assert (reread.started_on, reread.finished_on, reread.total_time_seconds) == (
+        dt.date(2026, 8, 1),
+        dt.date(2026, 8, 2),
+        20 * 100,
+    )
+    assert capsys.readouterr().out.strip() == "1 created_book, 1 matched"
+
+
+def test_koreader_import_matches_known_device_files(tmp_path, capsys):
+    known = BookFactory(title="Renamed On The Device")
+    ReadFactory(book=known, koreader_md5=_md5("c"), finished_on=dt.date(2025, 1, 1))
+    path = _statistics(
+        tmp_path, [(_md5("c"), "Something Else", "Someone", "Cycle", 10, 10)]
+    )
+
+    call_command("koreader_import", str(path))
+
+    assert known.reads.filter(finished_on=dt.date(2026, 7, 1)).exists()
+    assert capsys.readouterr().out.strip() == "1 matched"
+
+
+def test_koreader_import_leaves_out_failing_books(tmp_path, capsys):
+    path = _statistics(
+        tmp_path,
+        [
+            (_md5("d"), "", "Nobody", "N/A", 10, 10),
+            (_md5("e"), "!!!", "Nobody", "N/A", 10, 10),
+            (_md5("f"), "Solaris", "Stanisław Lem", "N/A", 10, 10),
+        ],
+    )
+
+    call_command("koreader_import", str(path), "--batch-size", "3")
+
+    assert list(Book.all_objects.values_list("title", flat=True)) == ["Solaris"]
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == f"{_md5('d')}: invalid title"
+    assert out[1] == f"{_md5('e')}: Cannot derive a catalogue slug from title '!!!'."
+    assert out[2] == "1 created_book, 2 error"
+
+
+def test_koreader_import_without_finished_books(tmp_path, capsys):
+    path = _statistics(tmp_path, [(_md5("g"), "Unfinished", "N/A", "N/A", 2, 100)])
+
+    call_command("koreader_import", str(path))
+
+    assert capsys.readouterr().out.strip() == "No finished books found"
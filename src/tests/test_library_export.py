@@ -0,0 +1,154 @@
+import datetime as dt
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from scriptorium.main.library_export import (
+    EXPORT_MODELS,
+    export_library,
+    import_library,
+)
+from scriptorium.main.models import Book, Poem
+from tests.factories import HighlightFactory, ReadFactory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def library(populated_library, quote, poem, page, tag):
+    book = Book.objects.first()
+    book.tags.add(tag)
+    HighlightFactory(book=book, text="Light is the left hand of darkness.")
+    ReadFactory(book=book)
+    return populated_library
+
+
+def _clear():
+    for model in reversed(EXPORT_MODELS):
+        model._base_manager.all().delete()
+
+
+def test_export_requires_token(client, api_token):
+    response = client.get("/api/export/")
+
+    assert response.status_code == 401
+
+
+def test_export_streams_ndjson(api_client, library):
+    response = api_client.get("/api/export/")
+
+    assert response.status_code == 200
+    assert response.streaming
+    assert response["Content-Type"] == "application/x-ndjson"
+    assert response["Content-Disposition"].startswith(
+        'attachment; filename="scriptorium-'
+    )
+    lines = b"".join(response.streaming_content).decode().splitlines()
+    assert lines == [line.rstrip("\n") for line in export_library()]
+    records = [json.loads(line) for line in lines]
+    labels = {record["model"] for record in records}
+    assert {"main.book", "main.read", "main.quote", "main.poem"} <= labels
+    book = next(record for record in records if record["model"] == "main.book")
+    assert book["fields"]["primary_author_id"]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_export_reads_from_one_transaction():
+    """Rows written while the export streams can't leave it with reads of
+    books it doesn't have. On SQLite, writers aren't locked out meanwhile."""
+    ReadFactory()
+    mode = getattr(connection, "transaction_mode", None)
+
+    with CaptureQueriesContext(connection) as queries:
+        lines = export_library()
+        next(lines)
+        assert connection.in_atomic_block
+        assert getattr(connection, "transaction_mode", None) == mode
+        list(lines)
+
+    assert not connection.in_atomic_block
+    assert queries[0]["sql"] == (
+        "BEGIN DEFERRED"
+        if connection.vendor == "sqlite"
+        else "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+    )
+
+
+def test_import_replays_export_idempotently(library):
+    exported = list(export_library())
+    books = Book.all_objects.count()
+    _clear()
+    assert not Book.all_objects.exists()
+
+    counts = import_library(exported, batch_size=2)
+
+    assert counts["main.book"] == books
+    assert list(export_library()) == exported
+    assert import_library(exported) == counts
+    assert list(export_library()) == exported
+
+
+def test_import_keeps_the_dates_things_were_added(library):
+    added = dt.date(2019, 3, 4)
+    Book.all_objects.update(date_added=added)
+    Poem.objects.update(date_added=added)
+    exported = list(export_library())
+    _clear()
+
+    import_library(exported)
+
+    assert set(Book.all_objects.values_list("date_added", flat=True)) == {added}
+    assert set(Poem.objects.values_list("date_added", flat=True)) == {added}
+    import_library(exported)
+    assert list(export_library()) == exported
+
+
+def test_import_updates_rows_in_place(library):
+    records = [json.loads(line) for line in export_library()]
+    book = next(record for record in records if record["model"] == "main.book")
+    book["fields"]["title"] = "Renamed"
+    books = Book.all_objects.count()
+
+    import_library(json.dumps(record) for record in records)
+
+    assert Book.all_objects.get(pk=book["pk"]).title == "Renamed"
+    assert Book.all_objects.count() == books
+
+
+def test_import_rejects_other_models(library):
+    line = json.dumps({"model": "main.apitoken", "pk": 1, "fields": {}})
+
+    with pytest.raises(ValueError, match=r"main\.apitoken records"):
+        import_library([line])
+
+
+def test_import_resets_sequences(library, monkeypatch):
+    monkeypatch.setattr(
+        connection.ops, "sequence_reset_sql", lambda style, models: ["SELECT 1"]
+    )
+
+    assert import_library([]) == {}
+
+
+def test_library_commands_round_trip(library, tmp_path, capsys, monkeypatch):
+    path = tmp_path / "library.ndjson"
+    call_command("library_export", str(path))
+    call_command("library_export")
+    exported = capsys.readouterr().out
+    assert path.read_text() == exported
+    books = Book.all_objects.count()
+    _clear()
+
+    call_command("library_import", str(path))
+
+    out = capsys.readouterr().out.splitlines()
+    assert f"main.book: {books}" in out
+    assert "".join(export_library()) == exported
+
+    monkeypatch.setattr("sys.stdin", io.StringIO(exported))
+    call_command("library_import", "-")
+    assert capsys.readouterr().out.splitlines() == out
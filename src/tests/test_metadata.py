@@ -7,12 +7,14 @@ from django.test import override_settings
 from scriptorium.main import metadata
 from scriptorium.main.metadata import (
     MetadataError,
+    get_book_metadata,
     get_goodreads_book,
     get_openlibrary_book,
     get_openlibrary_book_data,
     get_openlibrary_editions,
     get_openlibrary_editions_data,
     merge_goodreads,
+    metadata_changes,
     search_book,
     time_taken,
 )
@@ -26,10 +28,13 @@ class FakeResponse:
     is returned from .json(); set `raise_on_json` to make .json() raise
     instead (the ValueError path in search_book)."""
 
-    def __init__(self, *, json_data=None, text="", ok=True, raise_on_json=None):
+    def __init__(
+        self, *, json_data=None, text="", ok=True, raise_on_json=None, status_code=None
+    ):
         self._json = json_data
         self.text = text
         self.ok = ok
+        self.status_code = status_code or (200 if ok else 404)
         self._raise_on_json = raise_on_json
 
     def json(self):
@@ -39,7 +44,7 @@ class FakeResponse:
 
 
 def _install_fake_get(monkeypatch, responses):
-    """Replace metadata.requests.get with a URL-substring router.
+    """Replace metadata.session.get with a URL-substring router.
 
     `responses` is a list of (needle, outcome) tuples. The first needle
     found in the URL wins; an Exception outcome is raised instead of
@@ -53,7 +58,7 @@ def _install_fake_get(monkeypatch, responses):
                 return outcome
         raise AssertionError(f"unexpected URL in test: {url}")
 
-    monkeypatch.setattr(metadata.requests, "get", fake_get)
+    monkeypatch.setattr(metadata.session, "get", fake_get)
 
 
 # ---------- time_taken ----------
@@ -91,9 +96,6 @@ def test_time_taken_logs_duration_when_debug_on(caplog):
 
 # ---------- search_book ----------
 
-# Each search_book test uses a unique query because search_book is wrapped in
-# functools.cache and we cannot clear the cache from outside time_taken.
-
 
 def test_search_book_returns_title_and_author_tuples(monkeypatch):
     _install_fake_get(
@@ -147,7 +149,7 @@ def test_search_book_raises_when_response_is_not_json(monkeypatch):
 
 
 def test_search_book_does_not_memoize_failures(monkeypatch):
-    """A transient upstream error must not poison the functools.cache: the
+    """A transient upstream error must not poison the HTTP cache: the
     same query succeeds once OpenLibrary answers again."""
     _install_fake_get(monkeypatch, [("search.json", requests.ConnectionError("boom"))])
     with pytest.raises(MetadataError):
@@ -286,6 +288,113 @@ def test_get_openlibrary_editions_data_handles_free_text_pagination(monkeypatch)
     ]
 
 
+def test_get_openlibrary_editions_data_fetches_every_page(monkeypatch, settings):
+    settings.OPENLIBRARY_EDITION_PAGES = 3
+    requested = []
+
+    def fake_get(url, *args, **kwargs):
+        offset = int(url.rsplit("offset=", 1)[1])
+        requested.append(offset)
+        entry = {"key": f"/books/OL{offset}M", "title": f"Page {offset}"}
+        return FakeResponse(json_data={"size": 1000, "entries": [entry]})
+
+    monkeypatch.setattr(metadata.session, "get", fake_get)
+
+    editions = get_openlibrary_editions_data("OLPAGEDW")
+
+    assert sorted(requested) == [0, 100, 200]
+    assert {edition["id"] for edition in editions} == {"OL0M", "OL100M", "OL200M"}
+
+
+def test_get_openlibrary_editions_data_raises_when_a_page_fails(monkeypatch):
+    _install_fake_get(
+        monkeypatch,
+        [
+            ("offset=0", FakeResponse(json_data={"size": 150, "entries": []})),
+            ("offset=100", requests.ConnectionError("boom")),
+        ],
+    )
+
+    with pytest.raises(MetadataError):
+        get_openlibrary_editions_data("OLBROKENW")
+
+
+def test_openlibrary_requests_identify_and_are_rate_limited(monkeypatch, settings):
+    settings.OPENLIBRARY_RATE_LIMIT = 2
+    headers = []
+    sleeps = []
+    monkeypatch.setattr(metadata, "openlibrary_limiter", metadata.RateLimiter())
+    monkeypatch.setattr(metadata.time, "sleep", sleeps.append)
+
+    def fake_get(url, *args, **kwargs):
+        headers.append(kwargs["headers"]["User-Agent"])
+        return FakeResponse(json_data={"docs": []})
+
+    monkeypatch.setattr(metadata.session, "get", fake_get)
+
+    search_book("limited-one")
+    search_book("limited-two")
+    search_book("limited-one")
+
+    assert headers == [settings.OPENLIBRARY_USER_AGENT] * 2
+    assert len(sleeps) == 1
+    assert 0 < sleeps[0] <= 0.5
+
+
+# ---------- prefetch ----------
+
+
+def test_prefetch_does_nothing_when_disabled():
+    assert metadata.prefetch(pytest.fail, "never called") is None
+
+
+def test_prefetch_editions_warms_top_works(monkeypatch, settings):
+    settings.METADATA_PREFETCH = True
+    settings.METADATA_PREFETCH_WORKS = 2
+    requested = []
+
+    def fake_get(url, *args, **kwargs):
+        requested.append(url.split("/")[4])
+        return FakeResponse(json_data={"entries": []})
+
+    monkeypatch.setattr(metadata.session, "get", fake_get)
+
+    for future in metadata.prefetch_editions(["OLP1W", "OLP2W", "OLP3W"]):
+        future.result()
+    get_openlibrary_editions_data("OLP1W")
+
+    assert sorted(requested) == ["OLP1W", "OLP2W"]
+
+
+def test_prefetch_logs_failures(monkeypatch, settings, caplog):
+    settings.METADATA_PREFETCH = True
+    _install_fake_get(monkeypatch, [("editions.json", requests.Timeout("slow"))])
+
+    with caplog.at_level(logging.INFO, logger="scriptorium.main.metadata"):
+        metadata.prefetch(get_openlibrary_editions_data, "OLSLOWW").result()
+
+    assert "Prefetching get_openlibrary_editions_data('OLSLOWW',) failed" in (
+        caplog.text
+    )
+
+
+def test_get_cover_image_caches_image_bytes(monkeypatch):
+    calls = []
+
+    def fake_get(url, *args, **kwargs):
+        calls.append(url)
+        response = FakeResponse()
+        response.content = b"\xff\xd8 jpeg"
+        response.raise_for_status = lambda: None
+        return response
+
+    monkeypatch.setattr(metadata.session, "get", fake_get)
+
+    assert metadata.get_cover_image("https://covers/1-L.jpg") == b"\xff\xd8 jpeg"
+    assert metadata.get_cover_image("https://covers/1-L.jpg") == b"\xff\xd8 jpeg"
+    assert len(calls) == 1
+
+
 # ---------- get_openlibrary_book ----------
 
 
@@ -296,7 +405,7 @@ def test_get_openlibrary_book_queries_by_isbn(monkeypatch):
         captured.append(url)
         return FakeResponse(json_data={"ISBN:9780000000001": {"title": "Isbn Book"}})
 
-    monkeypatch.setattr(metadata.requests, "get", fake_get)
+    monkeypatch.setattr(metadata.session, "get", fake_get)
 
     result = get_openlibrary_book(isbn="9780000000001")
 
@@ -310,9 +419,9 @@ def test_get_openlibrary_book_without_identifiers_raises(monkeypatch):
     current behaviour so the branch is exercised."""
 
     def boom(*args, **kwargs):
-        raise AssertionError("requests.get must not be reached")
+        raise AssertionError("session.get must not be reached")
 
-    monkeypatch.setattr(metadata.requests, "get", boom)
+    monkeypatch.setattr(metadata.session, "get", boom)
 
     with pytest.raises(NameError):
         get_openlibrary_book()
@@ -325,7 +434,7 @@ def test_get_openlibrary_book_queries_by_olid(monkeypatch):
         captured.append(url)
         return FakeResponse(json_data={"OLID:OL42M": {"title": "Olid Book"}})
 
-    monkeypatch.setattr(metadata.requests, "get", fake_get)
+    monkeypatch.setattr(metadata.session, "get", fake_get)
 
     result = get_openlibrary_book(olid="OL42M")
 
@@ -419,6 +528,26 @@ def test_get_goodreads_book_returns_empty_when_response_not_ok(monkeypatch):
     assert get_goodreads_book("gr-unique-not-ok") == {}
 
 
+def test_get_goodreads_book_caches_not_found(monkeypatch):
+    _install_fake_get(monkeypatch, [("goodreads.com", FakeResponse(ok=False))])
+    get_goodreads_book("gr-missing")
+    _install_fake_get(monkeypatch, [])
+
+    assert get_goodreads_book("gr-missing") == {}
+
+
+def test_get_goodreads_book_does_not_cache_server_errors(monkeypatch):
+    _install_fake_get(
+        monkeypatch, [("goodreads.com", FakeResponse(ok=False, status_code=503))]
+    )
+    assert get_goodreads_book("gr-busy") == {}
+    _install_fake_get(
+        monkeypatch, [("goodreads.com", FakeResponse(text=GOODREADS_HAPPY_HTML))]
+    )
+
+    assert get_goodreads_book("gr-busy")["title"] == "Sample Book"
+
+
 def test_get_goodreads_book_returns_empty_when_ld_json_missing(monkeypatch):
     _install_fake_get(
         monkeypatch,
@@ -497,6 +626,7 @@ def test_merge_goodreads_fills_missing_fields_from_full_payload(monkeypatch):
     assert book.cover_source == "https://example.com/cover.jpg"
     assert book.publication_year == 2005
     assert book.pages == 400
+    assert book.isbn13 == "9780000000003"
 
 
 @pytest.mark.django_db
@@ -530,3 +660,54 @@ def test_merge_goodreads_preserves_existing_better_fields_and_sets_isbn10(monkey
     assert book.isbn13 == "9780000000099"
     assert book.isbn10 == "0000000001"
     assert book.cover_source is None
+
+
+# ---------- bulk enrichment ----------
+
+
+@pytest.mark.django_db
+def test_metadata_changes_fills_ids_and_isbns_from_openlibrary_data():
+    book = BookFactory(pages=100, publication_year=None, isbn10="0000000001")
+
+    assert metadata_changes(
+        book,
+        {
+            "openlibrary_id": "OL1M",
+            "isbn13": "9780000000003",
+            "isbn10": "0000000002",
+            "goodreads_id": "123",
+            "pages": 50,
+            "publication_year": None,
+        },
+    ) == {"isbn13": "9780000000003", "openlibrary_id": "OL1M", "goodreads_id": "123"}
+
+
+@pytest.mark.django_db
+def test_get_book_metadata_asks_goodreads_with_openlibrary_ids(monkeypatch):
+    asked = []
+
+    def openlibrary(olid=None, isbn=None):
+        asked.append((olid, isbn))
+        return {"goodreads_id": "gr-1", "pages": 300}
+
+    monkeypatch.setattr(metadata, "get_openlibrary_book_data", openlibrary)
+    monkeypatch.setattr(metadata, "get_goodreads_book", lambda gid: {"gid": gid})
+    book = BookFactory(isbn13="9780000000003")
+
+    assert get_book_metadata(book) == [
+        {"goodreads_id": "gr-1", "pages": 300},
+        {"gid": "gr-1"},
+    ]
+    assert asked == [(None, "9780000000003")]
+
+
+@pytest.mark.django_db
+def test_get_book_metadata_without_identifiers_or_matches(monkeypatch):
+    monkeypatch.setattr(metadata, "get_openlibrary_book_data", lambda **kw: None)
+    monkeypatch.setattr(metadata, "get_goodreads_book", lambda gid: {})
+
+    unknown = BookFactory(openlibrary_id="OL1M", goodreads_id="gr-1")
+    anonymous = BookFactory()
+
+    assert get_book_metadata(unknown) == []
+    assert get_book_metadata(anonymous) == []
@@ -1,4 +1,5 @@
 import datetime as dt
+import hashlib
 import io
 import re
 from pathlib import Path
@@ -6,14 +7,33 @@ from pathlib import Path
 import pytest
 import requests
 from django.core.files.base import ContentFile
-from django.db import models
+from django.core.management import call_command
+from django.db import connection, models
 from django.db.utils import IntegrityError
+from django.utils import timezone
 from PIL import Image
 
-from scriptorium.main.models import Author, Book, BookStatus, Spine, Tag, Thumbnail
+from scriptorium.main.cover_cache import CoverCache
+from scriptorium.main.models import (
+    Author,
+    Book,
+    BookStatus,
+    Highlight,
+    Job,
+    Read,
+    Spine,
+    Tag,
+    Thumbnail,
+    _tsvector_match,
+    book_search,
+    prefix_tsquery,
+)
+from scriptorium.main.sprites import tile_name
+from scriptorium.main.utils import get_cover_palettes
 from tests.factories import (
     AuthorFactory,
     BookFactory,
+    HighlightFactory,
     PoemFactory,
     QuoteFactory,
     ReadFactory,
@@ -339,6 +359,80 @@ def test_book_save_ignores_text_changes_on_unpublished_books():
     assert book.review_updated is None
 
 
+def test_book_changed_fields_tracks_edits_since_load():
+    BookFactory(dimensions={"height": 20})
+    book = Book.all_objects.get()
+
+    assert book.changed_fields == set()
+
+    book.title = "A New Title"
+    book.dimensions["height"] = 21
+
+    assert book.changed_fields == {"title", "dimensions"}
+
+
+def test_book_changed_fields_is_empty_after_save():
+    book = BookFactory()
+
+    book.pages = 123
+    book.save()
+
+    assert book.changed_fields == set()
+    assert book.loaded_value("pages") == 123
+
+
+def test_book_save_only_writes_changed_fields():
+    """Two in-memory copies editing different fields must not clobber each
+    other: a save only writes the fields that actually changed."""
+    book = BookFactory(pages=100, publication_year=1990)
+    first = Book.all_objects.get(pk=book.pk)
+    second = Book.all_objects.get(pk=book.pk)
+
+    first.pages = 200
+    first.save()
+    second.publication_year = 2001
+    second.save()
+
+    book.refresh_from_db()
+    assert book.pages == 200
+    assert book.publication_year == 2001
+
+
+def test_book_save_edit_of_published_review_skips_the_pre_save_select(
+    django_assert_num_queries,
+):
+    make_reviewed_book()
+    book = Book.all_objects.get()
+
+    book.text = "A rewritten review."
+    with django_assert_num_queries(1):
+        book.save()
+
+    book.refresh_from_db()
+    assert book.text == "A rewritten review."
+    assert book.review_updated == dt.datetime.now(tz=dt.UTC).date()
+
+
+def test_book_save_without_changes_writes_nothing(django_assert_num_queries):
+    BookFactory()
+    book = Book.all_objects.get()
+
+    with django_assert_num_queries(0):
+        book.save()
+
+
+def test_book_save_does_not_overwrite_queryset_updates_with_stale_values():
+    book = make_reviewed_book()
+    Book.all_objects.filter(pk=book.pk).update(feed_date=dt.date(2024, 1, 1))
+
+    book.tldr = "edited"
+    book.save()
+
+    book.refresh_from_db()
+    assert book.feed_date == dt.date(2024, 1, 1)
+    assert book.tldr == "edited"
+
+
 # --- Review queue (needs_review) ----------------------------------------------
 
 
@@ -506,6 +600,69 @@ def test_read_save_updating_existing_read_does_not_bump():
     assert book.reads.get().notes == "reread for book club"
 
 
+def test_read_bulk_ingest_applies_reread_semantics_per_book():
+    reread = make_reviewed_book(latest_date=dt.date(2020, 1, 1))
+    backfilled = make_reviewed_book(latest_date=dt.date(2024, 1, 1))
+    unpublished = BookFactory(status=BookStatus.TO_REVIEW)
+    Book.all_objects.filter(pk__in=[reread.pk, backfilled.pk]).update(
+        feed_date=dt.date(2020, 1, 1)
+    )
+
+    created = Read.objects.bulk_ingest(
+        [
+            Read(book=reread, finished_on=dt.date(2019, 3, 1)),
+            Read(book=reread, finished_on=dt.date(2024, 6, 1)),
+            Read(book=backfilled, finished_on=dt.date(2023, 5, 5)),
+            Read(book=unpublished, finished_on=dt.date(2024, 6, 1)),
+        ]
+    )
+
+    today = dt.datetime.now(tz=dt.UTC).date()
+    assert len(created) == 4
+    assert all(read.pk for read in created)
+    assert Book.all_objects.get(pk=reread.pk).feed_date == today
+    assert Book.all_objects.get(pk=backfilled.pk).feed_date == dt.date(2020, 1, 1)
+    assert Book.all_objects.get(pk=unpublished.pk).feed_date is None
+    # The in-memory books see the new reads and feed date.
+    assert reread.feed_date == today
+    assert reread.latest_date == dt.date(2024, 6, 1)
+    assert backfilled.dates_read_list == [dt.date(2023, 5, 5), dt.date(2024, 1, 1)]
+    assert unpublished.feed_date is None
+
+
+def test_read_bulk_ingest_same_day_read_is_not_a_reread():
+    book = make_reviewed_book(latest_date=dt.date(2024, 1, 1))
+    Book.all_objects.filter(pk=book.pk).update(feed_date=dt.date(2024, 1, 1))
+
+    Read.objects.bulk_ingest([Read(book_id=book.pk, finished_on=dt.date(2024, 1, 1))])
+
+    book.refresh_from_db()
+    assert book.feed_date == dt.date(2024, 1, 1)
+    assert book.reads.count() == 2
+
+
+def test_read_bulk_ingest_without_reads_is_a_noop(django_assert_num_queries):
+    with django_assert_num_queries(0):
+        assert Read.objects.bulk_ingest([]) == []
+
+
+@pytest.mark.parametrize("item_count", [1, 3])
+def test_read_bulk_ingest_query_count_is_constant(
+    django_assert_num_queries, item_count
+):
+    books = [make_reviewed_book(reads=[]) for _ in range(item_count)]
+    reads = [
+        Read(book=book, finished_on=dt.date(2024, month, 1))
+        for book in books
+        for month in range(1, 4)
+    ]
+
+    with django_assert_num_queries(3):
+        Read.objects.bulk_ingest(reads)
+
+    assert Read.objects.count() == 3 * item_count
+
+
 def test_book_word_count_counts_whitespace_separated_tokens():
     book = make_reviewed_book(text="one two three four five")
 
@@ -565,6 +722,134 @@ def test_book_read_in_year_matches_once_and_aggregates_cleanly():
     assert books.aggregate(pages_sum=models.Sum("pages"))["pages_sum"] == 100
 
 
+# --- Highlight --------------------------------------------------------------
+
+
+def test_highlight_hash_ignores_whitespace_and_annotations():
+    """Re-flowed text is the same highlight; notes, colours and stamps are
+    not part of the identity, the position is."""
+    content_hash = Highlight.hash_content("Light is  the\nleft hand.", "Ch. 16", 233)
+
+    assert content_hash == Highlight.hash_content(
+        " Light is the left hand. ", "Ch. 16", 233
+    )
+    assert content_hash != Highlight.hash_content(
+        "Light is the left hand.", "Ch. 16", 234
+    )
+    assert content_hash != Highlight.hash_content("Light is the left hand.", None, 233)
+    assert len(content_hash) == 64
+
+
+def test_read_highlights_returns_payload_shape_or_none():
+    read = ReadFactory()
+    assert read.highlights is None
+
+    HighlightFactory(read=read, text="First.", chapter="One", pageno=3, color="yellow")
+    HighlightFactory(read=read, text="Second.", note="hm")
+
+    assert Read.objects.get(pk=read.pk).highlights == [
+        {
+            "text": "First.",
+            "note": None,
+            "chapter": "One",
+            "datetime": None,
+            "pageno": 3,
+            "color": "yellow",
+            "drawer": None,
+        },
+        {
+            "text": "Second.",
+            "note": "hm",
+            "chapter": None,
+            "datetime": None,
+            "pageno": None,
+            "color": None,
+            "drawer": None,
+        },
+    ]
+
+
+def test_highlight_is_unique_per_book():
+    highlight = HighlightFactory()
+
+    with pytest.raises(IntegrityError):
+        HighlightFactory(read=ReadFactory(book=highlight.book), text=highlight.text)
+
+
+def test_highlight_search_matches_all_words_as_prefixes():
+    match = HighlightFactory(text="Light is the left hand of darkness")
+    HighlightFactory(text="Darkness falls")
+    in_note = HighlightFactory(text="Unrelated", note="the left-handed light")
+
+    results = Highlight.objects.search("lig LEFT")
+
+    assert set(results) == {match, in_note}
+
+
+def test_highlight_search_finds_chapters_and_ignores_accents():
+    match = HighlightFactory(text="Anything", chapter="Épilogue")
+
+    assert list(Highlight.objects.search("epilog")) == [match]
+
+
+@pytest.mark.parametrize(
+    ("query", "found"), [("", False), ("   ", False), ('"', False), ("NOT OR *", True)]
+)
+def test_highlight_search_treats_queries_as_plain_words(query, found):
+    """Search input is never parsed as FTS5 query syntax, so operators and
+    stray quotes neither error out nor change the meaning."""
+    highlight = HighlightFactory(text="NOT OR AND")
+
+    assert list(Highlight.objects.search(query)) == ([highlight] if found else [])
+
+
+def test_highlight_search_index_follows_updates_and_deletes():
+    highlight = HighlightFactory(text="Old words")
+
+    highlight.text = "New words"
+    highlight.save()
+
+    assert list(Highlight.objects.search("new")) == [highlight]
+    assert not Highlight.objects.search("old").exists()
+    highlight.delete()
+    assert not Highlight.objects.search("new").exists()
+
+
+def test_book_search_matches_titles_people_series_and_isbns():
+    author = AuthorFactory(name="Ursula K. Le Guin", name_slug="ursula-k-le-guin")
+    series = SeriesFactory(name="Hainish Cycle", name_slug="hainish-cycle")
+    by_title = BookFactory(title="The Dispossessed")
+    by_author = BookFactory(title="Lavinia", primary_author=author)
+    by_series = BookFactory(title="Planet of Exile", series=series)
+    by_isbn = BookFactory(title="Solaris", isbn13="9780156027601")
+    by_text = BookFactory(title="Other", text="An ambiguous utopia.")
+
+    def search(query, fulltext=False):
+        return set(Book.all_objects.filter(book_search(query, fulltext)))
+
+    assert search("dispos") == {by_title}
+    assert search("Guin") == {by_author}
+    assert search("hainish") == {by_series}
+    assert search("9780156027601") == {by_isbn}
+    assert search("utopia") == set()
+    assert search("utopia", fulltext=True) == {by_text}
+
+
+def test_prefix_tsquery_quotes_every_term():
+    assert prefix_tsquery(["le", "guin's", "a\\b"]) == (
+        "'le':* & 'guin''s':* & 'a\\\\b':*"
+    )
+
+
+def test_tsvector_match_passes_the_query_as_parameter():
+    sql, params = _tsvector_match("main_author", "name", ["ursula"]).as_sql(
+        None, connection
+    )
+
+    assert "to_tsvector('scriptorium', name)" in sql
+    assert params == ["'ursula':*"]
+
+
 # --- Quote ------------------------------------------------------------------
 
 
@@ -676,21 +961,45 @@ class _FakeResponse:
             raise requests.HTTPError(f"status {self.status_code}")
 
 
-def test_book_save_downloads_cover_when_source_set(settings, tmp_path, monkeypatch):
+def test_book_save_queues_cover_download_when_source_set(
+    settings, tmp_path, monkeypatch
+):
+    """Saving never blocks on the network: the download is a job, which
+    then queues the thumbnail and colours for the new cover."""
     settings.MEDIA_ROOT = str(tmp_path)
     content = _png_bytes()
-    monkeypatch.setattr(
-        "scriptorium.main.models.requests.get",
-        lambda url, timeout=5: _FakeResponse(content),  # noqa: ARG005
-    )
+    calls = []
+
+    def fake_get(url, timeout=5):  # noqa: ARG001
+        calls.append(url)
+        return _FakeResponse(content)
+
+    monkeypatch.setattr("scriptorium.main.metadata.session.get", fake_get)
 
     book = BookFactory(cover_source="https://example.com/cover.jpg")
+    book.save()
+
+    assert calls == []
+    job = Job.objects.get()
+    assert (job.kind, job.book, job.status) == (
+        Job.Kind.DOWNLOAD_COVER,
+        book,
+        Job.Status.PENDING,
+    )
+
+    assert job.run() is True
     book.refresh_from_db()
 
+    assert calls == ["https://example.com/cover.jpg"]
     assert book.cover_source is None
-    assert book.cover.name
     with book.cover.open("rb") as fp:
         assert fp.read() == content
+    assert job.status == Job.Status.DONE
+    assert set(Job.objects.due().values_list("kind", flat=True)) == {
+        Job.Kind.UPDATE_THUMBNAIL,
+        Job.Kind.UPDATE_DERIVATIVES,
+        Job.Kind.UPDATE_COLOURS,
+    }
 
 
 def test_book_download_cover_noop_when_source_missing(settings, tmp_path):
@@ -702,21 +1011,76 @@ def test_book_download_cover_noop_when_source_missing(settings, tmp_path):
     assert not book.cover
 
 
-def test_book_download_cover_swallows_request_errors(settings, tmp_path, monkeypatch):
+@pytest.mark.parametrize(
+    "response", [requests.ConnectionError("nope"), _FakeResponse(status_code=404)]
+)
+def test_book_download_cover_raises_request_errors(
+    settings, tmp_path, monkeypatch, response
+):
+    """Errors propagate so the job queue can retry the download."""
     settings.MEDIA_ROOT = str(tmp_path)
 
-    def boom(url, timeout=5):  # noqa: ARG001
-        raise requests.ConnectionError("nope")
-
-    monkeypatch.setattr("scriptorium.main.models.requests.get", boom)
+    def fake_get(url, timeout=5):  # noqa: ARG001
+        if isinstance(response, Exception):
+            raise response
+        return response
 
+    monkeypatch.setattr("scriptorium.main.metadata.session.get", fake_get)
     book = BookFactory(cover_source="https://example.com/cover.jpg")
-    book.refresh_from_db()
 
+    with pytest.raises(requests.RequestException):
+        book.download_cover()
+
+    book.refresh_from_db()
     assert not book.cover
     assert book.cover_source == "https://example.com/cover.jpg"
 
 
+def test_book_save_hashes_new_cover(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    book = BookFactory()
+    assert (book.cover_hash, book.cover_url()) == (None, f"/{book.slug}/cover.jpg")
+
+    book.cover.save("cover.png", ContentFile(b"first"), save=True)
+    first = book.cover_hash
+    book.cover.delete()
+    book.cover.save("cover.png", ContentFile(b"second"), save=True)
+    book.refresh_from_db()
+
+    assert first == hashlib.sha256(b"first").hexdigest()
+    assert book.cover_hash == hashlib.sha256(b"second").hexdigest()
+    assert book.cover_url("thumbnail.jpg") == (
+        f"/{book.slug}/thumbnail.jpg?v={book.cover_hash[:16]}"
+    )
+
+    book.cover.delete()
+    book.refresh_from_db()
+    assert book.cover_hash is None
+
+
+def test_book_download_cover_keeps_derivatives_of_identical_cover(
+    settings, tmp_path, monkeypatch
+):
+    settings.MEDIA_ROOT = str(tmp_path)
+    content = _png_bytes()
+    monkeypatch.setattr(
+        "scriptorium.main.metadata.session.get",
+        lambda url, timeout=5: _FakeResponse(content),  # noqa: ARG005
+    )
+    book = BookFactory(spine_color="#123456", ui_color="#654321")
+    book.cover.save("cover.png", ContentFile(content), save=True)
+    book.update_thumbnail()
+    book.cover_source = "https://example.com/cover.png"
+
+    book.download_cover()
+    book.refresh_from_db()
+
+    assert book.cover_source is None
+    assert (book.spine_color, book.ui_color) == ("#123456", "#654321")
+    assert book.thumbnails.count() == 1
+    assert not Job.objects.exists()
+
+
 def test_book_download_cover_replaces_existing_cover(settings, tmp_path, monkeypatch):
     settings.MEDIA_ROOT = str(tmp_path)
     replacement = _png_bytes(color=(250, 250, 250))
@@ -725,7 +1089,7 @@ def test_book_download_cover_replaces_existing_cover(settings, tmp_path, monkeyp
     old_path = book.cover.path
 
     monkeypatch.setattr(
-        "scriptorium.main.models.requests.get",
+        "scriptorium.main.metadata.session.get",
         lambda url, timeout=5: _FakeResponse(replacement),  # noqa: ARG005
     )
     book.cover_source = "https://example.com/new.jpg"
@@ -784,7 +1148,7 @@ def test_book_update_thumbnail_keeps_small_cover_unresized(settings, tmp_path):
         assert im.size == (100, 100)
 
 
-def test_book_update_thumbnail_invalidates_cached_thumbnail(settings, tmp_path):
+def test_book_update_thumbnail_replaces_cached_thumbnail(settings, tmp_path):
     settings.MEDIA_ROOT = str(tmp_path)
     book = BookFactory()
     book.cover.save("cover.png", ContentFile(_png_bytes((300, 400))), save=True)
@@ -794,7 +1158,129 @@ def test_book_update_thumbnail_invalidates_cached_thumbnail(settings, tmp_path):
 
     book.update_thumbnail()
 
-    assert Thumbnail.objects.filter(book=book, size="thumbnail").count() == 2
+    thumbnail = Thumbnail.objects.get(book=book, size="thumbnail")
+    assert book.cover_thumbnail == thumbnail
+    assert thumbnail.thumb
+
+
+def test_book_update_derivatives_noop_without_cover():
+    book = BookFactory()
+
+    book.update_derivatives()
+
+    assert not book.thumbnails.exists()
+
+
+def test_book_update_derivatives_renders_every_width_and_format(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.COVER_WIDTHS = (120, 240)
+    settings.COVER_FORMATS = ("webp",)
+    book = BookFactory()
+    book.cover.save("cover.png", ContentFile(_png_bytes((300, 450))), save=True)
+
+    book.update_derivatives()
+
+    derivatives = {
+        (t.size, t.format): Image.open(t.thumb.path) for t in book.thumbnails.all()
+    }
+    assert sorted(derivatives) == [
+        ("120w", "jpg"),
+        ("120w", "webp"),
+        ("240w", "jpg"),
+        ("240w", "webp"),
+    ]
+    assert derivatives["120w", "webp"].format == "WEBP"
+    assert derivatives["240w", "jpg"].format == "JPEG"
+    assert derivatives["240w", "jpg"].size == (240, 360)
+    tile = CoverCache().get(book.cover_hash, tile_name())
+    assert Image.open(tile).size == (173, 260)
+
+
+def test_book_update_derivatives_does_not_upscale(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.COVER_WIDTHS = (360,)
+    settings.COVER_FORMATS = ()
+    book = BookFactory()
+    book.cover.save("cover.png", ContentFile(_png_bytes((200, 300))), save=True)
+
+    book.update_derivatives()
+
+    derivative = book.thumbnails.get()
+    assert (derivative.size, derivative.format) == ("360w", "jpg")
+    assert Image.open(derivative.thumb.path).size == (200, 300)
+
+
+def test_book_update_derivatives_replaces_derivatives_only(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.COVER_WIDTHS = (120,)
+    settings.COVER_FORMATS = ()
+    book = BookFactory()
+    book.cover.save("cover.png", ContentFile(_png_bytes((300, 400))), save=True)
+    book.update_thumbnail()
+    book.update_derivatives()
+
+    book.update_derivatives()
+
+    assert sorted(book.thumbnails.values_list("size", flat=True)) == [
+        "120w",
+        "thumbnail",
+    ]
+
+
+def test_book_cover_sources_skip_formats_pillow_cannot_encode(settings, monkeypatch):
+    settings.COVER_WIDTHS = (120, 240)
+    settings.COVER_FORMATS = ("avif", "webp")
+    monkeypatch.setattr(
+        "scriptorium.main.models.features.check", lambda fmt: fmt == "webp"
+    )
+    book = BookFactory()
+
+    assert book.cover_sources() == [
+        (
+            "image/webp",
+            f"/{book.slug}/cover-120.webp 120w, /{book.slug}/cover-240.webp 240w",
+        )
+    ]
+    assert book.cover_srcset() == (
+        f"/{book.slug}/cover-120.jpg 120w, /{book.slug}/cover-240.jpg 240w"
+    )
+
+
+def test_book_derivatives_are_looked_up_for_shared_covers(
+    settings, tmp_path, monkeypatch
+):
+    """A second book with the same cover bytes (a reissue, say) gets its
+    thumbnails and colours from the cover cache without decoding."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.COVER_WIDTHS = (120,)
+    content = _png_bytes((300, 400), color=(220, 30, 30))
+    original, reissue = BookFactory(), BookFactory()
+    original.cover.save("cover.png", ContentFile(content), save=True)
+    reissue.cover.save("cover.png", ContentFile(content), save=True)
+    original.update_thumbnail()
+    original.update_derivatives()
+    original.update_colours()
+
+    def no_decoding(*args, **kwargs):
+        raise AssertionError("cover decoded despite a cache hit")
+
+    monkeypatch.setattr("scriptorium.main.models.Image.open", no_decoding)
+    monkeypatch.setattr("scriptorium.main.models.get_cover_palettes", no_decoding)
+    reissue.update_thumbnail()
+    reissue.update_derivatives()
+    reissue.update_colours()
+
+    assert (reissue.spine_color, reissue.ui_color) == (
+        original.spine_color,
+        original.ui_color,
+    )
+    assert sorted(
+        (t.size, t.format, Path(t.thumb.path).read_bytes())
+        for t in reissue.thumbnails.all()
+    ) == sorted(
+        (t.size, t.format, Path(t.thumb.path).read_bytes())
+        for t in original.thumbnails.all()
+    )
 
 
 def test_book_update_spine_color_noop_without_cover():
@@ -851,6 +1337,59 @@ def test_spine_get_margin_symmetric_in_tilt_direction():
     assert spine.get_margin(30) > 0
 
 
+def test_spine_layout_is_seeded_by_book_id():
+    spines = [Spine(Book(pk=pk, pages=None)) for pk in range(300)]
+
+    assert [s.layout for s in spines] == [
+        Spine(Book(pk=pk, pages=None)).layout for pk in range(300)
+    ]
+    assert len({s.height for s in spines}) > 1
+    tilts = {s.tilt for s in spines}
+    assert 0 in tilts
+    assert all(5 <= abs(tilt) <= 14 for tilt in tilts - {0})
+    assert {s.style for s in spines} == {None, *Spine.STYLES}
+    tilted = next(s for s in spines if s.tilt)
+    assert tilted.margin == round(tilted.get_margin(tilted.tilt), 2)
+
+
+def test_book_stores_shelf_layout_on_creation():
+    book = make_reviewed_book(pages=200, dimensions=None)
+
+    book.refresh_from_db()
+
+    assert book.shelf_layout == Spine(book).layout
+
+
+def test_book_spine_uses_stored_shelf_layout():
+    book = make_reviewed_book()
+    book.shelf_layout = [20, 60, -7, 3.5, "grid"]
+
+    spine = book.spine
+
+    assert (spine.width, spine.height, spine.tilt, spine.margin, spine.style) == (
+        20,
+        60,
+        -7,
+        3.5,
+        "grid",
+    )
+
+
+def test_book_recomputes_shelf_layout_when_pages_change(django_assert_num_queries):
+    book = make_reviewed_book(pages=100, dimensions=None)
+    thin = book.spine
+
+    book.tldr = "Shorter."
+    with django_assert_num_queries(1):
+        book.save()
+    book.pages = 1000
+    book.save()
+
+    assert book.spine.width > thin.width
+    book.refresh_from_db()
+    assert book.shelf_layout == book.spine.layout
+
+
 def test_thumbnail_delete_removes_file_and_row(settings, tmp_path):
     settings.MEDIA_ROOT = str(tmp_path)
     book = BookFactory()
@@ -863,3 +1402,216 @@ def test_thumbnail_delete_removes_file_and_row(settings, tmp_path):
 
     assert not Thumbnail.objects.filter(pk=thumb.pk).exists()
     assert not Path(file_path).exists()
+
+
+def test_book_update_colours_saves_spine_and_ui_color(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    book = BookFactory(spine_color=None, ui_color=None)
+    book.cover.save(
+        "cover.png", ContentFile(_png_bytes((100, 100), color=(220, 30, 30))), save=True
+    )
+
+    book.update_colours()
+    book.refresh_from_db()
+
+    assert re.fullmatch(r"#[0-9a-f]{6}", book.spine_color)
+    assert re.fullmatch(r"#[0-9a-f]{6}", book.ui_color)
+
+
+def test_book_update_colours_noop_without_cover():
+    book = BookFactory(spine_color="#123456", ui_color=None)
+
+    book.update_colours()
+    book.refresh_from_db()
+
+    assert (book.spine_color, book.ui_color) == ("#123456", None)
+
+
+def test_runperiodic_command_recolours_missing_and_caches_palettes(
+    settings, tmp_path, monkeypatch, capsys
+):
+    settings.MEDIA_ROOT = str(tmp_path)
+    missing = BookFactory(spine_color=None, ui_color=None)
+    missing.cover.save(
+        "cover.png", ContentFile(_png_bytes((100, 100), color=(220, 30, 30))), save=True
+    )
+    coloured = BookFactory(spine_color="#000000", ui_color="#000000")
+    coloured.cover.save("cover.png", ContentFile(_png_bytes((100, 100))), save=True)
+    broken = BookFactory(spine_color=None)
+    broken.cover.save("cover.png", ContentFile(b"not an image"), save=True)
+
+    call_command("runperiodic", "--workers", "1")
+
+    missing.refresh_from_db()
+    coloured.refresh_from_db()
+    assert re.fullmatch(r"#[0-9a-f]{6}", missing.spine_color)
+    assert re.fullmatch(r"#[0-9a-f]{6}", missing.ui_color)
+    assert coloured.spine_color == "#000000"
+    assert (
+        f"{broken.pk} {broken.cover.name}: unreadable cover" in capsys.readouterr().out
+    )
+    assert set(Job.objects.values_list("book", "kind")) == {
+        (missing.pk, Job.Kind.UPDATE_THUMBNAIL)
+    }
+
+    assert len(list((tmp_path / "cover-cache").glob("*/*"))) == 1
+
+    # --all recolours everything; the cached palette is not decoded again.
+    decoded = []
+    monkeypatch.setattr(
+        "scriptorium.main.utils.get_cover_palettes",
+        lambda path: decoded.append(path) or get_cover_palettes(path),
+    )
+    Job.objects.all().delete()
+    call_command("runperiodic", "--all", "--workers", "1")
+
+    coloured.refresh_from_db()
+    assert coloured.spine_color != "#000000"
+    assert decoded == [coloured.cover.path, broken.cover.path]
+    assert not Job.objects.exists()
+
+
+def test_runperiodic_command_fills_in_missing_shelf_layouts():
+    book = BookFactory(pages=250)
+    Book.all_objects.update(shelf_layout=None)
+
+    call_command("runperiodic", "--workers", "1")
+
+    book.refresh_from_db()
+    assert book.shelf_layout == Spine(book).layout
+
+
+# --- Job --------------------------------------------------------------------
+
+
+def test_job_enqueue_skips_pending_duplicates():
+    book = BookFactory()
+
+    first = Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book)
+    second = Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book)
+    Job.objects.enqueue(Job.Kind.UPDATE_COLOURS, book)
+
+    assert first == second
+    assert Job.objects.count() == 2
+    assert str(first) == f"update thumbnail for {book} (pending)"
+
+
+def test_job_enqueue_requeues_after_job_ran():
+    book = BookFactory()
+    job = Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book)
+    job.run()
+
+    assert Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book) != job
+
+
+def test_job_due_skips_future_and_finished_jobs():
+    book = BookFactory()
+    later = Job.objects.create(kind=Job.Kind.UPDATE_COLOURS, book=book)
+    earlier = Job.objects.create(
+        kind=Job.Kind.UPDATE_THUMBNAIL,
+        book=book,
+        run_after=later.run_after - dt.timedelta(minutes=1),
+    )
+    Job.objects.create(
+        kind=Job.Kind.DOWNLOAD_COVER,
+        book=book,
+        run_after=later.run_after + dt.timedelta(hours=1),
+    )
+    Job.objects.create(
+        kind=Job.Kind.UPDATE_THUMBNAIL, book=book, status=Job.Status.DONE
+    )
+
+    assert list(Job.objects.due()) == [earlier, later]
+
+
+def test_job_run_only_claims_once():
+    job = Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, BookFactory())
+    stale = Job.objects.get(pk=job.pk)
+
+    assert job.run() is True
+    assert stale.run() is False
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.Status.DONE, 1)
+    assert job.finished is not None
+
+
+def test_job_run_retries_with_backoff(monkeypatch):
+    def boom(self):
+        raise requests.ConnectionError("nope")
+
+    monkeypatch.setattr(Book, "download_cover", boom)
+    job = Job.objects.enqueue(Job.Kind.DOWNLOAD_COVER, BookFactory())
+
+    assert job.run() is True
+    job.refresh_from_db()
+    first_retry = job.run_after
+    assert job.status == Job.Status.PENDING
+    assert job.last_error == "ConnectionError: nope"
+    assert first_retry > job.created + Job.BACKOFF / 2
+    assert not Job.objects.due().exists()
+
+    job.run()
+    job.refresh_from_db()
+    assert job.attempts == 2
+    assert job.run_after - first_retry > Job.BACKOFF
+
+
+def test_job_run_fails_after_max_attempts(monkeypatch):
+    def boom(self):
+        raise requests.ConnectionError("nope")
+
+    monkeypatch.setattr(Book, "download_cover", boom)
+    job = Job.objects.enqueue(Job.Kind.DOWNLOAD_COVER, BookFactory())
+    Job.objects.filter(pk=job.pk).update(attempts=Job.MAX_ATTEMPTS - 1)
+    job.refresh_from_db()
+
+    job.run()
+    job.refresh_from_db()
+
+    assert (job.status, job.attempts) == (Job.Status.FAILED, Job.MAX_ATTEMPTS)
+    assert job.finished is not None
+
+
+def test_runjobs_command_runs_due_jobs_and_reports_errors(monkeypatch, capsys):
+    def boom(self):
+        raise requests.ConnectionError("nope")
+
+    monkeypatch.setattr(Book, "download_cover", boom)
+    book = BookFactory()
+    Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book)
+    Job.objects.enqueue(Job.Kind.DOWNLOAD_COVER, book)
+
+    call_command("runjobs")
+
+    assert set(Job.objects.values_list("kind", "status")) == {
+        (Job.Kind.UPDATE_THUMBNAIL, Job.Status.DONE),
+        (Job.Kind.DOWNLOAD_COVER, Job.Status.PENDING),
+    }
+    assert "download cover" in capsys.readouterr().out
+
+
+def test_job_requeue_stale_retries_or_fails_jobs_of_dead_workers(capsys):
+    book = BookFactory()
+    retried = Job.objects.enqueue(Job.Kind.UPDATE_THUMBNAIL, book)
+    exhausted = Job.objects.enqueue(Job.Kind.UPDATE_COLOURS, book)
+    running = Job.objects.enqueue(Job.Kind.DOWNLOAD_COVER, book)
+    Job.objects.filter(pk=exhausted.pk).update(attempts=Job.MAX_ATTEMPTS - 1)
+    Job.objects.update(status=Job.Status.RUNNING, attempts=models.F("attempts") + 1)
+    Job.objects.exclude(pk=running.pk).update(
+        claimed=timezone.now() - Job.STALE_AFTER - dt.timedelta(minutes=1)
+    )
+    Job.objects.filter(pk=running.pk).update(claimed=timezone.now())
+
+    call_command("runjobs")
+
+    assert "Requeued 2 jobs whose worker died" in capsys.readouterr().out
+    retried.refresh_from_db()
+    exhausted.refresh_from_db()
+    running.refresh_from_db()
+    assert (retried.status, retried.attempts) == (Job.Status.DONE, 2)
+    assert (exhausted.status, exhausted.last_error) == (
+        Job.Status.FAILED,
+        "Worker died while running the job",
+    )
+    assert exhausted.finished is not None
+    assert running.status == Job.Status.RUNNING
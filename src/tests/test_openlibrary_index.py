@@ -0,0 +1,212 @@
+import gzip
+import json
+from contextlib import closing
+
+import pytest
+from django.core.management import call_command
+
+from scriptorium.main import metadata
+from scriptorium.main.openlibrary_index import OpenLibraryIndex, read_dump
+from tests.test_metadata import FakeResponse, _install_fake_get
+
+AUTHORS = [
+    {"key": "/authors/OL1A", "name": "Ursula K. Le Guin"},
+    {"key": "/authors/OL2A", "name": "Stanisław Lem"},
+    {"key": "/authors/OL3A"},
+]
+WORKS = [
+    {
+        "key": "/works/OL1W",
+        "title": "The Dispossessed",
+        "first_publish_date": "May 1974",
+        "covers": [-1, 42],
+        "authors": [{"author": {"key": "/authors/OL1A"}}, {"type": "x"}],
+    },
+    {
+        "key": "/works/OL2W",
+        "title": "Solaris",
+        "authors": [{"author": {"key": "/authors/OL2A"}}],
+    },
+    {"key": "/works/OL3W"},
+]
+EDITIONS = [
+    {
+        "key": "/books/OL1M",
+        "works": [{"key": "/works/OL1W"}],
+        "title": "The Dispossessed",
+        "publish_date": "1974",
+        "languages": [{"key": "/languages/eng"}],
+        "number_of_pages": 341,
+        "isbn_13": ["9780060512750"],
+        "isbn_10": ["0060512751"],
+        "identifiers": {"goodreads": ["13651"]},
+        "covers": [7],
+    },
+    {
+        "key": "/books/OL2M",
+        "works": [{"key": "/works/OL1W"}],
+        "title": "Les Dépossédés",
+        "languages": [{"key": "/languages/fre"}],
+        "pagination": "xii, 400 p.",
+        "authors": [{"key": "/authors/OL1A"}],
+    },
+    {"key": "/books/OL3M", "title": "Orphan edition"},
+    {"key": "/books/OL5M", "works": [{"key": "/works/OL2W"}], "title": "Solaris"},
+    {"key": "/books/OL4M"},
+]
+
+
+def _tsv(record):
+    return "\t".join(["/type/x", record["key"], "1", "2024-01-01", json.dumps(record)])
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    authors = tmp_path / "ol_dump_authors.txt.gz"
+    with gzip.open(authors, "wt", encoding="utf-8") as fp:
+        fp.write("\n".join(_tsv(record) for record in AUTHORS) + "\n\n")
+    works = tmp_path / "ol_dump_works.txt"
+    works.write_text("\n".join(_tsv(record) for record in WORKS))
+    editions = tmp_path / "editions.jsonl"
+    editions.write_text("\n".join(json.dumps(record) for record in EDITIONS))
+    return {"authors": authors, "works": works, "editions": editions}
+
+
+@pytest.fixture
+def index(dumps, capsys):
+    call_command(
+        "importopenlibrary",
+        "--authors",
+        str(dumps["authors"]),
+        "--works",
+        str(dumps["works"]),
+        "--editions",
+        str(dumps["editions"]),
+    )
+    assert capsys.readouterr().out.splitlines() == [
+        "Imported 2 authors",
+        "Imported 2 works",
+        "Imported 4 editions",
+    ]
+    return OpenLibraryIndex.open()
+
+
+def test_read_dump_reads_tsv_gzip_and_json_lines(dumps):
+    assert list(read_dump(dumps["authors"])) == AUTHORS
+    assert [r["key"] for r in read_dump(dumps["editions"])] == [
+        r["key"] for r in EDITIONS
+    ]
+
+
+def test_openlibrary_index_open_without_import():
+    assert OpenLibraryIndex.open() is None
+
+
+def test_openlibrary_index_schema_is_created_by_the_import(index, dumps, tmp_path):
+    fresh = OpenLibraryIndex(tmp_path / "fresh.sqlite3")
+    with closing(fresh.connect()) as connection:
+        assert connection.execute("SELECT name FROM sqlite_master").fetchall() == []
+
+    # Importing again finds the schema in place.
+    call_command("importopenlibrary", "--authors", str(dumps["authors"]))
+    assert index.search("le guin")["docs"][0]["key"] == "/works/OL1W"
+
+
+def test_openlibrary_index_search_matches_titles_and_authors(index):
+    assert index.search("dispossessed le guin") == {
+        "docs": [
+            {
+                "key": "/works/OL1W",
+                "title": "The Dispossessed",
+                "author_name": ["Ursula K. Le Guin"],
+                "first_publish_year": 1974,
+                "cover_i": 42,
+            }
+        ]
+    }
+    assert [doc["title"] for doc in index.search("lem")["docs"]] == ["Solaris"]
+    assert index.search("Solaris")["docs"][0]["first_publish_year"] is None
+    assert index.search("dune") == {"docs": []}
+    assert index.search("?!") == {"docs": []}
+
+
+def test_openlibrary_index_editions_look_like_the_api(index):
+    assert index.editions("OL1W") == {
+        "size": 2,
+        "entries": [
+            {
+                "key": "/books/OL1M",
+                "title": "The Dispossessed",
+                "publish_date": "1974",
+                "languages": [{"key": "/languages/eng"}],
+                "number_of_pages": 341,
+            },
+            {
+                "key": "/books/OL2M",
+                "title": "Les Dépossédés",
+                "languages": [{"key": "/languages/fre"}],
+                "pagination": "xii, 400 p.",
+            },
+        ],
+    }
+    assert index.editions("OL2W") == {
+        "size": 1,
+        "entries": [{"key": "/books/OL5M", "title": "Solaris"}],
+    }
+    assert index.editions("OL3W") == {"size": 0, "entries": []}
+
+
+def test_openlibrary_index_book_by_isbn_or_olid(index):
+    book = index.book(isbn="0060512751")
+
+    assert book == index.book(olid="OL1M")
+    assert book == {
+        "title": "The Dispossessed",
+        "authors": [{"name": "Ursula K. Le Guin"}],
+        "identifiers": {
+            "openlibrary": ["OL1M"],
+            "isbn_13": ["9780060512750"],
+            "isbn_10": ["0060512751"],
+            "goodreads": ["13651"],
+        },
+        "publish_date": "1974",
+        "number_of_pages": 341,
+        "cover": {
+            "small": "https://covers.openlibrary.org/b/id/7-S.jpg",
+            "medium": "https://covers.openlibrary.org/b/id/7-M.jpg",
+            "large": "https://covers.openlibrary.org/b/id/7-L.jpg",
+        },
+    }
+    assert index.book(olid="OL2M")["authors"] == [{"name": "Ursula K. Le Guin"}]
+    assert index.book(olid="OL3M") == {
+        "title": "Orphan edition",
+        "authors": [],
+        "identifiers": {"openlibrary": ["OL3M"]},
+        "publish_date": "",
+    }
+    assert index.book(isbn="9999999999") is None
+
+
+def test_metadata_answers_from_index_without_network(index, monkeypatch):
+    _install_fake_get(monkeypatch, [])
+
+    assert metadata.search_book("dispossessed") == [
+        ("OL1W", "The Dispossessed by Ursula K. Le Guin")
+    ]
+    assert [e["id"] for e in metadata.get_openlibrary_editions_data("OL1W")] == ["OL1M"]
+    assert metadata.get_openlibrary_book_data("OL1M")["isbn13"] == "9780060512750"
+
+
+def test_metadata_falls_back_to_network_on_index_miss(index, monkeypatch):
+    _install_fake_get(
+        monkeypatch,
+        [
+            ("search.json", FakeResponse(json_data={"docs": []})),
+            ("/editions.json", FakeResponse(json_data={"entries": []})),
+            ("api/books", FakeResponse(json_data={})),
+        ],
+    )
+
+    assert metadata.search_book("dune") == []
+    assert metadata.get_openlibrary_editions_data("OL9W") == []
+    assert metadata.get_openlibrary_book_data("OL9M") is None
@@ -0,0 +1,170 @@
+import io
+import json
+
+import pytest
+from PIL import Image
+
+from scriptorium.main.cover_cache import CoverCache
+from scriptorium.main.models import Job
+from scriptorium.main.sprites import (
+    Sprite,
+    build_missing_sheets,
+    build_sheet,
+    chunk_covers,
+    get_sprites,
+    render_tile,
+    tile_name,
+)
+from tests.factories import BookFactory
+
+
+def _book(cover_hash=None):
+    # Saving a book without a cover file clears its cover hash.
+    book = BookFactory()
+    book.cover_hash = cover_hash
+    return book
+
+
+def _tiled_book(cover_hash, size=(300, 450)):
+    CoverCache().put(cover_hash, tile_name(), render_tile(Image.new("RGB", size)))
+    return _book(cover_hash)
+
+
+def test_render_tile_fits_tile_box_at_double_density(settings):
+    settings.SPRITE_TILE_SIZE = (100, 100)
+    im = Image.new("RGB", (300, 450))
+
+    tile = Image.open(io.BytesIO(render_tile(im)))
+
+    assert tile.format == "JPEG"
+    assert tile.size == (133, 200)
+    assert im.size == (300, 450)
+
+
+def test_sprite_renders_css_px_placement():
+    sprite = Sprite("/sprites/k.jpg", 140, 0, 86.5, 130, 280, 260)
+
+    assert sprite.style == (
+        "background-image: url('/sprites/k.jpg'); background-position: -140px -0px; "
+        "background-size: 280px 260px; width: 86.5px; height: 130px"
+    )
+    assert "--cover-pos: -140px -0px" in sprite.css_vars
+    assert "--cover-width: 86.5px" in sprite.css_vars
+
+
+@pytest.mark.django_db
+def test_get_sprites_uses_sheet_built_from_cached_tiles(settings):
+    settings.SPRITE_COLUMNS = 2
+    books = [_tiled_book(str(i) * 64) for i in range(1, 4)]
+
+    assert get_sprites(books) == {}
+    assert build_missing_sheets([books, books[:1]]) == 2
+    sprites = get_sprites(books)
+
+    assert list(sprites) == [book.cover_hash for book in books]
+    first, second, third = sprites.values()
+    assert first.url == second.url == third.url
+    assert (first.x, first.y) == (0, 0)
+    assert (second.x, second.y) == (140, 0)
+    assert (third.x, third.y) == (0, 130)
+    assert (first.width, first.height) == (86.5, 130)
+    assert (first.sheet_width, first.sheet_height) == (280, 260)
+    key = first.url.removeprefix("/sprites/").removesuffix(".jpg")
+    assert Image.open(CoverCache().get(key, "sprite.jpg")).size == (560, 520)
+    assert build_missing_sheets([books, books]) == 0
+    assert not Job.objects.exists()
+
+
+@pytest.mark.django_db
+def test_get_sprites_only_reads_the_cover_cache(django_assert_num_queries):
+    books = [_tiled_book("a" * 64), _book("b" * 64)]
+    files = set(CoverCache().root.rglob("*"))
+
+    with django_assert_num_queries(0):
+        assert get_sprites(books) == {}
+
+    assert set(CoverCache().root.rglob("*")) == files
+
+
+@pytest.mark.django_db
+def test_build_missing_sheets_only_rebuilds_the_sheet_of_a_changed_cover(settings):
+    settings.SPRITE_SHEET_TILES = 1
+    books = [_tiled_book("a" * 64), _tiled_book("b" * 64)]
+    assert build_missing_sheets([books]) == 2
+    before = get_sprites(books)
+
+    books[1] = _tiled_book("c" * 64)
+    assert get_sprites(books) == {"a" * 64: before["a" * 64]}
+    assert build_missing_sheets([books]) == 1
+
+    assert get_sprites(books)["c" * 64].url != before["b" * 64].url
+
+
+def test_chunk_covers_keeps_other_sheets_when_a_cover_is_added(settings):
+    settings.SPRITE_SHEET_TILES = 4
+    hashes = [f"{i * 10:064x}" for i in range(1, 20)]
+
+    before = chunk_covers(reversed(hashes))
+    after = chunk_covers([*hashes, f"{25:064x}"])
+
+    assert before[0] == [f"{10:064x}", f"{20:064x}"]
+    assert [chunk for chunk in after if chunk not in before] == [
+        [f"{25:064x}", f"{30:064x}", f"{40:064x}"]
+    ]
+    assert len(after) == len(before)
+
+
+def test_chunk_covers_caps_sheets_at_twice_the_tile_count(settings):
+    settings.SPRITE_SHEET_TILES = 4
+
+    chunks = chunk_covers([f"{i:064x}" for i in range(1, 40, 2)])
+
+    assert [len(chunk) for chunk in chunks] == [8, 8, 4]
+
+
+@pytest.mark.django_db
+def test_build_missing_sheets_queues_derivatives_for_untiled_covers():
+    tiled = _tiled_book("a" * 64)
+    untiled = _book("b" * 64)
+    coverless = _book()
+    broken = _book("c" * 64)
+    Job.objects.create(
+        kind=Job.Kind.UPDATE_DERIVATIVES, book=broken, status=Job.Status.FAILED
+    )
+
+    page = [tiled, untiled, coverless, broken]
+
+    assert build_missing_sheets([page, page]) == 0
+    assert build_missing_sheets([page]) == 0
+    assert get_sprites([tiled, untiled, coverless]) == {}
+
+    job = Job.objects.get(status=Job.Status.PENDING)
+    assert job.kind == Job.Kind.UPDATE_DERIVATIVES
+    assert job.book == untiled
+    assert Job.objects.filter(book=broken).count() == 1
+
+
+def test_build_sheet_gives_up_on_missing_tile(settings):
+    cache = CoverCache()
+    cache.put("a" * 64, tile_name(), render_tile(Image.new("RGB", (30, 45))))
+
+    assert build_sheet(cache, "k" * 64, ["a" * 64, "b" * 64]) is None
+    assert cache.get("k" * 64, "sprite.jpg") is None
+
+    sprite_map = build_sheet(cache, "k" * 64, ["a" * 64])
+    assert sprite_map == {
+        "width": 280,
+        "height": 260,
+        "tiles": {"a" * 64: [0, 0, 30, 45]},
+    }
+    assert json.loads(cache.get("k" * 64, "sprite.json").read_text()) == sprite_map
+
+
+@pytest.mark.django_db
+def test_build_missing_sheets_skips_sheet_with_unreadable_tile():
+    CoverCache().put("a" * 64, tile_name(), b"not a jpeg")
+    book = _book("a" * 64)
+
+    assert build_missing_sheets([[book]]) == 0
+    assert get_sprites([book]) == {}
+    assert not Job.objects.exists()
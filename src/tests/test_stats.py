@@ -2,13 +2,15 @@ import datetime as dt
 
 import pytest
 
-from scriptorium.main.models import BookRelation, BookStatus
+from scriptorium.main.models import Book, BookRelation, BookStatus
 from scriptorium.main.stats import (
     LineBar,
     _get_chart,
     get_nodes,
     get_stats_grid,
     get_year_stats,
+    median_length,
+    median_year,
 )
 from tests.factories import (
     AuthorFactory,
@@ -163,6 +165,15 @@ def test_get_year_stats_empty_year_returns_zeroed_defaults():
     assert stats["all_time"]["Total books"] == 1
 
 
+def test_medians_skip_books_without_values():
+    for pages, year in ((100, 1969), (300, 1974), (200, None), (None, 2001)):
+        make_reviewed_book(pages=pages, publication_year=year)
+    books = Book.objects.all()
+
+    assert median_length(books) == 200
+    assert median_year(books) == 1974
+
+
 def test_get_nodes_skips_graph_nodes_without_matching_book():
     """A BookRelation can point at a Book that the default (non-draft)
     BookManager filters out. get_nodes must skip those graph nodes instead
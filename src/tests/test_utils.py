@@ -6,6 +6,7 @@ from PIL import Image
 
 from scriptorium.main.utils import (
     UI_LIGHTNESS,
+    batch_cover_colours,
     get_dominant_colours,
     get_spine_color,
     get_ui_color,
@@ -162,3 +163,75 @@ def test_get_ui_color_is_neutral_grey_for_greyscale(tmp_path):
     assert oklch["chroma"] < 0.02  # essentially no hue
     r, g, b = (int(color[i : i + 2], 16) for i in (1, 3, 5))
     assert max(r, g, b) - min(r, g, b) < 6  # visually grey
+
+
+def test_get_dominant_colours_returns_fewer_for_flat_image(tmp_path):
+    path = tmp_path / "cover.png"
+    Image.new("RGB", (50, 80), (30, 60, 90)).save(path)
+
+    colors = get_dominant_colours(str(path), count=3)
+
+    assert [tuple(round(v * 255) for v in c) for c in colors] == [(30, 60, 90)]
+
+
+def _colours(path):
+    return get_spine_color(_FakeCover(path)), get_ui_color(_FakeCover(path))
+
+
+def test_batch_cover_colours_decodes_shared_covers_once(tmp_path, monkeypatch):
+    first = tmp_path / "a.png"
+    _make_striped_image(first, [(200, 50, 50), (180, 180, 180), (30, 30, 120)])
+    copy = tmp_path / "b.png"
+    copy.write_bytes(first.read_bytes())
+    other = tmp_path / "c.png"
+    _make_striped_image(other, [(20, 40, 200), (245, 245, 245)])
+    decoded = []
+    original = Image.open
+
+    def counting_open(path, *args, **kwargs):
+        decoded.append(path)
+        return original(path, *args, **kwargs)
+
+    monkeypatch.setattr("scriptorium.main.utils.Image.open", counting_open)
+    cache = {}
+
+    colours = batch_cover_colours([first, copy, other], workers=1, cache=cache)
+
+    assert len(decoded) == 2
+    assert len(cache) == 2
+    assert colours[first] == colours[copy] == _colours(first)
+    assert colours[other] == _colours(other)
+
+    decoded.clear()
+    monkeypatch.setattr("scriptorium.main.utils.ProcessPoolExecutor", None)
+    assert batch_cover_colours([first, other], cache=cache) == {
+        first: colours[first],
+        other: colours[other],
+    }
+    assert decoded == []
+
+
+def test_batch_cover_colours_skips_unreadable_covers(tmp_path):
+    good = tmp_path / "good.png"
+    _make_striped_image(good, [(200, 50, 50), (30, 30, 120)])
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"not an image")
+    cache = {}
+
+    colours = batch_cover_colours(
+        [good, broken, tmp_path / "missing.png"], workers=1, cache=cache
+    )
+
+    assert list(colours) == [good]
+    assert len(cache) == 1
+
+
+def test_batch_cover_colours_uses_process_pool(tmp_path):
+    paths = []
+    for i, color in enumerate([(200, 50, 50), (20, 40, 200), (40, 180, 90)]):
+        paths.append(tmp_path / f"{i}.png")
+        _make_striped_image(paths[-1], [color, (245, 245, 245)])
+
+    colours = batch_cover_colours(paths, workers=2)
+
+    assert colours == {path: _colours(path) for path in paths}
@@ -22,6 +22,7 @@ from tests.factories import (
     ApiTokenFactory,
     AuthorFactory,
     BookFactory,
+    HighlightFactory,
     PageFactory,
     PoemFactory,
     QuoteFactory,
@@ -87,6 +88,7 @@ def test_logout_view_redirects_home_and_clears_session(admin_logged_in_client):
         "/b/poems/new/",
         "/b/tokens/",
         "/b/toreview/",
+        "/b/highlights/",
     ],
 )
 def test_admin_views_redirect_anonymous_to_login(client, path):
@@ -284,19 +286,17 @@ def test_to_review_edit_shows_metadata_and_highlights(admin_logged_in_client):
         isbn13="9780441478125",
         source="koreader",
     )
-    ReadFactory(
-        book=book,
-        finished_on=dt.date(2024, 5, 1),
-        format="ebook",
-        total_time_seconds=25440,
-        highlights=[
-            {
-                "text": "Light is the left hand of darkness.",
-                "note": "gorgeous",
-                "chapter": "Chapter 16",
-                "pageno": 233,
-            }
-        ],
+    HighlightFactory(
+        read=ReadFactory(
+            book=book,
+            finished_on=dt.date(2024, 5, 1),
+            format="ebook",
+            total_time_seconds=25440,
+        ),
+        text="Light is the left hand of darkness.",
+        note="gorgeous",
+        chapter="Chapter 16",
+        pageno=233,
     )
 
     response = admin_logged_in_client.get(f"/b/toreview/{book.pk}/")
@@ -465,6 +465,50 @@ def test_to_review_dismiss_requires_post(admin_logged_in_client):
     assert stale.review_updated == dt.date(2020, 1, 1)
 
 
+# --- Highlight search -------------------------------------------------------
+
+
+def test_highlight_search_links_matches_to_their_books(admin_logged_in_client):
+    reviewed = make_reviewed_book(
+        title="The Dispossessed", title_slug="the-dispossessed"
+    )
+    queued = BookFactory(status=BookStatus.TO_REVIEW)
+    HighlightFactory(
+        read=ReadFactory(book=reviewed),
+        text="True journey is return.",
+        note="the thesis",
+        chapter="Chapter 13",
+        pageno=386,
+    )
+    HighlightFactory(
+        read=ReadFactory(book=queued), text="A journey of a thousand miles"
+    )
+    HighlightFactory(read=ReadFactory(book=queued), text="Nothing relevant")
+
+    response = admin_logged_in_client.get("/b/highlights/?q=journ")
+
+    assert response.status_code == 200
+    body = response.content.decode()
+    assert "True journey is return." in body
+    assert "the thesis" in body
+    assert "Chapter 13" in body
+    assert f'href="/b/{reviewed.slug}/"' in body
+    assert "A journey of a thousand miles" in body
+    assert f'href="/b/toreview/{queued.pk}/"' in body
+    assert "Nothing relevant" not in body
+
+
+@pytest.mark.parametrize(("query", "message"), [("", False), ("zebra", True)])
+def test_highlight_search_without_results(admin_logged_in_client, query, message):
+    HighlightFactory(text="True journey is return.")
+
+    response = admin_logged_in_client.get("/b/highlights/", {"q": query})
+
+    body = response.content.decode()
+    assert "True journey is return." not in body
+    assert ("No highlights match" in body) is message
+
+
 # --- Deploy trigger ---------------------------------------------------------
 
 
@@ -593,6 +637,19 @@ def test_review_create_get_form_kwargs_select_calls_search_book(rf, monkeypatch)
     assert kwargs == {"works": [("OL1W", "Hit: Dispossessed")]}
 
 
+def test_review_create_get_form_kwargs_select_prefetches_editions(rf, monkeypatch):
+    prefetched = []
+    monkeypatch.setattr(
+        metadata, "search_book", lambda s: [("OL1W", "One"), ("OL2W", "Two")]
+    )
+    monkeypatch.setattr(metadata, "prefetch_editions", prefetched.append)
+    view = _wizard_view(rf, {"search": {"search_input": "Dispossessed"}})
+
+    view.get_form_kwargs(step="select")
+
+    assert prefetched == [["OL1W", "OL2W"]]
+
+
 def test_review_create_get_form_kwargs_select_falls_back_on_error(rf, monkeypatch):
 
     def boom(_):
@@ -651,6 +708,21 @@ def test_review_create_get_form_kwargs_book_calls_openlibrary(rf, monkeypatch):
     assert kwargs == {"openlibrary": {"title": "T", "olid": "OL1M"}}
 
 
+def test_review_create_get_form_kwargs_book_prefetches_cover(rf, monkeypatch):
+    prefetched = []
+    monkeypatch.setattr(
+        metadata,
+        "get_openlibrary_book",
+        lambda olid=None: {"cover": {"large": "https://covers/1-L.jpg"}},
+    )
+    monkeypatch.setattr(metadata, "prefetch", lambda *args: prefetched.append(args))
+    view = _wizard_view(rf, {"edition": {"edition_selection": "OL1M"}})
+
+    view.get_form_kwargs(step="book")
+
+    assert prefetched == [(metadata.get_cover_image, "https://covers/1-L.jpg")]
+
+
 def test_review_create_get_form_kwargs_book_falls_back_on_error(rf, monkeypatch):
 
     def boom(olid=None):
@@ -1021,17 +1093,9 @@ def test_review_edit_shows_reread_highlights(admin_logged_in_client):
             name="Ursula K. Le Guin", name_slug="ursula-k-le-guin"
         ),
     )
-    reread = ReadFactory(
-        book=book,
-        finished_on=dt.date(2026, 6, 1),
-        highlights=[
-            {
-                "text": "True journey is return.",
-                "note": None,
-                "chapter": "Chapter 13",
-                "pageno": 386,
-            }
-        ],
+    reread = ReadFactory(book=book, finished_on=dt.date(2026, 6, 1))
+    HighlightFactory(
+        read=reread, text="True journey is return.", chapter="Chapter 13", pageno=386
     )
 
     response = admin_logged_in_client.get("/b/ursula-k-le-guin/the-dispossessed/")
@@ -1,12 +1,15 @@
 import datetime as dt
 import io
 import json
+import re
 
 import pytest
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from PIL import Image
 
-from scriptorium.main.models import Book, BookRelation, BookStatus
+from scriptorium.main.cover_cache import CoverCache
+from scriptorium.main.models import Book, BookRelation, BookStatus, Job
 from scriptorium.main.views import GraphView, healthz
 from tests.factories import (
     AuthorFactory,
@@ -676,38 +679,236 @@ def test_review_cover_thumbnail_view_without_cover_returns_404(client, reviewed_
 
 
 @pytest.mark.usefixtures("_media_tmp")
-def test_review_cover_thumbnail_view_serves_existing_thumbnail(client, reviewed_book):
+def test_review_cover_thumbnail_view_serves_cover_and_queues_missing_thumbnail(
+    client, reviewed_book
+):
     _attach_cover(reviewed_book)
-    # First request generates the thumbnail row…
-    client.get(f"/{reviewed_book.slug}/thumbnail.jpg")
-    assert reviewed_book.thumbnails.count() == 1
 
-    # …a second request must serve it without creating another row.
     response = client.get(f"/{reviewed_book.slug}/thumbnail.jpg")
+    client.get(f"/{reviewed_book.slug}/thumbnail.jpg")
 
     assert response.status_code == 200
-    assert reviewed_book.thumbnails.count() == 1
+    assert b"".join(response.streaming_content) == reviewed_book.cover.read()
+    assert reviewed_book.thumbnails.count() == 0
+    job = Job.objects.get()
+    assert (job.kind, job.book) == (Job.Kind.UPDATE_THUMBNAIL, reviewed_book)
 
 
 @pytest.mark.usefixtures("_media_tmp")
-def test_review_cover_thumbnail_view_generates_and_returns_thumbnail(
+def test_review_cover_thumbnail_view_serves_thumbnail_once_job_ran(
     client, reviewed_book
 ):
     _attach_cover(reviewed_book)
-    assert reviewed_book.cover_thumbnail is None
+    client.get(f"/{reviewed_book.slug}/thumbnail.jpg")
+    Job.objects.get().run()
 
     response = client.get(f"/{reviewed_book.slug}/thumbnail.jpg")
 
     assert response.status_code == 200
-    reviewed_book.refresh_from_db()
-    del reviewed_book.cover_thumbnail  # invalidate cached_property
-    assert reviewed_book.cover_thumbnail is not None
+    assert reviewed_book.thumbnails.count() == 1
+    assert Job.objects.get().status == Job.Status.DONE
     # The served bytes are a valid JPEG produced by the thumbnail generator.
     body = b"".join(response.streaming_content)
     assert body.startswith(b"\xff\xd8")  # JPEG magic bytes
     assert Image.open(io.BytesIO(body)).format == "JPEG"
 
 
+@pytest.mark.usefixtures("_media_tmp")
+def test_review_view_renders_responsive_cover(client, reviewed_book):
+    _attach_cover(reviewed_book)
+
+    body = client.get(f"/{reviewed_book.slug}/").content.decode()
+
+    version = reviewed_book.cover_hash[:16]
+    assert '<source type="image/webp"' in body
+    assert f"/{reviewed_book.slug}/cover-240.webp?v={version} 240w" in body
+    assert f'srcset="/{reviewed_book.slug}/cover-120.jpg?v={version} 120w' in body
+    assert f'src="/{reviewed_book.slug}/cover.jpg?v={version}"' in body
+    assert 'sizes="180px"' in body
+
+
+@pytest.mark.usefixtures("_media_tmp")
+def test_review_cover_view_caches_current_version_forever(
+    client, reviewed_book, django_assert_num_queries
+):
+    _attach_cover(reviewed_book)
+    url = reviewed_book.cover_url()
+
+    with django_assert_num_queries(1):
+        response = client.get(url)
+
+    assert response["Cache-Control"] == "public, max-age=31536000, immutable"
+    for stale in (f"/{reviewed_book.slug}/cover.jpg", url[:-1] + "x"):
+        assert client.get(stale)["Cache-Control"] == "public, max-age=3600"
+
+
+@pytest.mark.usefixtures("_media_tmp")
+def test_review_cover_thumbnail_view_fallback_is_not_cached_forever(
+    client, reviewed_book
+):
+    _attach_cover(reviewed_book)
+
+    response = client.get(reviewed_book.cover_url("thumbnail.jpg"))
+
+    assert response["Cache-Control"] == "public, max-age=3600"
+
+
+@pytest.mark.usefixtures("_media_tmp")
+@pytest.mark.parametrize(
+    ("mode", "header", "expected"),
+    [
+        ("x-accel-redirect", "X-Accel-Redirect", "/internal-media/{name}"),
+        ("x-sendfile", "X-Sendfile", "{path}"),
+    ],
+)
+def test_review_cover_views_hand_transfer_to_proxy(
+    client, reviewed_book, settings, mode, header, expected
+):
+    settings.MEDIA_SENDFILE = mode
+    _attach_cover(reviewed_book)
+    reviewed_book.update_thumbnail()
+    thumb = reviewed_book.thumbnails.get().thumb
+
+    cover = client.get(reviewed_book.cover_url())
+    thumbnail = client.get(reviewed_book.cover_url("thumbnail.jpg"))
+
+    assert cover.content == b""
+    assert cover["Content-Type"] == "image/jpeg"
+    assert cover[header] == expected.format(
+        name=reviewed_book.cover.name, path=reviewed_book.cover.path
+    )
+    assert thumbnail[header] == expected.format(name=thumb.name, path=thumb.path)
+    assert thumbnail["Cache-Control"] == "public, max-age=31536000, immutable"
+
+
+@pytest.mark.usefixtures("_media_tmp")
+def test_review_cover_derivative_view_serves_cover_and_queues_missing_derivative(
+    client, reviewed_book
+):
+    _attach_cover(reviewed_book)
+
+    response = client.get(f"/{reviewed_book.slug}/cover-240.webp")
+
+    assert response.status_code == 200
+    assert b"".join(response.streaming_content) == reviewed_book.cover.read()
+    job = Job.objects.get()
+    assert (job.kind, job.book) == (Job.Kind.UPDATE_DERIVATIVES, reviewed_book)
+
+
+@pytest.mark.usefixtures("_media_tmp")
+def test_review_cover_derivative_view_serves_derivative_once_job_ran(
+    client, reviewed_book, django_assert_num_queries
+):
+    _attach_cover(reviewed_book)
+    reviewed_book.update_derivatives()
+
+    with django_assert_num_queries(1):
+        response = client.get(f"/{reviewed_book.slug}/cover-120.webp")
+        body = b"".join(response.streaming_content)
+
+    assert response.status_code == 200
+    assert response["Content-Type"] == "image/webp"
+    assert Image.open(io.BytesIO(body)).size[0] == 120
+
+
+@pytest.mark.parametrize("path", ["cover-100.jpg", "cover-240.gif"])
+def test_review_cover_derivative_view_rejects_unknown_variants(
+    client, reviewed_book, path
+):
+    response = client.get(f"/{reviewed_book.slug}/{path}")
+
+    assert response.status_code == 404
+
+
+def test_review_cover_derivative_view_without_cover_returns_404(client, reviewed_book):
+    response = client.get(f"/{reviewed_book.slug}/cover-240.jpg")
+
+    assert response.status_code == 404
+    assert not Job.objects.exists()
+
+
+# --- Shelf ------------------------------------------------------------------
+
+
+def test_shelf_renders_stored_layout_without_tilting_neighbours(client):
+    for title in ("A", "B"):
+        book = make_reviewed_book(title=title, spine_color="#336699")
+        Book.objects.filter(pk=book.pk).update(shelf_layout=[20, 60, 9, 4.5, "grid"])
+
+    content = client.get("/").content.decode()
+
+    assert content.count('class="spine spine-grid"') == 2
+    assert content.count("rotate(9deg)") == 1
+    assert content.count("margin-left: 4.5px") == 1
+    assert "margin-top: 65px" in content
+
+
+# --- Sprite sheets ----------------------------------------------------------
+
+
+@pytest.mark.usefixtures("_media_tmp")
+def test_index_view_packs_covers_into_sprite_sheet(client, reviewed_book):
+    _attach_cover(reviewed_book)
+    reviewed_book.spine_color = "#336699"
+    reviewed_book.save()
+
+    jobs = set(Job.objects.all())
+
+    response = client.get("/")
+    content = response.content.decode()
+
+    assert "cover-sprite" not in content
+    assert set(Job.objects.all()) == jobs
+    assert not list(CoverCache().root.glob("*/*/sprite.*"))
+
+    # The first run queues the tile, the next one renders it and the sheet.
+    call_command("runjobs")
+    assert Job.objects.get().kind == Job.Kind.UPDATE_DERIVATIVES
+    assert "cover-sprite" not in client.get("/").content.decode()
+    call_command("runjobs")
+    content = client.get("/").content.decode()
+
+    assert 'class="cover cover-sprite"' in content
+    assert "--cover-pos: -0px -0px" in content
+    url = re.search(r"/sprites/[0-9a-f]+\.jpg", content)[0]
+    sheet = client.get(url)
+    assert sheet.status_code == 200
+    assert sheet["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert Image.open(io.BytesIO(b"".join(sheet.streaming_content))).format == "JPEG"
+
+
+@pytest.mark.usefixtures("_media_tmp")
+def test_year_view_uses_sprite_sheet(client, reviewed_book):
+    _attach_cover(reviewed_book)
+    reviewed_book.update_derivatives()
+    year = reviewed_book.reads.first().finished_on.year
+    assert "cover-sprite" not in client.get(f"/reviews/{year}/").content.decode()
+    call_command("runjobs")
+
+    response = client.get(f"/reviews/{year}/")
+
+    assert 'class="cover cover-sprite"' in response.content.decode()
+
+
+def test_sprite_sheet_view_unknown_sheet_returns_404(client):
+    response = client.get(f"/sprites/{'0' * 64}.jpg")
+
+    assert response.status_code == 404
+
+
+def test_sprite_sheet_view_hands_transfer_to_proxy(client, settings):
+    settings.MEDIA_SENDFILE = "x-accel-redirect"
+    CoverCache().put("ab" * 32, "sprite.jpg", b"sheet")
+
+    response = client.get(f"/sprites/{'ab' * 32}.jpg")
+
+    assert response.content == b""
+    assert response["Content-Type"] == "image/jpeg"
+    assert response["X-Accel-Redirect"] == (
+        f"/internal-cover-cache/ab/{'ab' * 32}/sprite.jpg"
+    )
+
+
 # --- Catalogue invalid form -------------------------------------------------
 
 